@@ -1,46 +1,84 @@
+import time
+# Startup is timed from here, before the heavy imports
+STARTED = time.monotonic()
+
 import cv2
 import numpy as np
-import mediapipe as mp
 import tkinter as tk
-from tkinter import ttk, colorchooser, filedialog
+from tkinter import ttk, colorchooser, filedialog, messagebox
 from PIL import Image, ImageTk
 import os
+import argparse
 import random
 from datetime import datetime
-import colorsys
-import time
+
+from brush_engine import BrushEngine
+from layers import opaque_ink
+from page_store import PageStore, READ_ERRORS
+from blend_engine import BlendEngine, BLEND_MODES
+from stroke_smoothing import StrokeBuilder
+from stroke_index import StrokeObject, StrokeStore
+from gesture_recognizer import GestureRecognizer
+from gesture_dynamics import GestureDynamics
+from gesture_templates import GestureTemplateStore, TEMPLATE_ACTIONS
+from hud import HudRenderer, hue_to_bgr
+from frame_pipeline import FramePreprocessor, DISPLAY_SIZE, INFERENCE_SIZE, parse_size
+from power_saver import IdleMonitor
+from session_store import SessionAutosaver
+from ui_state import UIState
+from frame_sink import FrameSink
+from svg_export import SvgExporter
+from frame_source import CameraSource, add_source_arguments, source_from_args
+from gesture_events import GesturePublisher, parse_address
+from quality_controller import QualityController, QUALITY_LEVELS
+from startup import BackgroundLoader
 
 class AdvancedGestureDrawingApp:
-    def __init__(self, root):
+    def __init__(self, root, display_size=DISPLAY_SIZE, inference_size=INFERENCE_SIZE, idle_after=10.0, 
+                 hands=None, frame_sink=None, indexed=False, blend_engine=None, target_fps=30, 
+                 quality=None, startup_report=None, gesture_events=None, frame_source=None):
+        # With no root the app runs headless (no Tk, no camera), frames are
+        # fed in through process_frame
         self.root = root
-        self.root.title("Advanced Gesture Drawing App")
-        self.root.geometry("1280x720")
+        self.headless = root is None
+        if not self.headless:
+            self.root.title("Advanced Gesture Drawing App")
+            self.root.geometry("1280x720")
         
-        # Initialize MediaPipe Hands
-        self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(
-            static_image_mode=False,
-            max_num_hands=1,
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.7
-        )
-        self.mp_draw = mp.solutions.drawing_utils
+        # MediaPipe Hands (an existing instance can be shared). Importing
+        # MediaPipe and building the graph takes seconds, so with a UI it
+        # happens on a background thread and hands stays None until then
+        self.owns_hands = hands is None
+        self.model_complexity = 1
+        self.hands = None
+        if self.headless:
+            self.load_hand_tracking()
+            self.hands = hands or self.create_hands(self.model_complexity)
         
         # Initialize drawing parameters
         self.prev_point = None
         self.drawing_color = (0, 0, 255)  # Red (BGR format)
         self.brush_thickness = 5
         self.is_drawing = False
-        self.clear_gesture_active = False
-        self.color_change_active = False
         self.brush_size_active = False
-        self.initial_pinky_y = None  # For pinky-based brush size control
         self.shape_start_point = None
-        self.mode_change_active = False
+        
+        # Windowed debouncing for the discrete gestures
+        self.gesture_recognizer = GestureRecognizer()
+        # Hand-size relative distances and time-based smoothing for the
+        # continuous gestures
+        self.gesture_dynamics = GestureDynamics()
+        
+        # User-recorded gesture templates
+        self.template_store = GestureTemplateStore()
+        self.last_landmarks = None
+        
+        # Undo history of layer snapshots
+        self.undo_stack = []
+        self.max_undo = 20
         
         # For color wheel selection
         self.color_select_active = False
-        self.color_select_start_pos = None
         self.hue = 0  # Initial hue (red)
         
         # Predefined colors palette
@@ -63,31 +101,123 @@ class AdvancedGestureDrawingApp:
             'RECTANGLE': 2,
             'CIRCLE': 3,
             'ERASER': 4,
-            'PATTERN': 5
+            'PATTERN': 5,
+            'OBJECT_ERASER': 6,
+            'SELECT': 7
         }
         self.current_mode = self.MODES['FREESTYLE']
         self.mode_names = {v: k for k, v in self.MODES.items()}
         
+        # Widget values written by the gesture code, pushed to Tk once per frame
+        self.ui_state = UIState()
+        self.update_color_indicator()
+        self.update_palette_highlight()
+        self.ui_state.set('mode', self.mode_names[self.current_mode])
+        self.ui_state.set('brush_size', self.brush_thickness)
+        
         # For shape drawing
         self.temp_canvas = None
         
+        # Sprite-based brush engine for freestyle strokes
+        self.brush_engine = BrushEngine()
+        
+        # Freestyle strokes are spline-smoothed while drawing. Everything
+        # drawn is also kept as an object in a grid index, for the object
+        # eraser and lasso selection
+        self.stroke_builder = None
+        self.stroke_store = StrokeStore()
+        self.current_object = None
+        self.erasing_objects = False
+        self.lasso = None
+        self.selection = []
+        self.moving_selection = False
+        
         # Initialize canvas
-        self.canvas_width = 640
-        self.canvas_height = 480
-        self.canvas = np.zeros((self.canvas_height, self.canvas_width, 3), dtype=np.uint8)
+        self.canvas_width, self.canvas_height = display_size
         
-        # FPS tracking
-        self.last_frame_time = time.time()
+        # Hand tracking runs on a smaller copy of each frame
+        self.inference_size = inference_size
+        self.preprocessor = FramePreprocessor(display_size, inference_size)
+        # Indexed layers store one palette index per pixel instead of BGRA.
+        # Each page of the document has its own layer stack; only a few stay
+        # in memory, the rest are compressed to disk in the background
+        self.pages = PageStore(self.canvas_width, self.canvas_height, indexed=indexed)
+        self.layers = self.pages.page.layers
+        
+        # Cached on-screen indicators
+        self.hud = HudRenderer(self.canvas_width)
+        
+        # FPS tracking (monotonic, gesture timing must not jump with the wall clock)
+        self.last_frame_time = time.monotonic()
+        self.frame_time = self.last_frame_time  # Timestamp of the frame being processed
         self.fps = 0
+        # The displayed FPS is refreshed twice a second so the HUD stays cached
+        self.fps_display = 0
+        self.fps_display_time = 0
+        # Capture to display time of the last frame, from the source's timestamps
+        self.latency = None
+        self.latency_display = None
         self.frame_times = []
-        self.target_fps = 30
+        self.target_fps = target_fps
         self.frame_interval = 1.0 / self.target_fps
         
+        # Low frame rate, motion-gated tracking when no hand is around
+        self.idle_monitor = IdleMonitor(idle_after=idle_after)
+        
+        # Trades quality for speed when frames take longer than the target
+        # allows; only the interactive loop feeds it, so headless rendering
+        # stays at full quality
+        self.quality = quality or QualityController(self.target_fps)
+        self.stage_times = {}
+        self.draw_landmarks = True
+        self.pattern_spacing = 10
+        self.display_scale = 1.0
+        self.ui_state.set('quality', self.quality.describe())
+        
+        # Shared memory / named pipe output of the composited frames
+        self.frame_sink = frame_sink
+        # Recognized gestures published for other programs
+        self.gesture_events = gesture_events
+        self.hand_visible = False
+        
+        # Saving as SVG vectorizes the drawing on background threads
+        self.svg_exporter = SvgExporter()
+        self.svg_export = None
+        
+        # Composites the layers over the video
+        self.blend_engine = blend_engine or BlendEngine()
+        
+        # Mouse or touch drawing, usable before hand tracking is ready
+        self.mouse_pos = None
+        self.mouse_down = False
+        self.mouse_drawing = False
+        
+        if self.headless:
+            return
+        
         # Create UI
         self.setup_ui()
         
-        # Start video capture
-        self.cap = cv2.VideoCapture(0)
+        self.video_frame.bind("<ButtonPress-1>", self.on_mouse_press)
+        self.video_frame.bind("<B1-Motion>", self.on_mouse_move)
+        self.video_frame.bind("<ButtonRelease-1>", self.on_mouse_release)
+        
+        # Crash-safe autosave, offering to resume the previous session
+        # once the first frame is up. Saving waits for that answer, the
+        # first save would otherwise overwrite the session on offer
+        self.autosaver = SessionAutosaver()
+        self.resume_pending = True
+        self.root.after_idle(self.offer_resume)
+        
+        # The UI runs on a placeholder frame while the camera (or other
+        # frame source) opens and the hand tracking model loads in the background
+        self.source = None
+        self.placeholder_frame = np.full((self.canvas_height, self.canvas_width, 3), 48, dtype=np.uint8)
+        self.startup_report = startup_report
+        self.loader = BackgroundLoader(STARTED)
+        self.loader.start('hand_tracking', self.load_hand_tracking)
+        self.loader.start('camera', (frame_source or CameraSource()).open)
+        self.startup_status = "Starting camera and hand tracking..."
         self.update_frame()
     
     def setup_ui(self):
@@ -110,7 +240,7 @@ class AdvancedGestureDrawingApp:
         for mode_name in self.MODES.keys():
             ttk.Radiobutton(
                 control_frame, 
-                text=mode_name.capitalize(), 
+                text=mode_name.replace('_', ' ').capitalize(), 
                 value=mode_name, 
                 variable=self.mode_var,
                 command=self.change_mode
@@ -130,19 +260,112 @@ class AdvancedGestureDrawingApp:
         self.brush_size_slider.pack(fill=tk.X, pady=5)
         self.brush_size_slider.bind("<ButtonRelease-1>", self.update_brush_size)
         
+        # Brush type selection
+        ttk.Label(control_frame, text="Brush:").pack(pady=5, anchor=tk.W)
+        self.brush_var = tk.StringVar(value=self.brush_engine.brush_type)
+        brush_combo = ttk.Combobox(
+            control_frame,
+            textvariable=self.brush_var,
+            values=BrushEngine.BRUSH_TYPES,
+            state="readonly"
+        )
+        brush_combo.pack(fill=tk.X, pady=5)
+        brush_combo.bind("<<ComboboxSelected>>", self.change_brush)
+
+        # Ink over video blending
+        ttk.Label(control_frame, text="Blend:").pack(pady=5, anchor=tk.W)
+        self.blend_var = tk.StringVar(value=self.blend_engine.mode)
+        blend_combo = ttk.Combobox(
+            control_frame,
+            textvariable=self.blend_var,
+            values=BLEND_MODES,
+            state="readonly"
+        )
+        blend_combo.pack(fill=tk.X, pady=5)
+        blend_combo.bind("<<ComboboxSelected>>", self.change_blend_mode)
+        ttk.Label(control_frame, text="Ink / Video Opacity:").pack(pady=5, anchor=tk.W)
+        self.ink_opacity_slider = ttk.Scale(control_frame, from_=0, to=100, orient=tk.HORIZONTAL, 
+                                            value=self.blend_engine.ink_opacity * 100)
+        self.ink_opacity_slider.pack(fill=tk.X, pady=2)
+        self.ink_opacity_slider.bind("<ButtonRelease-1>", self.update_blend_opacity)
+        self.video_opacity_slider = ttk.Scale(control_frame, from_=0, to=100, orient=tk.HORIZONTAL, 
+                                              value=self.blend_engine.video_opacity * 100)
+        self.video_opacity_slider.pack(fill=tk.X, pady=2)
+        self.video_opacity_slider.bind("<ButtonRelease-1>", self.update_blend_opacity)
+        
+        # Layers panel
+        ttk.Label(control_frame, text="Layers:").pack(pady=5, anchor=tk.W)
+        self.layer_listbox = tk.Listbox(control_frame, height=4, exportselection=False)
+        self.layer_listbox.pack(fill=tk.X, pady=2)
+        self.layer_listbox.bind("<<ListboxSelect>>", self.select_layer)
+        
+        layer_btn_frame = ttk.Frame(control_frame)
+        layer_btn_frame.pack(fill=tk.X, pady=2)
+        ttk.Button(layer_btn_frame, text="Add Layer", command=self.add_layer).pack(side=tk.LEFT, expand=True, fill=tk.X)
+        ttk.Button(layer_btn_frame, text="Delete Layer", command=self.delete_layer).pack(side=tk.LEFT, expand=True, fill=tk.X)
+        
+        self.layer_visible_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            control_frame, 
+            text="Visible", 
+            variable=self.layer_visible_var, 
+            command=self.toggle_layer_visibility
+        ).pack(anchor=tk.W)
+        self.layer_opacity_slider = ttk.Scale(control_frame, from_=0, to=100, orient=tk.HORIZONTAL, value=100)
+        self.layer_opacity_slider.pack(fill=tk.X, pady=2)
+        self.layer_opacity_slider.bind("<ButtonRelease-1>", self.update_layer_opacity)
+        self.refresh_layer_list()
+        
+        # Pages (a quick two-finger swipe also flips pages)
+        self.page_var = tk.StringVar(value="Page 1/1")
+        ttk.Label(control_frame, textvariable=self.page_var).pack(pady=5, anchor=tk.W)
+        page_btn_frame = ttk.Frame(control_frame)
+        page_btn_frame.pack(fill=tk.X, pady=2)
+        ttk.Button(page_btn_frame, text="◀ Page", 
+                   command=lambda: self.switch_page(self.pages.current - 1)).pack(side=tk.LEFT, expand=True, fill=tk.X)
+        ttk.Button(page_btn_frame, text="Page ▶", 
+                   command=lambda: self.switch_page(self.pages.current + 1)).pack(side=tk.LEFT, expand=True, fill=tk.X)
+        ttk.Button(page_btn_frame, text="New Page", command=self.new_page).pack(side=tk.LEFT, expand=True, fill=tk.X)
+        
         # Clear canvas button
         clear_btn = ttk.Button(control_frame, text="Clear Canvas", command=self.clear_canvas)
         clear_btn.pack(pady=5, fill=tk.X)
         
+        # Undo button
+        undo_btn = ttk.Button(control_frame, text="Undo", command=self.undo)
+        undo_btn.pack(pady=5, fill=tk.X)
+        
         # Save drawing button
         save_btn = ttk.Button(control_frame, text="Save Drawing", command=self.save_drawing)
         save_btn.pack(pady=5, fill=tk.X)
         
+        # Custom gesture recording
+        ttk.Label(control_frame, text="Custom Gesture:").pack(pady=5, anchor=tk.W)
+        template_frame = ttk.Frame(control_frame)
+        template_frame.pack(fill=tk.X)
+        self.template_action_var = tk.StringVar(value=TEMPLATE_ACTIONS[0])
+        ttk.Combobox(
+            template_frame,
+            textvariable=self.template_action_var,
+            values=TEMPLATE_ACTIONS,
+            state="readonly",
+            width=8
+        ).pack(side=tk.LEFT)
+        ttk.Button(template_frame, text="Record", command=self.record_template).pack(side=tk.LEFT, padx=2)
+        ttk.Button(template_frame, text="Reset", command=self.clear_templates).pack(side=tk.LEFT)
+        self.template_status_var = tk.StringVar(value=f"{len(self.template_store)} custom gestures")
+        ttk.Label(control_frame, textvariable=self.template_status_var).pack(anchor=tk.W)
+        
+        # Adaptive quality level
+        self.quality_var = tk.StringVar()
+        ttk.Label(control_frame, textvariable=self.quality_var).pack(pady=5, anchor=tk.W)
+        
         # Current color indicator
         ttk.Label(control_frame, text="Current Color:").pack(pady=5, anchor=tk.W)
         self.color_indicator = tk.Canvas(control_frame, width=50, height=30)
         self.color_indicator.pack(pady=5, anchor=tk.W)
-        self.update_color_indicator()
+        # One rectangle, recolored in place
+        self.color_indicator_rect = self.color_indicator.create_rectangle(0, 0, 50, 30, outline="")
         
         # Color palette 
         ttk.Label(control_frame, text="Color Palette:").pack(pady=5, anchor=tk.W)
@@ -158,9 +381,15 @@ class AdvancedGestureDrawingApp:
             swatch.grid(row=i//4, column=i%4, padx=2, pady=2)
             swatch.bind("<Button-1>", lambda event, idx=i: self.select_palette_color(idx))
             self.color_swatches.append(swatch)
+        self.ui_state.mark_pushed('palette', tuple(self.color_palette))
         
-        # Highlight current color
-        self.update_palette_highlight()
+        self.ui_state.bind('drawing_color', self.show_drawing_color)
+        self.ui_state.bind('palette', self.show_palette)
+        self.ui_state.bind('color_index', self.show_color_index)
+        self.ui_state.bind('mode', lambda mode, previous: self.mode_var.set(mode))
+        self.ui_state.bind('brush_size', lambda size, previous: self.brush_size_slider.set(size))
+        self.ui_state.bind('quality', lambda quality, previous: self.quality_var.set(f"Quality: {quality}"))
+        self.ui_state.bind('page', lambda page, previous: self.page_var.set(f"Page {page[0]}/{page[1]}"))
         
         # Gesture instructions
         ttk.Separator(control_frame).pack(fill=tk.X, pady=10)
@@ -169,6 +398,7 @@ class AdvancedGestureDrawingApp:
         instructions = """
         • Index finger up: Draw
         • Index + middle fingers up: Stop drawing
+          (swipe sideways to flip pages)
         • Closed fist: Cycle through colors
         • "OK" gesture: Enter color selection mode
           (move finger left/right to change hue)
@@ -176,9 +406,122 @@ class AdvancedGestureDrawingApp:
           (move pinky up/down)
         • Open palm: Clear canvas
         • Thumb up: Change drawing mode
+        • Custom gestures: hold a pose and press Record
         """
         ttk.Label(control_frame, text=instructions).pack(pady=5, anchor=tk.W)
     
+    def load_hand_tracking(self):
+        # Runs on a loader thread with a UI; only sets the module handles,
+        # the app starts using them once hands is installed
+        import mediapipe as mp
+        self.mp_hands = mp.solutions.hands
+        self.mp_draw = mp.solutions.drawing_utils
+        if not self.headless:
+            return self.create_hands(self.model_complexity)
+    
+    def poll_startup(self):
+        # Install whatever the background loaders have finished
+        for name, result, error in self.loader.poll():
+            if name == 'camera':
+                if error is None and result.is_open():
+                    self.source = result
+                    print(f"Frames from {result.describe()}")
+                else:
+                    print(f"Could not open the frame source: {error or 'no device'}")
+            elif name == 'hand_tracking':
+                if error is None:
+                    self.hands = result
+                    # The quality level may have changed while it loaded
+                    self.apply_quality()
+                else:
+                    print(f"Could not load hand tracking: {error}")
+            elif name == 'hand_model':
+                if error is None:
+                    complexity, hands = result
+                    self.hands.close()
+                    self.hands = hands
+                    self.model_complexity = complexity
+                    # The quality level may have moved on while it was built
+                    self.apply_quality()
+                else:
+                    print(f"Could not switch the hand tracking model: {error}")
+        
+        waiting = []
+        if 'camera' in self.loader.pending:
+            waiting.append("camera")
+        if 'hand_tracking' in self.loader.pending:
+            waiting.append("hand tracking")
+        if waiting:
+            self.startup_status = f"Starting {' and '.join(waiting)}... draw with the mouse meanwhile"
+        elif self.source is None or self.hands is None:
+            self.startup_status = "Camera or hand tracking unavailable, draw with the mouse"
+        else:
+            self.startup_status = None
+    
+    def canvas_point(self, event):
+        # Widget coordinates to canvas coordinates
+        x = int(event.x / self.display_scale)
+        y = int(event.y / self.display_scale)
+        return (min(max(x, 0), self.canvas_width - 1), min(max(y, 0), self.canvas_height - 1))
+    
+    def on_mouse_press(self, event):
+        self.mouse_pos = self.canvas_point(event)
+        self.mouse_down = True
+        self.idle_monitor.wake(time.monotonic())
+    
+    def on_mouse_move(self, event):
+        self.mouse_pos = self.canvas_point(event)
+        self.idle_monitor.wake(time.monotonic())
+    
+    def on_mouse_release(self, event):
+        self.mouse_down = False
+    
+    def start_drawing(self, point):
+        self.is_drawing = True
+        # If starting to draw in shape mode, set start point
+        if self.current_mode in [self.MODES['LINE'], self.MODES['RECTANGLE'], self.MODES['CIRCLE']] and self.shape_start_point is None:
+            self.shape_start_point = point
+    
+    def stop_drawing(self):
+        self.is_drawing = False
+        # For shape modes, complete the shape when drawing stops
+        if self.current_mode in [self.MODES['LINE'], self.MODES['RECTANGLE'], self.MODES['CIRCLE']] and self.shape_start_point is not None:
+            self.complete_shape()
+        self.finish_stroke()
+        self.prev_point = None
+        self.shape_start_point = None
+    
+    def create_hands(self, model_complexity=1):
+        return self.mp_hands.Hands(
+            static_image_mode=False,
+            max_num_hands=1,
+            model_complexity=model_complexity,
+            min_detection_confidence=0.7,
+            min_tracking_confidence=0.7
+        )
+    
+    def apply_quality(self):
+        # Push the quality controller's current knobs into the pipeline
+        knobs = self.quality.knobs()
+        complexity = knobs['model_complexity']
+        if complexity != self.model_complexity and self.owns_hands and self.hands is not None:
+            if self.headless:
+                self.hands.close()
+                self.hands = self.create_hands(complexity)
+                self.model_complexity = complexity
+            elif 'hand_model' not in self.loader.pending:
+                # Building the graph takes a while, so it happens on a loader
+                # thread and the current model keeps tracking until
+                # poll_startup() swaps the new one in
+                self.loader.start('hand_model', lambda: (complexity, self.create_hands(complexity)))
+        scale = knobs['inference_scale']
+        self.preprocessor.set_inference_size((max(1, int(self.inference_size[0] * scale)), 
+                                              max(1, int(self.inference_size[1] * scale))))
+        self.draw_landmarks = knobs['draw_landmarks']
+        self.pattern_spacing = knobs['pattern_spacing']
+        self.display_scale = knobs['display_scale']
+        self.ui_state.set('quality', self.quality.describe())
+    
     def select_palette_color(self, index):
         self.current_color_index = index
         self.drawing_color = self.color_palette[index]
@@ -186,25 +529,136 @@ class AdvancedGestureDrawingApp:
         self.update_palette_highlight()
     
     def update_palette_highlight(self):
-        for i, swatch in enumerate(self.color_swatches):
-            if i == self.current_color_index:
-                swatch.config(highlightbackground="gold", highlightthickness=2)
-            else:
-                swatch.config(highlightbackground="gray", highlightthickness=1)
+        self.ui_state.set('color_index', self.current_color_index)
+        self.ui_state.set('palette', tuple(self.color_palette))
     
     def change_mode(self):
+        self.finish_stroke()
         mode_name = self.mode_var.get()
         self.current_mode = self.MODES[mode_name]
+        self.ui_state.mark_pushed('mode', mode_name)
+        self.selection = []
         
         # Reset points if mode changes
         self.prev_point = None
         self.shape_start_point = None
     
+    @property
+    def canvas(self):
+        # Drawing always targets the active layer
+        return self.layers.active.pixels
+    
+    def ink(self, color=None):
+        # Drawing value for the active layer (opaque premultiplied BGRA, or
+        # a palette index on indexed layers)
+        return self.layers.active.ink(self.drawing_color if color is None else color)
+    
+    def mark_dirty(self, start_point, end_point, pad):
+        x0, x1 = sorted((start_point[0], end_point[0]))
+        y0, y1 = sorted((start_point[1], end_point[1]))
+        self.layers.mark_dirty((x0 - pad, y0 - pad, x1 + pad, y1 + pad))
+    
+    def refresh_layer_list(self):
+        # Listbox shows the top layer first
+        self.layer_listbox.delete(0, tk.END)
+        for layer in reversed(self.layers.layers):
+            label = layer.name if layer.visible else f"{layer.name} (hidden)"
+            self.layer_listbox.insert(tk.END, label)
+        row = len(self.layers.layers) - 1 - self.layers.active_index
+        self.layer_listbox.selection_set(row)
+        self.layer_visible_var.set(self.layers.active.visible)
+        self.layer_opacity_slider.set(self.layers.active.opacity * 100)
+    
+    def select_layer(self, event=None):
+        selection = self.layer_listbox.curselection()
+        if selection:
+            self.finish_stroke()
+            self.selection = []
+            self.layers.set_active(len(self.layers.layers) - 1 - selection[0])
+            self.prev_point = None
+            self.shape_start_point = None
+            self.refresh_layer_list()
+    
+    def add_layer(self):
+        self.layers.add_layer()
+        self.refresh_layer_list()
+    
+    def delete_layer(self):
+        if len(self.layers.layers) > 1:
+            self.finish_stroke()
+            self.selection = []
+            self.stroke_store.remove_layer(self.layers.active)
+        self.layers.remove_layer()
+        self.refresh_layer_list()
+    
+    def switch_page(self, index):
+        if not 0 <= index < len(self.pages) or index == self.pages.current:
+            return
+        self.finish_stroke()
+        # The stroke objects and undo history travel with the page
+        page = self.pages.page
+        page.objects = self.stroke_store.snapshot()
+        page.undo_stack = self.undo_stack
+        if not self.headless:
+            # The page can't change until it's current again, save it once now
+            self.autosaver.save_page(page.id, [layer.pixels.copy() for layer in self.layers.layers])
+        
+        try:
+            page = self.pages.switch(index)
+        except READ_ERRORS as e:
+            print(f"Could not read page {index + 1}: {e}")
+            return
+        self.layers = page.layers
+        self.stroke_store.restore(page.objects, self.layers.layers)
+        self.undo_stack = page.undo_stack
+        self.selection = []
+        self.prev_point = None
+        self.shape_start_point = None
+        if not self.headless:
+            self.refresh_layer_list()
+        self.ui_state.set('page', (self.pages.current + 1, len(self.pages)))
+    
+    def new_page(self):
+        # Inserted after the current page
+        self.switch_page(self.pages.add_page())
+    
+    def toggle_layer_visibility(self):
+        self.layers.set_visible(self.layers.active_index, self.layer_visible_var.get())
+        self.refresh_layer_list()
+    
+    def update_layer_opacity(self, event=None):
+        self.layers.set_opacity(self.layers.active_index, self.layer_opacity_slider.get() / 100.0)
+    
+    def change_brush(self, event=None):
+        self.brush_engine.brush_type = self.brush_var.get()
+    
+    def change_blend_mode(self, event=None):
+        self.blend_engine.set_mode(self.blend_var.get())
+    
+    def update_blend_opacity(self, event=None):
+        self.blend_engine.set_opacity(self.ink_opacity_slider.get() / 100.0, 
+                                      self.video_opacity_slider.get() / 100.0)
+    
     def update_color_indicator(self):
+        self.ui_state.set('drawing_color', self.drawing_color)
+    
+    @staticmethod
+    def to_hex(color):
         # Convert BGR to RGB for tkinter
-        rgb_color = f'#{self.drawing_color[2]:02x}{self.drawing_color[1]:02x}{self.drawing_color[0]:02x}'
-        self.color_indicator.configure(bg=rgb_color)
-        self.color_indicator.create_rectangle(0, 0, 50, 30, fill=rgb_color, outline="")
+        return f'#{color[2]:02x}{color[1]:02x}{color[0]:02x}'
+
+    def show_drawing_color(self, color, previous):
+        self.color_indicator.itemconfigure(self.color_indicator_rect, fill=self.to_hex(color))
+    
+    def show_palette(self, palette, previous):
+        for i, color in enumerate(palette):
+            if previous is None or previous[i] != color:
+                self.color_swatches[i].configure(bg=self.to_hex(color))
+    
+    def show_color_index(self, index, previous):
+        if previous is not None:
+            self.color_swatches[previous].config(highlightbackground="gray", highlightthickness=1)
+        self.color_swatches[index].config(highlightbackground="gold", highlightthickness=2)
     
     def choose_color(self):
         color = colorchooser.askcolor(initialcolor="#ff0000")[0]
@@ -221,11 +675,67 @@ class AdvancedGestureDrawingApp:
     
     def update_brush_size(self, event=None):
         self.brush_thickness = int(self.brush_size_slider.get())
-        # Update UI slider to match
-        self.brush_size_slider.set(self.brush_thickness)
+        # Snap the slider to the whole size on the next sync
+        self.ui_state.set('brush_size', self.brush_thickness)
+    
+    def push_undo(self, all_layers=False):
+        # Snapshot the layers about to change, with the stroke objects
+        layers = self.layers.layers if all_layers else [self.layers.active]
+        self.undo_stack.append(([(layer, layer.pixels.copy(), layer.base) for layer in layers],
+                                self.stroke_store.snapshot()))
+        if len(self.undo_stack) > self.max_undo:
+            self.undo_stack.pop(0)
+    
+    def undo(self):
+        if not self.undo_stack:
+            return
+        self.finish_stroke()
+        snapshot, objects = self.undo_stack.pop()
+        for layer, pixels, base in snapshot:
+            # Skip layers deleted since the snapshot
+            if layer in self.layers.layers:
+                np.copyto(layer.pixels, pixels)
+                layer.base = base
+        self.stroke_store.restore(objects, self.layers.layers)
+        self.selection = []
+        self.layers.invalidate(pixels_changed=True)
+        self.prev_point = None
+        self.shape_start_point = None
+    
+    def record_template(self):
+        if self.last_landmarks is None:
+            self.template_status_var.set("No hand in view")
+            return
+        action = self.template_action_var.get()
+        if self.template_store.add(action, self.last_landmarks):
+            self.template_status_var.set(f"{len(self.template_store)} custom gestures (added {action})")
+    
+    def clear_templates(self):
+        self.template_store.clear()
+        self.template_status_var.set("0 custom gestures")
+    
+    def cycle_color(self):
+        self.current_color_index = (self.current_color_index + 1) % len(self.color_palette)
+        self.drawing_color = self.color_palette[self.current_color_index]
+        self.update_color_indicator()
+        self.update_palette_highlight()
+    
+    def cycle_mode(self):
+        self.current_mode = (self.current_mode + 1) % len(self.MODES)
+        # Update the radio button in UI
+        self.ui_state.set('mode', self.mode_names[self.current_mode])
+        self.finish_stroke()
+        self.selection = []
+        self.prev_point = None
+        self.shape_start_point = None
     
     def clear_canvas(self):
-        self.canvas = np.zeros((self.canvas_height, self.canvas_width, 3), dtype=np.uint8)
+        self.push_undo(all_layers=True)
+        self.layers.clear()
+        self.stroke_builder = None
+        self.current_object = None
+        self.stroke_store.clear()
+        self.selection = []
         self.prev_point = None
         self.shape_start_point = None
     
@@ -243,36 +753,134 @@ class AdvancedGestureDrawingApp:
             initialdir="./drawings",
             initialfile=f"drawing_{timestamp}.png",
             defaultextension=".png",
-            filetypes=[("PNG files", "*.png"), ("JPEG files", "*.jpg"), ("All files", "*.*")]
+            filetypes=[("PNG files", "*.png"), ("JPEG files", "*.jpg"), ("SVG files", "*.svg"), 
+                       ("All files", "*.*")]
         )
         
         if filename:
-            # Save the canvas as an image file
-            cv2.imwrite(filename, self.canvas)
-            # Show confirmation
-            confirmation = tk.Toplevel(self.root)
-            confirmation.title("Success")
-            ttk.Label(confirmation, text=f"Drawing saved to {filename}").pack(padx=20, pady=20)
-            ttk.Button(confirmation, text="OK", command=confirmation.destroy).pack(pady=10)
+            # Save the flattened layers; PNG and SVG keep transparency,
+            # other formats get the ink over black
+            if filename.lower().endswith(".svg"):
+                # Vectorized in the background, confirmed when done
+                self.svg_export = self.svg_exporter.export(self.layers.to_bgra(), filename)
+                return
+            if filename.lower().endswith(".png"):
+                cv2.imwrite(filename, self.layers.to_bgra())
+            else:
+                cv2.imwrite(filename, self.layers.flatten()[:, :, :3])
+            self.show_confirmation(f"Drawing saved to {filename}")
+    
+    def show_confirmation(self, message):
+        confirmation = tk.Toplevel(self.root)
+        confirmation.title("Success")
+        ttk.Label(confirmation, text=message).pack(padx=20, pady=20)
+        ttk.Button(confirmation, text="OK", command=confirmation.destroy).pack(pady=10)
+    
+    def poll_svg_export(self):
+        # Confirm a background SVG export once it has finished
+        if self.svg_export is None or not self.svg_export.done():
+            return
+        export, self.svg_export = self.svg_export, None
+        try:
+            result = export.result()
+        except Exception as e:
+            messagebox.showerror("SVG export", f"Could not export the drawing: {e}")
+            return
+        self.show_confirmation(f"Drawing saved to {result['path']} "
+                               f"({result['colors']} colors, {result['seconds']:.2f} s)")
     
     def hsv_to_bgr(self, h, s=1.0, v=1.0):
         """Convert HSV color to BGR color (what OpenCV uses)"""
-        r, g, b = colorsys.hsv_to_rgb(h, s, v)
-        return (int(b * 255), int(g * 255), int(r * 255))
+        if s == 1.0 and v == 1.0:
+            return hue_to_bgr(h)
+        b, g, r = hue_to_bgr(h)
+        # Scale the fully saturated color down to the requested s and v
+        return tuple(int(v * (255 - (255 - c) * s)) for c in (b, g, r))
+    
+    def draw_path(self, path):
+        # Stamp the brush along an interpolated path on the active layer
+        for start_point, end_point in zip(path, path[1:]):
+            bbox = self.brush_engine.stroke(self.canvas, start_point, end_point, 
+                                            self.ink(), self.brush_thickness)
+            self.layers.mark_dirty(bbox)
+        if self.current_object is not None:
+            self.stroke_store.grow(self.current_object, self.current_object.extend(path))
+    
+    def begin_object(self, kind, points=(), radius=0):
+        # Start recording what the current gesture draws on the active layer
+        self.current_object = self.stroke_store.add(StrokeObject(
+            kind, self.layers.active, self.drawing_color, 
+            self.brush_thickness * 2 if kind == 'ERASE' else self.brush_thickness,
+            self.brush_engine.brush_type, points, radius))
+        return self.current_object
+    
+    def finish_stroke(self):
+        # End whatever the current drawing gesture is
+        if self.stroke_builder is not None:
+            path, points = self.stroke_builder.finish()
+            self.draw_path(path)
+            self.current_object.simplified = points
+            self.stroke_builder = None
+        self.current_object = None
+        self.erasing_objects = False
+        if self.lasso is not None:
+            if len(self.lasso) >= 3:
+                self.selection = self.stroke_store.select_lasso(self.lasso, self.layers.active)
+            self.lasso = None
+        elif self.moving_selection:
+            self.moving_selection = False
+            self.selection = []
+    
+    def redraw_objects(self, bboxes):
+        # Re-rasterize only the tiles the changed objects cover
+        self.stroke_store.rerasterize(self.layers.active, bboxes)
+        for bbox in bboxes:
+            self.layers.mark_dirty(bbox)
+    
+    def erase_objects_at(self, point):
+        hits = self.stroke_store.hit_test(point, self.brush_thickness, self.layers.active)
+        if not hits:
+            return
+        if not self.erasing_objects:
+            # One undo step per object eraser gesture
+            self.push_undo()
+            self.erasing_objects = True
+        for obj in hits:
+            self.stroke_store.remove(obj)
+        self.redraw_objects([obj.bbox for obj in hits])
+    
+    def move_selection(self, dx, dy):
+        if dx == 0 and dy == 0:
+            return
+        moved = [obj.translated(dx, dy) for obj in self.selection]
+        for old, new in zip(self.selection, moved):
+            self.stroke_store.replace(old, new)
+        self.redraw_objects([obj.bbox for obj in self.selection] + [obj.bbox for obj in moved])
+        self.selection = moved
+    
+    def selection_bbox(self):
+        bbox = None
+        for obj in self.selection:
+            bbox = obj.bbox if bbox is None else (min(bbox[0], obj.bbox[0]), min(bbox[1], obj.bbox[1]),
+                                                  max(bbox[2], obj.bbox[2]), max(bbox[3], obj.bbox[3]))
+        return bbox
     
     def draw_pattern(self, canvas, start_point, end_point, color, thickness):
-        # Draw a pattern between two points (example: dotted line)
+        # Draw a pattern between two points (example: dotted line). Returns
+        # the dots as (x, y, radius)
         dx = end_point[0] - start_point[0]
         dy = end_point[1] - start_point[1]
         distance = max(1, int(np.sqrt(dx*dx + dy*dy)))
         
-        for i in range(0, distance, 10):  # Adjust spacing
+        dots = []
+        for i in range(0, distance, self.pattern_spacing):
             # Calculate point position
             x = int(start_point[0] + dx * i / distance)
             y = int(start_point[1] + dy * i / distance)
             
             # Draw pattern element (circle in this case)
             cv2.circle(canvas, (x, y), thickness, color, -1)
+            dots.append((x, y, thickness))
             
             # Add some randomness for artistic effect
             if random.random() > 0.7:  # 30% chance for extra dot
@@ -280,179 +888,185 @@ class AdvancedGestureDrawingApp:
                 offset_y = random.randint(-10, 10)
                 cv2.circle(canvas, (x + offset_x, y + offset_y), 
                           thickness // 2, color, -1)
+                dots.append((x + offset_x, y + offset_y, thickness // 2))
+        return dots
     
     def detect_gestures(self, hand_landmarks):
         # Get landmark positions
         landmarks = [(int(lm.x * self.canvas_width), int(lm.y * self.canvas_height)) 
                      for lm in hand_landmarks.landmark]
         
+        self.last_landmarks = landmarks
+        self.hand_visible = True
+        
         # Index finger tip (drawing pointer)
         index_tip = landmarks[8]
         
         # Drawing control (index + middle finger up = not drawing)
+        # Drawing reacts to the raw frame so it adds no latency
         index_up = landmarks[8][1] < landmarks[6][1]  # Index finger up
         middle_up = landmarks[12][1] < landmarks[10][1]  # Middle finger up
         
+        was_drawing = self.is_drawing
         if index_up and middle_up:
-            self.is_drawing = False
-            # For shape modes, complete the shape when fingers are raised
-            if self.current_mode in [self.MODES['LINE'], self.MODES['RECTANGLE'], self.MODES['CIRCLE']] and self.shape_start_point is not None:
-                self.complete_shape()
-            self.prev_point = None
-            self.shape_start_point = None
+            self.stop_drawing()
         elif index_up:
-            self.is_drawing = True
-            # If starting to draw in shape mode, set start point
-            if self.current_mode in [self.MODES['LINE'], self.MODES['RECTANGLE'], self.MODES['CIRCLE']] and self.shape_start_point is None:
-                self.shape_start_point = index_tip
+            self.start_drawing(index_tip)
         else:
             self.is_drawing = False
+        if self.is_drawing != was_drawing:
+            self.publish_gesture('DRAW_START' if self.is_drawing else 'DRAW_STOP')
         
-        # Color change gesture (closed fist)
+        # Distances below are in hand sizes, independent of resolution
+        dynamics = self.gesture_dynamics
+        dynamics.update(landmarks, self.frame_time)
+        
+        # Closed fist (thumb tip close to pinky tip, fingers curled)
         thumb_tip = landmarks[4]
         pinky_tip = landmarks[20]
-        distance_thumb_pinky = np.sqrt((thumb_tip[0] - pinky_tip[0])**2 + (thumb_tip[1] - pinky_tip[1])**2)
         
-        # Check if fingers are curled (fist)
         all_fingers_down = all([
             landmarks[8][1] > landmarks[6][1],   # Index down
             landmarks[12][1] > landmarks[10][1], # Middle down
             landmarks[16][1] > landmarks[14][1], # Ring down
             landmarks[20][1] > landmarks[18][1]  # Pinky down
         ])
+        is_fist = dynamics.relative_distance(thumb_tip, pinky_tip) < dynamics.FIST_DISTANCE and all_fingers_down
         
-        # Closed fist gesture (cycle through preset colors)
-        if distance_thumb_pinky < 50 and all_fingers_down and not self.color_change_active:
-            self.color_change_active = True
-            # Cycle through preset color palette
-            self.current_color_index = (self.current_color_index + 1) % len(self.color_palette)
-            self.drawing_color = self.color_palette[self.current_color_index]
-            self.update_color_indicator()
-            self.update_palette_highlight()
-        elif distance_thumb_pinky >= 50 or not all_fingers_down:
-            self.color_change_active = False
-        
-        # OK gesture for color selection mode (thumb and index finger form a circle)
-        thumb_tip = landmarks[4]
-        index_tip = landmarks[8]
-        distance_thumb_index = np.sqrt((thumb_tip[0] - index_tip[0])**2 + (thumb_tip[1] - index_tip[1])**2)
-        
-        # Other fingers up for OK gesture
+        # OK gesture (thumb and index touch, other fingers up)
         other_fingers_up = all([
             landmarks[12][1] < landmarks[10][1],  # Middle up
             landmarks[16][1] < landmarks[14][1],  # Ring up
             landmarks[20][1] < landmarks[18][1]   # Pinky up
         ])
+        is_ok_gesture = dynamics.relative_distance(thumb_tip, index_tip) < dynamics.OK_DISTANCE and other_fingers_up
         
-        # OK gesture (thumb and index touch, other fingers up)
-        is_ok_gesture = distance_thumb_index < 30 and other_fingers_up
+        # Pinky up with the other fingers down
+        pinky_up = landmarks[20][1] < landmarks[18][1]
+        is_pinky_gesture = pinky_up and all([
+            landmarks[8][1] > landmarks[6][1],   # Index down
+            landmarks[12][1] > landmarks[10][1], # Middle down
+            landmarks[16][1] > landmarks[14][1]  # Ring down
+        ])
+        
+        # Open palm (all fingers up)
+        all_fingers_up = all([
+            landmarks[4][1] < landmarks[3][1],   # Thumb up
+            landmarks[8][1] < landmarks[6][1],   # Index up
+            landmarks[12][1] < landmarks[10][1], # Middle up
+            landmarks[16][1] < landmarks[14][1], # Ring up
+            landmarks[20][1] < landmarks[18][1]  # Pinky up
+        ])
         
-        if is_ok_gesture and not self.color_select_active:
+        # Thumb up with the other fingers down
+        thumb_up = landmarks[4][1] < landmarks[3][1] and landmarks[4][1] < landmarks[9][1]
+        
+        # Quick sideways sweep of the hovering hand (index and middle up,
+        # ring down): next page to the right, previous page to the left
+        if index_up and middle_up and landmarks[16][1] > landmarks[14][1]:
+            swipe = dynamics.swipe(index_tip, self.frame_time)
+            if swipe:
+                self.publish_gesture('SWIPE_RIGHT' if swipe > 0 else 'SWIPE_LEFT')
+                self.switch_page(self.pages.current + swipe)
+        else:
+            dynamics.end_swipe()
+        
+        features = {
+            'FIST': is_fist,
+            'OK': is_ok_gesture,
+            'PINKY': is_pinky_gesture,
+            'OPEN_PALM': all_fingers_up,
+            'THUMB_UP': thumb_up and all_fingers_down
+        }
+        
+        # A matching custom template takes precedence over the built-in gestures
+        template_action = self.template_store.classify(landmarks)
+        if template_action is not None:
+            features = {'TEMPLATE_' + template_action.upper(): True}
+        
+        # Debounce the discrete gestures over the last few frames
+        fired, held = self.gesture_recognizer.update(features, self.frame_time)
+        
+        # Closed fist: cycle through preset colors
+        if 'FIST' in fired or 'TEMPLATE_COLOR' in fired:
+            self.cycle_color()
+            self.publish_gesture('FIST')
+        
+        # OK gesture: color selection mode
+        if 'OK' in held and not self.color_select_active:
             # Enter color selection mode
             self.color_select_active = True
-            self.color_select_start_pos = index_tip[0]
-        elif self.color_select_active and is_ok_gesture:
+            dynamics.begin_hue(index_tip[0])
+            self.publish_gesture('OK_START', self.hue)
+        elif 'OK' in held:
             # In color selection mode, move left/right to change hue
-            movement = (index_tip[0] - self.color_select_start_pos) / self.canvas_width
-            # Update hue based on horizontal position (wrap around 0-1)
-            self.hue = (self.hue + movement) % 1.0
-            self.color_select_start_pos = index_tip[0]
+            self.hue = (self.hue + dynamics.hue_shift(index_tip[0])) % 1.0
             
             # Convert HSV to BGR and update color
             self.drawing_color = self.hsv_to_bgr(self.hue, 1.0, 1.0)
             self.update_color_indicator()
-        elif not is_ok_gesture:
+        elif self.color_select_active:
             self.color_select_active = False
+            self.publish_gesture('OK_END', self.hue)
         
         # Brush size adjustment (pinky finger)
-        pinky_tip = landmarks[20]
-        pinky_up = landmarks[20][1] < landmarks[18][1]  # Pinky finger up
-        other_fingers_down = all([
-            landmarks[8][1] > landmarks[6][1],   # Index down
-            landmarks[12][1] > landmarks[10][1], # Middle down
-            landmarks[16][1] > landmarks[14][1]  # Ring down
-        ])
-        
-        # First time raising pinky
-        if pinky_up and other_fingers_down and not self.brush_size_active:
+        if 'PINKY' in held and not self.brush_size_active:
+            # First time raising pinky
             self.brush_size_active = True
-            self.initial_pinky_y = pinky_tip[1]
-        # Continuing to adjust with pinky
-        elif pinky_up and other_fingers_down and self.brush_size_active:
-            if self.initial_pinky_y is not None:
-                # Calculate vertical movement
-                delta_y = self.initial_pinky_y - pinky_tip[1]
-                # Map vertical position to brush size (1-30)
-                # Moving up increases size, moving down decreases
-                new_size = int(self.brush_thickness + (delta_y / 100))  # Adjust sensitivity
-                new_size = max(1, min(30, new_size))  # Clamp between 1 and 30
-                
-                if abs(new_size - self.brush_thickness) > 0:
-                    self.brush_thickness = new_size
-                    self.update_brush_size()
-                    self.initial_pinky_y = pinky_tip[1]  # Update reference point
-        # Released pinky
-        elif not pinky_up and self.brush_size_active:
+            dynamics.begin_brush_size(pinky_tip[1], self.brush_thickness)
+            self.publish_gesture('PINKY_START', self.brush_thickness)
+        elif 'PINKY' in held:
+            # The size follows the pinky's height: up for bigger, down for smaller
+            new_size = dynamics.brush_size(pinky_tip[1], self.brush_thickness)
+            if new_size != self.brush_thickness:
+                self.brush_thickness = new_size
+                self.ui_state.set('brush_size', self.brush_thickness)
+        elif self.brush_size_active:
+            # Released pinky
             self.brush_size_active = False
-            self.initial_pinky_y = None
+            self.publish_gesture('PINKY_END', self.brush_thickness)
         
-        # Clear canvas gesture (open palm)
-        all_fingers_up = all([
-            landmarks[4][1] < landmarks[3][1],   # Thumb up
-            landmarks[8][1] < landmarks[6][1],   # Index up
-            landmarks[12][1] < landmarks[10][1], # Middle up
-            landmarks[16][1] < landmarks[14][1], # Ring up
-            landmarks[20][1] < landmarks[18][1]  # Pinky up
-        ])
-        
-        if all_fingers_up and not self.clear_gesture_active:
-            self.clear_gesture_active = True
+        # Open palm: clear canvas
+        if 'OPEN_PALM' in fired or 'TEMPLATE_CLEAR' in fired:
             self.clear_canvas()
-        elif not all_fingers_up:
-            self.clear_gesture_active = False
+            self.publish_gesture('OPEN_PALM')
         
-        # Thumb up gesture to change mode
-        thumb_up = landmarks[4][1] < landmarks[3][1] and landmarks[4][1] < landmarks[9][1]
-        other_fingers_down = all([
-            landmarks[8][1] > landmarks[6][1],  # Index down
-            landmarks[12][1] > landmarks[10][1],  # Middle down
-            landmarks[16][1] > landmarks[14][1],  # Ring down
-            landmarks[20][1] > landmarks[18][1]   # Pinky down
-        ])
+        # Thumb up: cycle through drawing modes
+        if 'THUMB_UP' in fired or 'TEMPLATE_MODE' in fired:
+            self.cycle_mode()
+            self.publish_gesture('THUMB_UP', self.current_mode)
         
-        if thumb_up and other_fingers_down and not self.mode_change_active:
-            self.mode_change_active = True
-            # Cycle through drawing modes
-            self.current_mode = (self.current_mode + 1) % len(self.MODES)
-            # Update the radio button in UI
-            self.mode_var.set(self.mode_names[self.current_mode])
-            self.prev_point = None
-            self.shape_start_point = None
-        elif not (thumb_up and other_fingers_down):
-            self.mode_change_active = False
+        if 'TEMPLATE_UNDO' in fired:
+            self.undo()
         
+        self.publish_gesture('POINTER', self.brush_thickness)
         return index_tip
     
+    def publish_gesture(self, name, value=0.0):
+        # Events carry the index fingertip, normalized to the canvas
+        if self.gesture_events is not None:
+            x, y = self.last_landmarks[8]
+            self.gesture_events.publish(name, self.frame_time, (x / self.canvas_width, y / self.canvas_height), 
+                                        value, self.is_drawing)
+    
     def complete_shape(self):
         if self.shape_start_point is not None and self.prev_point is not None:
-            if self.current_mode == self.MODES['LINE']:
-                cv2.line(self.canvas, self.shape_start_point, self.prev_point, 
-                         self.drawing_color, self.brush_thickness)
-            
-            elif self.current_mode == self.MODES['RECTANGLE']:
-                cv2.rectangle(self.canvas, self.shape_start_point, self.prev_point, 
-                             self.drawing_color, self.brush_thickness)
-            
-            elif self.current_mode == self.MODES['CIRCLE']:
+            self.push_undo()
+            kind = self.mode_names[self.current_mode]
+            if kind == 'CIRCLE':
                 # Calculate radius from the distance between points
                 dx = self.prev_point[0] - self.shape_start_point[0]
                 dy = self.prev_point[1] - self.shape_start_point[1]
-                radius = int(np.sqrt(dx*dx + dy*dy))
-                cv2.circle(self.canvas, self.shape_start_point, radius, 
-                          self.drawing_color, self.brush_thickness)
+                shape = self.begin_object(kind, [self.shape_start_point], int(np.sqrt(dx*dx + dy*dy)))
+            else:
+                shape = self.begin_object(kind, [self.shape_start_point, self.prev_point])
+            # Drawn by the object itself so a later redraw matches exactly
+            shape.render(self.canvas, (0, 0), self.brush_engine)
+            self.layers.mark_dirty(shape.bbox)
+            self.current_object = None
     
     def update_frame(self):
-        current_time = time.time()
+        current_time = time.monotonic()
         elapsed = current_time - self.last_frame_time
         
         # Calculate FPS
@@ -461,170 +1075,423 @@ class AdvancedGestureDrawingApp:
             self.frame_times.pop(0)
         self.fps = 1.0 / (sum(self.frame_times) / len(self.frame_times))
         
-        ret, frame = self.cap.read()
-        if ret:
-            # Flip the frame horizontally for a more intuitive mirroring effect
-            frame = cv2.flip(frame, 1)
-            
-            # Resize frame to fit our canvas dimensions
-            frame = cv2.resize(frame, (self.canvas_width, self.canvas_height))
-            
-            # Convert the image to RGB for MediaPipe
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Process hand landmarks
-            results = self.hands.process(rgb_frame)
-            
-            # Create a temporary canvas for shape preview
-            if self.current_mode in [self.MODES['LINE'], self.MODES['RECTANGLE'], self.MODES['CIRCLE']]:
-                self.temp_canvas = self.canvas.copy()
-            
-            # Draw hand landmarks
-            if results.multi_hand_landmarks:
-                for hand_landmarks in results.multi_hand_landmarks:
-                    # Draw landmarks on the frame
+        self.poll_startup()
+        # Finished page spills and prefetches
+        self.pages.poll()
+        self.poll_svg_export()
+        
+        ret, frame, captured = self.source.read() if self.source is not None else (False, None, None)
+        if not ret:
+            # Camera still opening (or missing): keep drawing on a plain background
+            frame, captured = self.placeholder_frame, current_time
+        start = time.perf_counter()
+        # Gestures are timed by when the frame was captured
+        combined_img = self.process_frame(frame, captured)
+        processed = time.perf_counter()
+        
+        # Scaled down for display at the lowest quality level
+        if self.display_scale < 1.0:
+            combined_img = cv2.resize(combined_img, None, fx=self.display_scale, fy=self.display_scale)
+        
+        # Convert to RGB for tkinter
+        rgb_img = cv2.cvtColor(combined_img, cv2.COLOR_BGR2RGB)
+        
+        # Convert to ImageTk format
+        img = Image.fromarray(rgb_img)
+        imgtk = ImageTk.PhotoImage(image=img)
+        
+        # Update the UI
+        self.video_frame.imgtk = imgtk
+        self.video_frame.configure(image=imgtk)
+        
+        # Step the quality level on the time actually spent (not the
+        # wait for the camera)
+        self.stage_times['drawing'] = processed - start - self.stage_times.get('tracking', 0.0)
+        self.stage_times['display'] = time.perf_counter() - processed
+        if self.quality.update(self.stage_times, current_time):
+            self.apply_quality()
+        
+        if ret and self.source.realtime:
+            self.latency = time.monotonic() - captured
+        
+        self.loader.mark('first_interactive_frame')
+        if ret and self.hands is not None:
+            self.loader.mark('first_tracked_frame')
+        if not self.loader.busy() and not self.loader.reported:
+            try:
+                self.loader.report(self.startup_report)
+            except OSError as e:
+                # Reported once either way, the frame loop carries on
+                print(f"Could not write the startup report: {e}")
+        
+        # Push whatever the gestures changed this frame to the widgets
+        self.ui_state.sync()
+        
+        # Hand changed tiles to the background autosave when one is due
+        if not self.resume_pending:
+            self.autosaver.tick(self.layers.layers, self.session_state, current_time)
+        
+        # Calculate next frame delay to maintain target FPS
+        frame_time = time.monotonic() - current_time
+        delay = max(1, int((self.idle_monitor.frame_interval(self.frame_interval) - frame_time) * 1000))
+        self.last_frame_time = current_time
+        
+        # Schedule next frame
+        self.root.after(delay, self.update_frame)
+    
+    def process_frame(self, frame, current_time, render=True):
+        # Run tracking, gestures and drawing on one camera frame. Returns the
+        # composited BGR image, or None when render is False (headless use)
+        self.frame_time = current_time
+        
+        # Mirror and scale to the display size, with a downscaled RGB
+        # copy for MediaPipe
+        frame, rgb_frame = self.preprocessor.process(frame)
+        
+        # Process hand landmarks; while idle, only when something moves
+        hand_landmarks_list = None
+        tracking_start = time.perf_counter()
+        if self.hands is not None and self.idle_monitor.should_run_inference(rgb_frame, current_time):
+            hand_landmarks_list = self.hands.process(rgb_frame).multi_hand_landmarks
+        self.stage_times['tracking'] = time.perf_counter() - tracking_start
+        self.idle_monitor.update(bool(hand_landmarks_list), current_time)
+        
+        preview_canvas = None
+        if hand_landmarks_list:
+            for hand_landmarks in hand_landmarks_list:
+                # Draw landmarks on the frame
+                if render and self.draw_landmarks:
                     self.mp_draw.draw_landmarks(
                         frame, 
                         hand_landmarks, 
                         self.mp_hands.HAND_CONNECTIONS
                     )
-                    
-                    # Detect gestures and get current pointer position
-                    pointer_pos = self.detect_gestures(hand_landmarks)
-                    
-                    # Draw based on the current mode
-                    if self.is_drawing:
-                        # Freestyle drawing
-                        if self.current_mode == self.MODES['FREESTYLE']:
-                            if self.prev_point is None:
-                                self.prev_point = pointer_pos
-                            else:
-                                cv2.line(self.canvas, self.prev_point, pointer_pos, 
-                                        self.drawing_color, self.brush_thickness)
-                                self.prev_point = pointer_pos
-                        
-                        # Eraser mode
-                        elif self.current_mode == self.MODES['ERASER']:
-                            if self.prev_point is None:
-                                self.prev_point = pointer_pos
-                            else:
-                                # Draw with black (background color)
-                                cv2.line(self.canvas, self.prev_point, pointer_pos, 
-                                        (0, 0, 0), self.brush_thickness * 2)  # Make eraser larger
-                                self.prev_point = pointer_pos
-                        
-                        # Pattern brush
-                        elif self.current_mode == self.MODES['PATTERN']:
-                            if self.prev_point is None:
-                                self.prev_point = pointer_pos
-                            else:
-                                self.draw_pattern(self.canvas, self.prev_point, pointer_pos, 
-                                                 self.drawing_color, self.brush_thickness)
-                                self.prev_point = pointer_pos
-                        
-                        # Shape drawing (preview)
-                        elif self.current_mode in [self.MODES['LINE'], self.MODES['RECTANGLE'], self.MODES['CIRCLE']]:
-                            if self.shape_start_point is not None:
-                                self.prev_point = pointer_pos
-                                
-                                # Create a temporary canvas for preview
-                                temp_canvas = self.canvas.copy()
-                                
-                                if self.current_mode == self.MODES['LINE']:
-                                    cv2.line(temp_canvas, self.shape_start_point, pointer_pos, 
-                                            self.drawing_color, self.brush_thickness)
-                                
-                                elif self.current_mode == self.MODES['RECTANGLE']:
-                                    cv2.rectangle(temp_canvas, self.shape_start_point, pointer_pos, 
-                                                self.drawing_color, self.brush_thickness)
-                                
-                                elif self.current_mode == self.MODES['CIRCLE']:
-                                    # Calculate radius from the distance between points
-                                    dx = pointer_pos[0] - self.shape_start_point[0]
-                                    dy = pointer_pos[1] - self.shape_start_point[1]
-                                    radius = int(np.sqrt(dx*dx + dy*dy))
-                                    cv2.circle(temp_canvas, self.shape_start_point, radius, 
-                                            self.drawing_color, self.brush_thickness)
-                                
-                                # Use the temporary canvas for display
-                                combined_img = cv2.addWeighted(frame, 0.7, temp_canvas, 0.7, 0)
-                                
-                                # Convert to RGB for tkinter
-                                rgb_img = cv2.cvtColor(combined_img, cv2.COLOR_BGR2RGB)
-                                
-                                # Convert to ImageTk format
-                                img = Image.fromarray(rgb_img)
-                                imgtk = ImageTk.PhotoImage(image=img)
-                                
-                                # Update the UI
-                                self.video_frame.imgtk = imgtk
-                                self.video_frame.configure(image=imgtk)
-                                
-                                # Skip the rest of the update to avoid overwriting our preview
-                                self.root.after(33, self.update_frame)
-                                return
-                    else:
-                        # Draw a circle at the pointer position
+                
+                # Detect gestures and get current pointer position
+                pointer_pos = self.detect_gestures(hand_landmarks)
+                
+                if self.is_drawing:
+                    preview_canvas = self.draw_at(pointer_pos, render)
+                else:
+                    self.finish_stroke()
+                    # Draw a circle at the pointer position
+                    if render:
                         cv2.circle(frame, pointer_pos, 10, self.drawing_color, -1)
+        elif self.mouse_down:
+            # Mouse or touch drawing, also while hand tracking is loading
+            self.mouse_drawing = True
+            self.start_drawing(self.mouse_pos)
+            preview_canvas = self.draw_at(self.mouse_pos, render)
+        else:
+            if self.mouse_drawing:
+                self.mouse_drawing = False
+                self.stop_drawing()
+            self.finish_stroke()
+            self.prev_point = None
+            self.gesture_recognizer.update({}, current_time)
+            self.gesture_dynamics.reset()
+            if self.hand_visible:
+                self.hand_visible = False
+                self.publish_gesture('HAND_LOST')
+        
+        if not render:
+            return None
+        
+        # Mode, FPS, brush size and (in color selection) the hue wheel
+        if current_time - self.fps_display_time >= 0.5:
+            self.fps_display = int(self.fps)
+            if self.latency is not None:
+                self.latency_display = int(self.latency * 1000)
+            self.fps_display_time = current_time
+        hud_texts = [
+            (f"Mode: {self.mode_names[self.current_mode]}", (50, 40)),
+            (f"FPS: {self.fps_display}", (10, 70))
+        ]
+        if self.latency_display is not None:
+            hud_texts.append((f"Latency: {self.latency_display} ms", (10, 100)))
+        if self.color_select_active:
+            hud_texts.append(("Color Selection Mode", (10, 30)))
+        if self.idle_monitor.idle:
+            hud_texts.append(("Idle", (self.canvas_width - 90, 30)))
+        self.hud.draw(frame, hud_texts, self.brush_thickness, self.drawing_color, 
+                      self.hue if self.color_select_active else None)
+        if not self.headless and self.startup_status is not None:
+            cv2.putText(frame, self.startup_status, (10, self.canvas_height - 15), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        
+        # Lasso in progress and the selected objects' bounds
+        if self.lasso is not None and len(self.lasso) > 1:
+            cv2.polylines(frame, [np.array(self.lasso, dtype=np.int32)], False, (255, 255, 255), 1)
+        selection_bbox = self.selection_bbox()
+        if selection_bbox is not None:
+            cv2.rectangle(frame, selection_bbox[:2], (selection_bbox[2] - 1, selection_bbox[3] - 1), 
+                          (255, 255, 255), 1)
+        
+        # Combine the cached layer composite (or the shape preview) with the frame
+        if preview_canvas is None:
+            preview_canvas = self.layers.flatten()
+        output = self.blend_engine.blend(frame, preview_canvas)
+        if self.frame_sink is not None:
+            self.frame_sink.publish(output, current_time)
+        return output
+    
+    def draw_at(self, pointer_pos, render=True):
+        # Draw based on the current mode. Shape modes return a preview of
+        # the composite with the shape in progress
+        # Freestyle drawing
+        if self.current_mode == self.MODES['FREESTYLE']:
+            if self.stroke_builder is None:
+                self.push_undo()
+                self.stroke_builder = StrokeBuilder()
+                bbox = self.brush_engine.begin_stroke(self.canvas, pointer_pos, 
+                                                      self.ink(), self.brush_thickness)
+                self.layers.mark_dirty(bbox)
+                self.begin_object('BRUSH', [pointer_pos])
+            self.draw_path(self.stroke_builder.add(pointer_pos))
+            self.prev_point = pointer_pos
+        
+        # Eraser mode
+        elif self.current_mode == self.MODES['ERASER']:
+            # finish_stroke() may have ended the object mid-gesture (undo,
+            # mode or page change), so start a new one from here
+            if self.prev_point is None or self.current_object is None:
+                self.push_undo()
+                self.begin_object('ERASE', [pointer_pos])
+                self.prev_point = pointer_pos
             else:
-                self.prev_point = None
-            
-            # Show mode indicators
-            if self.color_select_active:
-                cv2.putText(frame, "Color Selection Mode", (10, 30), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+                # Clear alpha on the active layer
+                cv2.line(self.canvas, self.prev_point, pointer_pos, 
+                        self.layers.active.ERASE_VALUE, self.brush_thickness * 2)  # Make eraser larger
+                self.mark_dirty(self.prev_point, pointer_pos, self.brush_thickness * 2)
+                self.stroke_store.grow(self.current_object, self.current_object.extend([pointer_pos]))
+                self.prev_point = pointer_pos
+        
+        # Pattern brush
+        elif self.current_mode == self.MODES['PATTERN']:
+            if self.prev_point is None or self.current_object is None:
+                self.push_undo()
+                self.begin_object('PATTERN')
+                self.prev_point = pointer_pos
+            else:
+                dots = self.draw_pattern(self.canvas, self.prev_point, pointer_pos, 
+                                         self.ink(), self.brush_thickness)
+                # Pattern dots scatter up to 10px off the path
+                self.mark_dirty(self.prev_point, pointer_pos, self.brush_thickness + 10)
+                self.stroke_store.grow(self.current_object, self.current_object.add_dots(dots))
+                self.prev_point = pointer_pos
+        
+        # Object eraser: removes whole objects under the fingertip
+        elif self.current_mode == self.MODES['OBJECT_ERASER']:
+            self.erase_objects_at(pointer_pos)
+            self.prev_point = pointer_pos
+        
+        # Lasso select, then drag the selection with the next stroke
+        elif self.current_mode == self.MODES['SELECT']:
+            if self.selection:
+                if not self.moving_selection:
+                    self.push_undo()
+                    self.moving_selection = True
+                elif self.prev_point is not None:
+                    self.move_selection(pointer_pos[0] - self.prev_point[0], 
+                                        pointer_pos[1] - self.prev_point[1])
+            else:
+                if self.lasso is None:
+                    self.lasso = []
+                self.lasso.append(pointer_pos)
+            self.prev_point = pointer_pos
+        
+        # Shape drawing (preview)
+        elif self.current_mode in [self.MODES['LINE'], self.MODES['RECTANGLE'], self.MODES['CIRCLE']]:
+            if self.shape_start_point is not None:
+                self.prev_point = pointer_pos
+                if not render:
+                    return None
                 
-                # Draw color wheel indicator
-                wheel_center = (self.canvas_width - 50, 50)
-                wheel_radius = 30
-                cv2.circle(frame, wheel_center, wheel_radius, (255, 255, 255), 2)
+                # Create a temporary copy of the composite for preview
+                temp_canvas = self.layers.flatten().copy()
+                ink = opaque_ink(self.drawing_color)
                 
-                # Draw current hue marker
-                angle = self.hue * 2 * np.pi
-                marker_x = int(wheel_center[0] + wheel_radius * np.cos(angle))
-                marker_y = int(wheel_center[1] + wheel_radius * np.sin(angle))
-                cv2.circle(frame, (marker_x, marker_y), 5, self.drawing_color, -1)
-            
-            # Draw current brush size indicator
-            cv2.circle(frame, (30, 30), self.brush_thickness, self.drawing_color, -1)
-            
-            # Display current mode
-            mode_text = f"Mode: {self.mode_names[self.current_mode]}"
-            cv2.putText(frame, mode_text, (50, 40), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            
-            # Display FPS
-            cv2.putText(frame, f"FPS: {int(self.fps)}", (10, 70), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            
-            # Combine canvas with frame
-            combined_img = cv2.addWeighted(frame, 0.7, self.canvas, 0.7, 0)
-            
-            # Convert to RGB for tkinter
-            rgb_img = cv2.cvtColor(combined_img, cv2.COLOR_BGR2RGB)
-            
-            # Convert to ImageTk format
-            img = Image.fromarray(rgb_img)
-            imgtk = ImageTk.PhotoImage(image=img)
-            
-            # Update the UI
-            self.video_frame.imgtk = imgtk
-            self.video_frame.configure(image=imgtk)
+                if self.current_mode == self.MODES['LINE']:
+                    cv2.line(temp_canvas, self.shape_start_point, pointer_pos, 
+                            ink, self.brush_thickness)
+                
+                elif self.current_mode == self.MODES['RECTANGLE']:
+                    cv2.rectangle(temp_canvas, self.shape_start_point, pointer_pos, 
+                                ink, self.brush_thickness)
+                
+                elif self.current_mode == self.MODES['CIRCLE']:
+                    # Calculate radius from the distance between points
+                    dx = pointer_pos[0] - self.shape_start_point[0]
+                    dy = pointer_pos[1] - self.shape_start_point[1]
+                    radius = int(np.sqrt(dx*dx + dy*dy))
+                    cv2.circle(temp_canvas, self.shape_start_point, radius, 
+                            ink, self.brush_thickness)
+                return temp_canvas
+        return None
+    
+    def session_state(self):
+        # Everything besides layer pixels needed to resume a session
+        state = {
+            'drawing_color': list(self.drawing_color),
+            'brush_thickness': self.brush_thickness,
+            'brush_type': self.brush_engine.brush_type,
+            'mode': self.mode_names[self.current_mode],
+            'color_palette': [list(c) for c in self.color_palette],
+            'current_color_index': self.current_color_index,
+            'hue': self.hue,
+            # The current page's layers are in the layer files, the other
+            # pages in the page files saved when they were left
+            'current_page': self.pages.current,
+            'pages': [dict(self.layer_state(page.layers), id=page.id) for page in self.pages.pages]
+        }
+        state.update(self.layer_state(self.layers))
+        return state
+    
+    def layer_state(self, layers):
+        state = {
+            'active_layer': layers.active_index,
+            'layers': [
+                {'name': layer.name, 'visible': layer.visible, 'opacity': layer.opacity}
+                for layer in layers.layers
+            ]
+        }
+        if layers.palette is not None:
+            state['ink_palette'] = [list(c) for c in layers.palette.colors()]
+        return state
+    
+    def offer_resume(self):
+        try:
+            self.resume_previous_session()
+        finally:
+            self.resume_pending = False
+    
+    def resume_previous_session(self):
+        if not self.autosaver.has_session():
+            return
+        try:
+            state, arrays = self.autosaver.load()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not read previous session: {e}")
+            self.autosaver.discard()
+            return
         
-        # Calculate next frame delay to maintain target FPS
-        frame_time = time.time() - current_time
-        delay = max(1, int((self.frame_interval - frame_time) * 1000))
-        self.last_frame_time = current_time
+        shape_ok = all(a.shape[:2] == self.canvas.shape[:2] for a in arrays)
+        if shape_ok and messagebox.askyesno("Resume Session", "Resume your previous drawing session?"):
+            self.restore_session(state, arrays)
+        else:
+            self.autosaver.discard()
+    
+    def restore_session(self, state, arrays):
+        # Rebuild the pages, indexed or not as the session was saved, keeping
+        # their ids so the page files of pages not visited again stay valid
+        pages = state.get('pages', [{'id': self.pages.page.id}])
+        self.pages.indexed = 'ink_palette' in state
+        self.pages.reset([page['id'] for page in pages], state.get('current_page', 0))
+        # Pages left before the answer belong to the discarded blank document
+        self.autosaver.pending_pages = {}
+        for index, info in enumerate(pages):
+            page = self.pages.pages[index]
+            if index == self.pages.current:
+                # Copy the mapped layer files straight into the current page
+                self.restore_layers(page.layers, state, arrays)
+                continue
+            try:
+                page_arrays = self.autosaver.load_page(info['id'])
+            except READ_ERRORS as e:
+                print(f"Could not read page {index + 1} of the previous session: {e}")
+            else:
+                if all(a.shape[:2] == self.canvas.shape[:2] for a in page_arrays):
+                    self.restore_layers(page.layers, info, page_arrays)
+            # Other pages spill to disk as usual once too many are in memory
+            self.pages.admit(page)
+        self.layers = self.pages.page.layers
+        self.stroke_store.clear()
+        self.selection = []
+        self.ui_state.set('page', (self.pages.current + 1, len(self.pages)))
         
-        # Schedule next frame
-        self.root.after(delay, self.update_frame)
+        self.color_palette = [tuple(c) for c in state['color_palette']]
+        self.current_color_index = state['current_color_index']
+        self.drawing_color = tuple(state['drawing_color'])
+        self.hue = state['hue']
+        self.brush_thickness = state['brush_thickness']
+        self.ui_state.set('brush_size', self.brush_thickness)
+        self.brush_engine.brush_type = state['brush_type']
+        self.brush_var.set(state['brush_type'])
+        self.current_mode = self.MODES[state['mode']]
+        self.ui_state.set('mode', state['mode'])
+        
+        self.update_color_indicator()
+        self.update_palette_highlight()
+        self.refresh_layer_list()
+    
+    def restore_layers(self, layers, info, arrays):
+        for color in info.get('ink_palette', []):
+            layers.palette.index(color)
+        for index, (layer_info, pixels) in enumerate(zip(info['layers'], arrays)):
+            layer = layers.active if index == 0 else layers.add_layer()
+            layer.name = layer_info['name']
+            layer.visible = layer_info['visible']
+            layer.opacity = layer_info['opacity']
+            np.copyto(layer.pixels, pixels)
+            # Restored pixels aren't objects; they stay under anything redrawn
+            layer.base = layer.pixels.copy()
+        layers.layer_count = len(arrays)
+        layers.set_active(info['active_layer'])
+        layers.invalidate()
     
     def on_closing(self):
-        self.cap.release()
+        self.finish_stroke()
+        self.autosaver.close(self.layers.layers, self.session_state)
+        self.pages.close()
+        self.svg_exporter.close()
+        if self.frame_sink is not None:
+            self.frame_sink.close()
+        if self.gesture_events is not None:
+            self.gesture_events.close()
+        if self.source is not None:
+            self.source.close()
         self.root.destroy()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Advanced gesture drawing app")
+    parser.add_argument("--display-size", type=parse_size, default=DISPLAY_SIZE,
+                        help="canvas and display resolution, e.g. 1280x720")
+    parser.add_argument("--inference-size", type=parse_size, default=INFERENCE_SIZE,
+                        help="hand tracking input resolution, e.g. 256x192")
+    parser.add_argument("--idle-after", type=float, default=10.0,
+                        help="seconds without a hand before entering power-saving idle mode")
+    parser.add_argument("--indexed", action="store_true",
+                        help="store layers as palette indices, a quarter of the memory")
+    parser.add_argument("--shm-name", help="publish composited frames to this POSIX shared-memory ring")
+    parser.add_argument("--fifo", help="stream raw BGR24 frames to this named pipe (created if missing)")
+    parser.add_argument("--blend-mode", choices=BLEND_MODES, default="over",
+                        help="how ink is composited over the video")
+    parser.add_argument("--ink-opacity", type=float, default=1.0, help="ink opacity, 0 to 1")
+    parser.add_argument("--video-opacity", type=float, default=1.0, help="video brightness under the ink, 0 to 1")
+    parser.add_argument("--target-fps", type=float, default=30, help="frame rate the quality controller holds")
+    parser.add_argument("--latency-target", type=float, help="max processing time per frame in ms")
+    parser.add_argument("--fixed-quality", action="store_true", help="always run at full quality")
+    parser.add_argument("--startup-report", help="write startup timings (seconds) to this JSON file")
+    parser.add_argument("--events", type=parse_address, action="append", 
+                        help="publish gesture events to udp:host:port or unix:/path (repeatable)")
+    add_source_arguments(parser)
+    args = parser.parse_args()
+    
+    latency_target = args.latency_target / 1000.0 if args.latency_target else None
+    quality = QualityController(args.target_fps, latency_target, 
+                                levels=QUALITY_LEVELS[:1] if args.fixed_quality else None)
+    
+    # Optional raw frame output for other programs
+    frame_sink = None
+    if args.shm_name or args.fifo:
+        frame_sink = FrameSink(*args.display_size, shm_name=args.shm_name, fifo_path=args.fifo)
+    gesture_events = GesturePublisher(args.events) if args.events else None
+    
     root = tk.Tk()
-    app = AdvancedGestureDrawingApp(root)
+    app = AdvancedGestureDrawingApp(root, display_size=args.display_size, inference_size=args.inference_size,
+              idle_after=args.idle_after, frame_sink=frame_sink, indexed=args.indexed,
+              blend_engine=BlendEngine(args.blend_mode, args.ink_opacity, args.video_opacity),
+              target_fps=args.target_fps, quality=quality, startup_report=args.startup_report, 
+              gesture_events=gesture_events, frame_source=source_from_args(args))
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop() 
\ No newline at end of file
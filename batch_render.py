@@ -0,0 +1,193 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+import cv2
+import mediapipe as mp
+
+from advanced_gesture_drawing import AdvancedGestureDrawingApp
+from frame_pipeline import DISPLAY_SIZE, INFERENCE_SIZE, parse_size
+from frame_source import IMAGE_EXTENSIONS, create_source
+
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+SUMMARY_FILE = "summary.json"
+
+# Per-worker state, set up once by init_worker
+worker_hands = None
+worker_options = None
+
+
+def init_worker(options):
+    # One MediaPipe Hands graph per worker process, reused for every video
+    global worker_hands, worker_options
+    worker_options = options
+    worker_hands = mp.solutions.hands.Hands(
+        static_image_mode=False,
+        max_num_hands=1,
+        min_detection_confidence=0.7,
+        min_tracking_confidence=0.7
+    )
+
+
+def find_recordings(input_dir, skip_dir=None):
+    """(kind, path, name) for every recording under input_dir
+
+    Videos are found at any depth, and a directory holding images is one
+    recording. The name is the path relative to input_dir, extension kept,
+    so it is unique and stable between runs.
+    """
+    recordings = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs[:] = sorted(d for d in dirs
+                         if skip_dir is None or os.path.realpath(os.path.join(root, d)) != skip_dir)
+        if root != input_dir and any(f.lower().endswith(IMAGE_EXTENSIONS) for f in files):
+            recordings.append(('images', root))
+            dirs[:] = []
+        recordings += [('video', os.path.join(root, f)) for f in sorted(files)
+                       if f.lower().endswith(VIDEO_EXTENSIONS)]
+    return [(kind, path, os.path.relpath(path, input_dir).replace(os.sep, "/"))
+            for kind, path in recordings]
+
+
+def output_name(name):
+    # a.mp4 and a.avi (or a/b.mp4 and b.mp4) get separate drawings
+    return name + ".png"
+
+
+def render_video(job):
+    """Replay one recording (video or image directory) through the drawing logic and save the result"""
+    kind, video_path, name = job
+    output_path = os.path.join(worker_options["output_dir"], output_name(name))
+    start = time.perf_counter()
+
+    source = None
+    app = None
+    try:
+        # As fast as it decodes, on the recording's own clock
+        source = create_source(kind, video_path, realtime=False, fps=worker_options["image_fps"]).open()
+        if not source.is_open():
+            return {"name": name, "error": f"could not open {kind}"}
+
+        app = AdvancedGestureDrawingApp(
+            None,
+            display_size=worker_options["display_size"],
+            inference_size=worker_options["inference_size"],
+            idle_after=float("inf"),
+            hands=worker_hands,
+            indexed=worker_options["indexed"]
+        )
+        frames = 0
+        while True:
+            ret, frame, timestamp = source.read()
+            if not ret:
+                break
+            # Gesture timing follows the video clock, not the wall clock
+            app.process_frame(frame, timestamp, render=False)
+            frames += 1
+        app.finish_stroke()
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        if not cv2.imwrite(output_path, app.layers.to_bgra()):
+            return {"name": name, "error": f"could not write {output_name(name)}"}
+    except Exception as e:
+        # A broken recording is reported in the summary, the rest of the run goes on
+        return {"name": name, "error": f"{type(e).__name__}: {e}"}
+    finally:
+        # The workers are reused, don't leave threads or page files behind
+        if source is not None:
+            source.close()
+        if app is not None:
+            app.pages.close()
+            app.svg_exporter.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "name": name,
+        "output": output_name(name),
+        "frames": frames,
+        "seconds": round(elapsed, 3),
+        "fps": round(frames / elapsed, 2) if elapsed > 0 else 0.0
+    }
+
+
+def load_summary(path):
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return {"files": {}}
+
+
+def write_summary(path, summary):
+    # Written after every video so an interrupted run can resume
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(summary, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render recorded gesture videos into drawings")
+    parser.add_argument("input_dir", help="directory tree of recorded videos (and directories of frame images)")
+    parser.add_argument("output_dir", help="directory for PNG drawings and summary.json")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes")
+    parser.add_argument("--display-size", type=parse_size, default=DISPLAY_SIZE,
+                        help="canvas resolution, e.g. 1280x720")
+    parser.add_argument("--inference-size", type=parse_size, default=INFERENCE_SIZE,
+                        help="hand tracking input resolution, e.g. 256x192")
+    parser.add_argument("--indexed", action="store_true", help="draw on palette-indexed layers")
+    parser.add_argument("--image-fps", type=float, default=30.0,
+                        help="frame rate of recordings stored as image directories")
+    parser.add_argument("--force", action="store_true", help="re-render videos already in the summary")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    summary_path = os.path.join(args.output_dir, SUMMARY_FILE)
+    summary = load_summary(summary_path)
+
+    jobs = []
+    for kind, path, name in find_recordings(args.input_dir, os.path.realpath(args.output_dir)):
+        done = summary["files"].get(name, {})
+        if (done and "error" not in done and not args.force
+                and os.path.exists(os.path.join(args.output_dir, output_name(name)))):
+            continue
+        jobs.append((kind, path, name))
+
+    print(f"{len(jobs)} recordings to render, {len(summary['files'])} already in summary")
+    if not jobs:
+        return
+
+    options = {"display_size": args.display_size, "inference_size": args.inference_size,
+               "indexed": args.indexed, "image_fps": args.image_fps, "output_dir": args.output_dir}
+    total_frames = 0
+    start = time.perf_counter()
+    with multiprocessing.Pool(min(args.workers, len(jobs)), initializer=init_worker,
+                              initargs=(options,)) as pool:
+        for i, result in enumerate(pool.imap_unordered(render_video, jobs), 1):
+            summary["files"][result["name"]] = result
+            write_summary(summary_path, summary)
+            if "error" in result:
+                print(f"[{i}/{len(jobs)}] {result['name']}: {result['error']}")
+            else:
+                total_frames += result["frames"]
+                print(f"[{i}/{len(jobs)}] {result['name']}: {result['frames']} frames, "
+                      f"{result['fps']} FPS")
+
+    elapsed = time.perf_counter() - start
+    aggregate_fps = total_frames / elapsed if elapsed > 0 else 0.0
+    summary["last_run"] = {
+        "videos": len(jobs),
+        "workers": min(args.workers, len(jobs)),
+        "frames": total_frames,
+        "seconds": round(elapsed, 3),
+        "aggregate_fps": round(aggregate_fps, 2)
+    }
+    write_summary(summary_path, summary)
+    print(f"Rendered {total_frames} frames in {elapsed:.1f}s ({aggregate_fps:.1f} FPS aggregate)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from advanced_gesture_drawing import AdvancedGestureDrawingApp
+from frame_pipeline import parse_size
+from gesture_templates import GestureTemplateStore
+from blend_engine import BlendEngine, BLEND_MODES
+from benchmarks.synthetic import landmark_stream, pointer_path
+
+
+CANVAS_SIZES = [(640, 480), (1280, 720), (1920, 1080)]
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+# Median slowdown (fraction of the baseline) that counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+STREAM_LENGTH = 240
+FRAME_DT = 1.0 / 30
+STROKE_LENGTH = 60
+
+
+class NoHands:
+    """Placeholder tracker, the benchmarks feed synthetic landmarks directly"""
+
+    def process(self, rgb_frame):
+        raise RuntimeError("benchmarks do not run hand tracking")
+
+
+def make_app(size):
+    app = AdvancedGestureDrawingApp(None, display_size=size, idle_after=float("inf"), hands=NoHands())
+    # Keep the user's recorded gestures out of the measurements
+    app.template_store = GestureTemplateStore(os.path.join(tempfile.gettempdir(), "no_benchmark_templates.json"))
+    app.frame_time = 0.0
+    return app
+
+
+def draw_sample_strokes(app, points):
+    app.is_drawing = True
+    for point in points:
+        app.draw_at(point)
+    app.finish_stroke()
+    app.is_drawing = False
+
+
+# Each benchmark takes a canvas size, sets up its state and returns the
+# function to time
+
+def bench_detect_gestures(size):
+    app = make_app(size)
+    hands = itertools.cycle(landmark_stream(STREAM_LENGTH, poses=('POINT', 'HOVER')))
+
+    def step():
+        app.frame_time += FRAME_DT
+        app.detect_gestures(next(hands))
+    return step
+
+
+def bench_freestyle(size):
+    app = make_app(size)
+    app.is_drawing = True
+    points = itertools.cycle(pointer_path(STREAM_LENGTH, *size))
+    counter = itertools.count(1)
+
+    def step():
+        app.draw_at(next(points))
+        if next(counter) % STROKE_LENGTH == 0:
+            app.finish_stroke()
+    return step
+
+
+def bench_draw_pattern(size):
+    app = make_app(size)
+    random.seed(0)
+    path = pointer_path(STREAM_LENGTH, *size)
+    segments = itertools.cycle(zip(path, path[1:]))
+
+    def step():
+        start, end = next(segments)
+        app.draw_pattern(app.canvas, start, end, app.ink(), app.brush_thickness)
+    return step
+
+
+def bench_shape_preview(size):
+    app = make_app(size)
+    draw_sample_strokes(app, pointer_path(STROKE_LENGTH, *size))
+    app.current_mode = app.MODES['RECTANGLE']
+    app.is_drawing = True
+    app.shape_start_point = (size[0] // 4, size[1] // 4)
+    points = itertools.cycle(pointer_path(STREAM_LENGTH, *size))
+
+    def step():
+        app.draw_at(next(points))
+    return step
+
+
+def bench_shape_commit(size):
+    app = make_app(size)
+    app.current_mode = app.MODES['RECTANGLE']
+    app.shape_start_point = (size[0] // 4, size[1] // 4)
+    points = itertools.cycle(pointer_path(STREAM_LENGTH, *size))
+
+    def step():
+        app.prev_point = next(points)
+        app.complete_shape()
+    return step
+
+
+def bench_composite(size):
+    # Per-frame layer composite over the video while a stroke is in progress
+    app = make_app(size)
+    draw_sample_strokes(app, pointer_path(STROKE_LENGTH, *size))
+    frame = np.random.default_rng(0).integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+    points = itertools.cycle(pointer_path(STREAM_LENGTH, *size))
+
+    def step():
+        x, y = next(points)
+        app.layers.mark_dirty((x - 8, y - 8, x + 8, y + 8))
+        app.blend_engine.blend(frame, app.layers.flatten())
+    return step
+
+
+def bench_canvas_blend(size):
+    # The standard app's BGR canvas over the video, cycling through every
+    # blend mode at partial opacity
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+    canvas = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+    points = pointer_path(STROKE_LENGTH, *size)
+    for start, end in zip(points, points[1:]):
+        cv2.line(canvas, start, end, (0, 0, 255), 5)
+    engines = itertools.cycle([BlendEngine(mode, 0.8, 0.9) for mode in BLEND_MODES])
+
+    def step():
+        next(engines).blend(frame, canvas)
+    return step
+
+
+def bench_clear_canvas(size):
+    app = make_app(size)
+    draw_sample_strokes(app, pointer_path(STROKE_LENGTH, *size))
+
+    def step():
+        app.clear_canvas()
+    return step
+
+
+def bench_display_conversion(size):
+    # BGR frame to a PIL image; the final PhotoImage needs a Tk root
+    frame = np.random.default_rng(0).integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+
+    def step():
+        Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    return step
+
+
+BENCHMARKS = {
+    'detect_gestures': bench_detect_gestures,
+    'freestyle': bench_freestyle,
+    'draw_pattern': bench_draw_pattern,
+    'shape_preview': bench_shape_preview,
+    'shape_commit': bench_shape_commit,
+    'composite': bench_composite,
+    'canvas_blend': bench_canvas_blend,
+    'clear_canvas': bench_clear_canvas,
+    'display_conversion': bench_display_conversion
+}
+
+
+def measure(step, rounds=7, round_time=0.05):
+    """Return (median, min) milliseconds per call over several timed rounds"""
+    for _ in range(3):
+        step()
+
+    # Calibrate the calls per round so each round runs about round_time
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            step()
+        elapsed = time.perf_counter() - start
+        if elapsed >= round_time / 4 or calls >= 100000:
+            break
+        calls *= 2
+    calls = max(1, int(calls * round_time / max(elapsed, 1e-9)))
+
+    per_call = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(calls):
+            step()
+        per_call.append((time.perf_counter() - start) * 1000.0 / calls)
+    return statistics.median(per_call), min(per_call)
+
+
+def machine_info():
+    return {
+        "hostname": socket.gethostname(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__
+    }
+
+
+def baseline_path(hostname):
+    safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in hostname)
+    return os.path.join(BASELINE_DIR, f"{safe_name}.json")
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_baseline(path, results, previous):
+    # Keep baseline entries for benchmarks that were not run this time
+    merged = dict(previous["results"]) if previous else {}
+    merged.update(results)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"machine": machine_info(), "results": merged}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the drawing app microbenchmarks against a stored baseline")
+    parser.add_argument("--sizes", type=lambda text: [parse_size(s) for s in text.split(",")],
+                        default=CANVAS_SIZES, help="comma separated canvas sizes, e.g. 640x480,1280x720")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown over the baseline median, e.g. 0.25 for 25%%")
+    parser.add_argument("--baseline", help="baseline file (default: baselines/<hostname>.json)")
+    parser.add_argument("--save", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args()
+
+    path = args.baseline or baseline_path(socket.gethostname())
+    baseline = load_baseline(path)
+    reference = baseline["results"] if baseline else {}
+
+    results = {}
+    regressions = []
+    print(f"{'benchmark':<34}{'median ms':>12}{'min ms':>10}{'baseline':>11}{'change':>9}")
+    for name in args.only or BENCHMARKS:
+        for size in args.sizes:
+            key = f"{name}@{size[0]}x{size[1]}"
+            median, fastest = measure(BENCHMARKS[name](size))
+            results[key] = {"median_ms": round(median, 4), "min_ms": round(fastest, 4)}
+
+            line = f"{key:<34}{median:>12.3f}{fastest:>10.3f}"
+            if key in reference:
+                base = reference[key]["median_ms"]
+                change = median / base - 1.0 if base > 0 else 0.0
+                line += f"{base:>11.3f}{change:>+9.0%}"
+                if change > args.threshold:
+                    regressions.append(key)
+                    line += "  REGRESSION"
+            print(line)
+
+    if args.save:
+        save_baseline(path, results, baseline)
+        print(f"Baseline saved to {path}")
+        return 0
+    if baseline is None:
+        print(f"No baseline at {path}, run with --save to create one")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} benchmarks regressed more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
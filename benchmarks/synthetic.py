@@ -0,0 +1,88 @@
+import math
+
+import numpy as np
+
+
+# (mcp, pip, dip, tip) landmark indices per finger
+FINGERS = {
+    'thumb': (1, 2, 3, 4),
+    'index': (5, 6, 7, 8),
+    'middle': (9, 10, 11, 12),
+    'ring': (13, 14, 15, 16),
+    'pinky': (17, 18, 19, 20)
+}
+
+# Extended fingers for each synthetic pose
+POSES = {
+    'POINT': ('index',),
+    'HOVER': ('index', 'middle'),
+    'OPEN': ('thumb', 'index', 'middle', 'ring', 'pinky')
+}
+
+
+class Landmark:
+    """Stand-in for a MediaPipe normalized landmark"""
+
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x, y, z=0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+
+class HandLandmarks:
+    """Stand-in for one hand of MediaPipe's multi_hand_landmarks"""
+
+    def __init__(self, points):
+        self.landmark = [Landmark(x, y, z) for x, y, z in points]
+
+
+def hand_pose(center, pose='POINT', scale=0.18):
+    """21 normalized (x, y, z) landmarks of an upright hand with its knuckles at center"""
+    cx, cy = center
+    extended = POSES[pose]
+    points = [None] * 21
+    points[0] = (cx, cy + 0.5 * scale, 0.0)
+
+    for i, (name, joints) in enumerate(FINGERS.items()):
+        if name == 'thumb':
+            # Thumb points sideways, folded across the palm when not extended
+            reach = -0.35 if name in extended else 0.05
+            base_x, base_y = cx - 0.25 * scale, cy + 0.3 * scale
+            for j, index in enumerate(joints):
+                points[index] = (base_x + reach * scale * j / 3, base_y - 0.1 * scale * j, 0.0)
+            continue
+        x = cx + (i - 2.5) * 0.12 * scale
+        if name in extended:
+            offsets = (0.0, -0.25, -0.38, -0.5)
+        else:
+            # Curled: the tip ends up below the middle joint
+            offsets = (0.0, -0.12, -0.05, 0.02)
+        for index, dy in zip(joints, offsets):
+            points[index] = (x, cy + dy * scale, -0.02)
+    return points
+
+
+def loop_position(t):
+    """Normalized (x, y) on a figure-eight loop, t in [0, 1)"""
+    angle = 2 * math.pi * t
+    return 0.5 + 0.3 * math.cos(angle), 0.5 + 0.2 * math.sin(2 * angle)
+
+
+def landmark_stream(count, poses=('POINT',), pose_length=30, jitter=0.002, seed=0):
+    """count hands tracing a loop, switching pose every pose_length frames"""
+    rng = np.random.default_rng(seed)
+    stream = []
+    for i in range(count):
+        x, y = loop_position(i / count)
+        pose = poses[(i // pose_length) % len(poses)]
+        points = hand_pose((x, y), pose)
+        noise = rng.normal(0.0, jitter, size=(21, 2))
+        stream.append(HandLandmarks([(px + nx, py + ny, pz) for (px, py, pz), (nx, ny) in zip(points, noise)]))
+    return stream
+
+
+def pointer_path(count, width, height):
+    """count integer pixel positions along the same loop, scaled to the canvas"""
+    return [(int(x * width), int(y * height)) for x, y in (loop_position(i / count) for i in range(count))]
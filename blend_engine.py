@@ -0,0 +1,109 @@
+import cv2
+import numpy as np
+
+from layers import TILE_SIZE, div255, tile_runs
+
+
+BLEND_MODES = ('over', 'multiply', 'screen')
+
+
+def scale_table(factor):
+    """Lookup table scaling every uint8 v by factor, in 8-bit fixed point like layer opacity"""
+    return div255(np.arange(256, dtype=np.uint16) * int(factor * 255 + 0.5)).astype(np.uint8)
+
+
+def ink_alpha(ink):
+    """Per-pixel coverage, 0 to 255, of a premultiplied BGRA composite or a BGR canvas"""
+    if ink.shape[2] == 4:
+        return cv2.extractChannel(ink, 3)
+    # A BGR canvas is opaque wherever it isn't black
+    return cv2.bitwise_not(cv2.inRange(ink, (0, 0, 0), (0, 0, 0)))
+
+
+def tile_coverage(alpha):
+    """Boolean (tile rows, tile columns) mask of the tiles with any ink"""
+    height, width = alpha.shape
+    rows, columns = -(-height // TILE_SIZE), -(-width // TILE_SIZE)
+    padded = cv2.copyMakeBorder(alpha, 0, rows * TILE_SIZE - height, 0, columns * TILE_SIZE - width,
+                                cv2.BORDER_CONSTANT, value=0)
+    return padded.reshape(rows, TILE_SIZE, columns, TILE_SIZE).max(axis=(1, 3)) != 0
+
+
+class BlendEngine:
+    """Composites ink over a BGR video frame, touching only the inked tiles
+
+    Ink is either a premultiplied BGRA composite or a BGR canvas where
+    black means empty. Tiles without ink are a straight copy of the video
+    (through a lookup table when the video is dimmed). Inked tiles are
+    blended in integer fixed point, each product a * b / 255 rounded with
+    div255 like the layer stack:
+
+    - over: the ink covers the video
+    - multiply: the ink darkens the video like a marker on paper
+    - screen: the ink lightens the video like projected light
+
+    Uninked pixels inside an inked tile come out exactly as the video.
+    """
+
+    def __init__(self, mode='over', ink_opacity=1.0, video_opacity=1.0):
+        self.set_mode(mode)
+        self.set_opacity(ink_opacity, video_opacity)
+
+    def set_mode(self, mode):
+        if mode not in BLEND_MODES:
+            raise ValueError(f"Unknown blend mode: {mode}")
+        self.mode = mode
+
+    def set_opacity(self, ink_opacity=None, video_opacity=None):
+        """Set either opacity, 0 to 1; None leaves it unchanged"""
+        if ink_opacity is not None:
+            self.ink_opacity = min(max(float(ink_opacity), 0.0), 1.0)
+            self.ink_table = scale_table(self.ink_opacity)
+        if video_opacity is not None:
+            self.video_opacity = min(max(float(video_opacity), 0.0), 1.0)
+            self.video_table = scale_table(self.video_opacity)
+
+    def blend(self, frame, ink):
+        """Return a new BGR frame with the ink composited over frame"""
+        if self.video_opacity < 1.0:
+            out = cv2.LUT(frame, self.video_table)
+        else:
+            out = frame.copy()
+        if self.ink_opacity == 0.0:
+            return out
+
+        alpha = ink_alpha(ink)
+        if ink.shape[2] == 3 and self.mode == 'over' and self.ink_opacity == 1.0:
+            # Opaque BGR ink simply replaces the video where it is drawn
+            cv2.copyTo(ink, alpha, out)
+            return out
+        height, width = alpha.shape
+        for ty, tx0, tx1 in tile_runs(tile_coverage(alpha)):
+            y0, y1 = ty * TILE_SIZE, min(height, (ty + 1) * TILE_SIZE)
+            x0, x1 = tx0 * TILE_SIZE, min(width, tx1 * TILE_SIZE)
+            self.blend_region(out[y0:y1, x0:x1], ink[y0:y1, x0:x1], alpha[y0:y1, x0:x1])
+        return out
+
+    def blend_region(self, video, ink, alpha):
+        # Blends in place into video, a view of the output frame
+        if ink.shape[2] == 4:
+            ink = cv2.cvtColor(ink, cv2.COLOR_BGRA2BGR)
+        if self.ink_opacity < 1.0:
+            # Scaling color and alpha together keeps them premultiplied
+            ink = cv2.LUT(ink, self.ink_table)
+            alpha = cv2.LUT(alpha, self.ink_table)
+        inverse = cv2.bitwise_not(alpha)
+        inverse = cv2.merge((inverse, inverse, inverse))
+        # ink is premultiplied by alpha, so no sum below can pass 255
+        if self.mode == 'over':
+            # video * (1 - alpha) + ink
+            out = div255(np.multiply(video, inverse, dtype=np.uint16))
+            out += ink
+        elif self.mode == 'multiply':
+            # video * (1 - alpha) + video * ink
+            out = div255(np.multiply(video, cv2.add(inverse, ink), dtype=np.uint16))
+        else:
+            # video + ink * (1 - video)
+            out = div255(np.multiply(cv2.bitwise_not(video), ink, dtype=np.uint16))
+            out += video
+        np.copyto(video, out, casting='unsafe')
@@ -0,0 +1,53 @@
+import cv2
+import numpy as np
+
+
+# Default resolutions: full-size display/canvas, smaller hand tracking input
+DISPLAY_SIZE = (640, 480)
+INFERENCE_SIZE = (320, 240)
+
+
+def parse_size(text):
+    """Parse a "WIDTHxHEIGHT" string into a (width, height) tuple"""
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+class FramePreprocessor:
+    """Mirrors and scales camera frames into preallocated buffers
+
+    The display frame (also the canvas resolution) and the hand tracking
+    input have independent sizes. MediaPipe landmarks are normalized, so
+    they map back onto the display frame exactly whatever the inference size.
+    """
+
+    def __init__(self, display_size=DISPLAY_SIZE, inference_size=INFERENCE_SIZE):
+        self.display_size = tuple(display_size)
+        dw, dh = self.display_size
+        self.display_frame = np.zeros((dh, dw, 3), dtype=np.uint8)
+        self.set_inference_size(inference_size)
+
+    def set_inference_size(self, inference_size):
+        """Change the hand tracking input size, e.g. to trade accuracy for speed"""
+        self.inference_size = tuple(inference_size)
+        iw, ih = self.inference_size
+        self.inference_bgr = np.zeros((ih, iw, 3), dtype=np.uint8)
+        self.inference_rgb = np.zeros((ih, iw, 3), dtype=np.uint8)
+
+    def process(self, frame):
+        """Return (display BGR frame, inference RGB frame), both reused between calls"""
+        # Scale to the display size and mirror in place
+        if frame.shape[1] == self.display_size[0] and frame.shape[0] == self.display_size[1]:
+            np.copyto(self.display_frame, frame)
+        else:
+            cv2.resize(frame, self.display_size, dst=self.display_frame)
+        cv2.flip(self.display_frame, 1, self.display_frame)
+
+        # One area-averaged downscale for the hand tracker
+        if self.inference_size == self.display_size:
+            cv2.cvtColor(self.display_frame, cv2.COLOR_BGR2RGB, dst=self.inference_rgb)
+        else:
+            cv2.resize(self.display_frame, self.inference_size, dst=self.inference_bgr,
+                       interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(self.inference_bgr, cv2.COLOR_BGR2RGB, dst=self.inference_rgb)
+        return self.display_frame, self.inference_rgb
@@ -0,0 +1,193 @@
+import errno
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+
+
+# Ring layout: one RING_HEADER, then slot_count slots of SLOT_HEADER + pixels
+RING_MAGIC = b"GDFR"
+RING_VERSION = 1
+RING_HEADER = struct.Struct("<4sIIIQ")       # magic, version, slot count, slot size, latest sequence
+SLOT_HEADER = struct.Struct("<QdIII4s")      # sequence, timestamp, width, height, channels, format
+FORMAT_BGR24 = b"BGR3"
+
+
+class SharedMemoryRing:
+    """Publishes frames into a POSIX shared-memory ring buffer (/dev/shm/<name>)
+
+    Each slot has its own header. A slot's sequence is zeroed while it is
+    being written and set last, so a reader that sees the same non-zero
+    sequence before and after copying a slot has a consistent frame. The
+    ring header holds the sequence of the newest complete frame.
+    """
+
+    def __init__(self, name, width, height, channels=3, slot_count=4):
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.slot_count = slot_count
+        self.frame_bytes = width * height * channels
+        self.slot_size = SLOT_HEADER.size + self.frame_bytes
+
+        size = RING_HEADER.size + slot_count * self.slot_size
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left over from a run that crashed, replace it
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self.sequence = 0
+        RING_HEADER.pack_into(self.shm.buf, 0, RING_MAGIC, RING_VERSION, slot_count, self.slot_size, 0)
+
+    def slot_offset(self, index):
+        return RING_HEADER.size + index * self.slot_size
+
+    def publish(self, frame, timestamp):
+        self.sequence += 1
+        offset = self.slot_offset(self.sequence % self.slot_count)
+        SLOT_HEADER.pack_into(self.shm.buf, offset, 0, timestamp, self.width, self.height,
+                              self.channels, FORMAT_BGR24)
+        pixels = np.ndarray((self.height, self.width, self.channels), dtype=np.uint8,
+                            buffer=self.shm.buf, offset=offset + SLOT_HEADER.size)
+        np.copyto(pixels, frame)
+        SLOT_HEADER.pack_into(self.shm.buf, offset, self.sequence, timestamp, self.width, self.height,
+                              self.channels, FORMAT_BGR24)
+        # Latest sequence lives in the last 8 bytes of the ring header
+        struct.pack_into("<Q", self.shm.buf, RING_HEADER.size - 8, self.sequence)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SharedMemoryReader:
+    """Reads the newest frame from a SharedMemoryRing in another process"""
+
+    def __init__(self, name):
+        self.shm = shared_memory.SharedMemory(name=name)
+        # Only the writer owns the segment; stop the resource tracker from
+        # removing it when this process exits
+        resource_tracker.unregister(self.shm._name, "shared_memory")
+        magic, version, self.slot_count, self.slot_size, _ = RING_HEADER.unpack_from(self.shm.buf, 0)
+        if magic != RING_MAGIC or version != RING_VERSION:
+            raise ValueError(f"{name} is not a frame ring")
+
+    def latest(self):
+        """Return (sequence, timestamp, frame copy), or None if nothing complete is available"""
+        sequence = RING_HEADER.unpack_from(self.shm.buf, 0)[-1]
+        if sequence == 0:
+            return None
+        offset = RING_HEADER.size + (sequence % self.slot_count) * self.slot_size
+        before, timestamp, width, height, channels, _ = SLOT_HEADER.unpack_from(self.shm.buf, offset)
+        if before != sequence:
+            return None
+        frame = np.ndarray((height, width, channels), dtype=np.uint8, buffer=self.shm.buf,
+                           offset=offset + SLOT_HEADER.size).copy()
+        if SLOT_HEADER.unpack_from(self.shm.buf, offset)[0] != sequence:
+            # Overwritten while copying
+            return None
+        return sequence, timestamp, frame
+
+    def close(self):
+        self.shm.close()
+
+
+class FifoWriter:
+    """Streams raw BGR24 frames to a named pipe from a writer thread
+
+    publish() never waits: it leaves the newest frame for the thread and
+    drops the one still waiting, if any. The thread waits for a reader to
+    open the pipe and reopens it when the reader goes away.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path):
+            os.mkfifo(path)
+        self.frames = queue.Queue(maxsize=1)
+        self.dropped = 0
+        self.running = True
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def publish(self, frame):
+        try:
+            self.frames.get_nowait()
+            self.dropped += 1
+        except queue.Empty:
+            pass
+        self.frames.put_nowait(frame.copy())
+
+    def open_pipe(self):
+        # A non-blocking open fails until a reader is connected, which lets
+        # close() stop the thread while nobody is reading
+        while self.running:
+            try:
+                fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError as e:
+                if e.errno != errno.ENXIO:
+                    raise
+                time.sleep(0.2)
+                continue
+            os.set_blocking(fd, True)
+            return fd
+        return None
+
+    def run(self):
+        fd = None
+        while self.running:
+            if fd is None:
+                fd = self.open_pipe()
+                if fd is None:
+                    break
+                # Start the new reader on a fresh frame
+                try:
+                    self.frames.get_nowait()
+                except queue.Empty:
+                    pass
+            try:
+                frame = self.frames.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                view = memoryview(frame).cast("B")
+                while view:
+                    written = os.write(fd, view)
+                    view = view[written:]
+            except BrokenPipeError:
+                os.close(fd)
+                fd = None
+        if fd is not None:
+            os.close(fd)
+
+    def close(self):
+        self.running = False
+        self.worker.join(timeout=1.0)
+
+
+class FrameSink:
+    """Publishes composited BGR frames to shared memory and/or a named pipe"""
+
+    def __init__(self, width, height, shm_name=None, fifo_path=None):
+        self.ring = SharedMemoryRing(shm_name, width, height) if shm_name else None
+        self.fifo = FifoWriter(fifo_path) if fifo_path else None
+
+    def publish(self, frame, timestamp):
+        if self.ring is not None:
+            self.ring.publish(frame, timestamp)
+        if self.fifo is not None:
+            self.fifo.publish(frame)
+
+    def close(self):
+        if self.ring is not None:
+            self.ring.close()
+        if self.fifo is not None:
+            self.fifo.close()
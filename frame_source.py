@@ -0,0 +1,296 @@
+import os
+import time
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+
+from frame_pipeline import DISPLAY_SIZE, parse_size
+
+
+SOURCE_KINDS = ('camera', 'video', 'images', 'synthetic')
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+CAMERA_BACKENDS = {
+    'any': cv2.CAP_ANY,
+    'v4l2': cv2.CAP_V4L2,
+    'dshow': cv2.CAP_DSHOW,
+    'msmf': cv2.CAP_MSMF,
+    'avfoundation': cv2.CAP_AVFOUNDATION,
+    'gstreamer': cv2.CAP_GSTREAMER
+}
+CAMERA_FORMATS = ('MJPG', 'YUYV')
+
+
+class FrameSource(ABC):
+    """Where the apps get their BGR frames from
+
+    Constructing a source only keeps its settings; open() does the slow
+    part (opening the device or file) so it can run on a loader thread.
+    read() returns (ok, frame, timestamp). With realtime the timestamp is
+    the capture time on the time.monotonic() clock, so now minus it is the
+    latency so far, and file and synthetic sources are paced to their
+    frame rate. Without realtime frames come as fast as they are read and
+    the timestamp is the source's own clock, starting at 0.
+    """
+
+    realtime = True
+
+    def open(self):
+        return self
+
+    def is_open(self):
+        return True
+
+    @abstractmethod
+    def read(self):
+        """(ok, frame, timestamp) for the next frame"""
+
+    def describe(self):
+        return type(self).__name__
+
+    def close(self):
+        pass
+
+
+class PacedSource(FrameSource):
+    """A source with its own clock of frame index / fps, paced in realtime mode"""
+
+    def __init__(self, fps, realtime, loop):
+        self.fps = fps
+        self.realtime = realtime
+        self.loop = loop
+        self.index = 0
+        self.start = None
+
+    def frame_time(self, index):
+        return index / self.fps
+
+    def due_index(self):
+        """Index of the frame due now in realtime mode; waits for it if early"""
+        if self.start is None:
+            self.start = time.monotonic() - self.frame_time(self.index)
+        wait = self.start + self.frame_time(self.index) - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+            return self.index
+        # Behind: skip to the frame that should be showing, like a camera would
+        return max(self.index, int((time.monotonic() - self.start) * self.fps))
+
+    def timestamp(self, index):
+        if self.realtime:
+            return self.start + self.frame_time(index)
+        return self.frame_time(index)
+
+
+class CameraSource(FrameSource):
+    """A camera through OpenCV, with explicit format, size, rate and buffer depth
+
+    Drivers queue several buffers by default, each a frame of latency;
+    buffer_size=1 keeps only the newest. The pixel format is set before the
+    size since V4L2 offers different sizes per format: MJPG reaches higher
+    resolutions and rates over USB, YUYV skips the JPEG decode. The
+    timestamp is taken as soon as grab() has the frame, before decoding.
+    """
+
+    def __init__(self, device=0, backend='any', size=None, fps=None, fourcc=None, buffer_size=1):
+        self.device = device
+        self.backend = backend
+        self.size = size
+        self.fps = fps
+        self.fourcc = fourcc
+        self.buffer_size = buffer_size
+        self.cap = None
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.device, CAMERA_BACKENDS[self.backend])
+        if not self.cap.isOpened():
+            return self
+        if self.fourcc:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.fourcc))
+        if self.size:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.size[0])
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.size[1])
+        if self.fps:
+            self.cap.set(cv2.CAP_PROP_FPS, self.fps)
+        if self.buffer_size:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, self.buffer_size)
+        return self
+
+    def is_open(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def read(self):
+        if not self.cap.grab():
+            return False, None, None
+        timestamp = time.monotonic()
+        ok, frame = self.cap.retrieve()
+        return ok, frame, timestamp
+
+    def describe(self):
+        if not self.is_open():
+            return f"camera {self.device} (not open)"
+        code = int(self.cap.get(cv2.CAP_PROP_FOURCC))
+        fourcc = "".join(chr((code >> shift) & 0xFF) for shift in (0, 8, 16, 24)).strip("\0") or "?"
+        return (f"camera {self.device}: {int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))}x"
+                f"{int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))} {fourcc} "
+                f"{self.cap.get(cv2.CAP_PROP_FPS):g} FPS via {self.cap.getBackendName()}")
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class VideoFileSource(PacedSource):
+    """Frames of a video file, at the file's frame rate"""
+
+    def __init__(self, path, realtime=True, loop=False):
+        super().__init__(30.0, realtime, loop)
+        self.path = path
+        self.cap = None
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        return self
+
+    def is_open(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def read(self):
+        if self.realtime:
+            # Frames that are already late are grabbed but not decoded
+            due = self.due_index()
+            while self.index < due and self.cap.grab():
+                self.index += 1
+        ok, frame = self.cap.read()
+        if not ok and self.loop and self.index > 0:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.index = 0
+            self.start = None
+            return self.read()
+        if not ok:
+            return False, None, None
+        timestamp = self.timestamp(self.index)
+        self.index += 1
+        return True, frame, timestamp
+
+    def describe(self):
+        return f"video {self.path} ({self.fps:g} FPS)"
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class ImageDirectorySource(PacedSource):
+    """The images in a directory, in name order, as frames at fps"""
+
+    def __init__(self, path, fps=30.0, realtime=True, loop=False):
+        super().__init__(fps, realtime, loop)
+        self.path = path
+        self.files = []
+
+    def open(self):
+        if os.path.isdir(self.path):
+            self.files = [os.path.join(self.path, name) for name in sorted(os.listdir(self.path))
+                          if name.lower().endswith(IMAGE_EXTENSIONS)]
+        return self
+
+    def is_open(self):
+        return bool(self.files)
+
+    def read(self):
+        if self.realtime:
+            self.index = self.due_index()
+        if self.index >= len(self.files):
+            if not self.loop or not self.files:
+                return False, None, None
+            self.index = 0
+            self.start = None
+            return self.read()
+        frame = cv2.imread(self.files[self.index], cv2.IMREAD_COLOR)
+        timestamp = self.timestamp(self.index)
+        self.index += 1
+        return frame is not None, frame, timestamp
+
+    def describe(self):
+        return f"images {self.path} ({len(self.files)} at {self.fps:g} FPS)"
+
+
+class SyntheticSource(PacedSource):
+    """Generated frames (a disc circling over a gradient), for running without a camera"""
+
+    def __init__(self, size=DISPLAY_SIZE, fps=30.0, realtime=True, count=None):
+        super().__init__(fps, realtime, False)
+        self.size = size
+        self.count = count
+        width, height = size
+        ramp = np.linspace(40, 120, width, dtype=np.float32)
+        self.background = np.dstack([np.tile(ramp, (height, 1)).astype(np.uint8)] * 3)
+
+    def read(self):
+        if self.realtime:
+            self.index = self.due_index()
+        if self.count is not None and self.index >= self.count:
+            return False, None, None
+        width, height = self.size
+        angle = 2 * np.pi * self.frame_time(self.index) / 4.0
+        center = (int(width * (0.5 + 0.3 * np.cos(angle))), int(height * (0.5 + 0.3 * np.sin(angle))))
+        frame = self.background.copy()
+        cv2.circle(frame, center, max(4, height // 12), (60, 180, 240), -1)
+        cv2.putText(frame, str(self.index), (10, height - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+        timestamp = self.timestamp(self.index)
+        self.index += 1
+        return True, frame, timestamp
+
+    def describe(self):
+        return f"synthetic {self.size[0]}x{self.size[1]} at {self.fps:g} FPS"
+
+
+def parse_source(text):
+    """argparse type for a source: camera[:device], video:path, images:dir, synthetic, or a bare device or path"""
+    kind, _, target = text.partition(":")
+    if kind in SOURCE_KINDS:
+        return kind, target
+    if text.isdigit() or text.startswith("/dev/video"):
+        return 'camera', text
+    if os.path.isdir(text):
+        return 'images', text
+    return 'video', text
+
+
+def create_source(kind, target='', realtime=True, size=None, fps=None, fourcc=None, backend='any',
+                  buffer_size=1, loop=False):
+    """An unopened source from its kind and target (device, path or nothing)"""
+    if kind == 'camera':
+        device = int(target) if target.isdigit() else (target or 0)
+        return CameraSource(device, backend, size, fps, fourcc, buffer_size)
+    if kind == 'video':
+        return VideoFileSource(target, realtime, loop)
+    if kind == 'images':
+        return ImageDirectorySource(target, fps or 30.0, realtime, loop)
+    if kind == 'synthetic':
+        return SyntheticSource(parse_size(target) if target else size or DISPLAY_SIZE, fps or 30.0, realtime)
+    raise ValueError(f"Unknown frame source: {kind}")
+
+
+def add_source_arguments(parser):
+    parser.add_argument("--source", type=parse_source, default=('camera', ''),
+                        help="camera[:device], video:path, images:dir or synthetic[:WxH] (default camera 0)")
+    parser.add_argument("--source-size", type=parse_size, help="capture resolution, e.g. 1280x720")
+    parser.add_argument("--source-fps", type=float,
+                        help="camera frame rate to request, or the rate to play images and synthetic frames at")
+    parser.add_argument("--camera-format", type=str.upper, choices=CAMERA_FORMATS,
+                        help="camera pixel format (MJPG for high resolutions over USB)")
+    parser.add_argument("--camera-backend", choices=sorted(CAMERA_BACKENDS), default="any",
+                        help="OpenCV capture backend")
+    parser.add_argument("--camera-buffer", type=int, default=1,
+                        help="frames the driver may queue; 1 has the least latency, 0 keeps the default")
+    parser.add_argument("--loop", action="store_true", help="restart video and image sources at the end")
+
+
+def source_from_args(args, realtime=True):
+    kind, target = args.source
+    return create_source(kind, target, realtime=realtime, size=args.source_size, fps=args.source_fps,
+                         fourcc=args.camera_format, backend=args.camera_backend,
+                         buffer_size=args.camera_buffer, loop=args.loop)
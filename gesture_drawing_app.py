@@ -2,27 +2,38 @@ import cv2
 import numpy as np
 import mediapipe as mp
 import tkinter as tk
-from tkinter import ttk, colorchooser, filedialog
+from tkinter import ttk, colorchooser, filedialog, messagebox
 from PIL import Image, ImageTk
 import os
+import argparse
 from datetime import datetime
-import colorsys
 import time
 
+from hud import HudRenderer, hue_to_bgr
+from gesture_recognizer import GestureRecognizer
+from gesture_dynamics import GestureDynamics
+from frame_pipeline import FramePreprocessor, DISPLAY_SIZE, INFERENCE_SIZE, parse_size
+from power_saver import IdleMonitor
+from ui_state import UIState
+from frame_sink import FrameSink
+from svg_export import SvgExporter
+from frame_source import CameraSource, add_source_arguments, source_from_args
+from gesture_events import GesturePublisher, parse_address
+from blend_engine import BlendEngine, BLEND_MODES
+from quality_controller import QualityController, QUALITY_LEVELS
+
 class GestureDrawingApp:
-    def __init__(self, root):
+    def __init__(self, root, display_size=DISPLAY_SIZE, inference_size=INFERENCE_SIZE, idle_after=10.0, 
+                 frame_sink=None, blend_engine=None, target_fps=30, quality=None, gesture_events=None, 
+                 frame_source=None):
         self.root = root
         self.root.title("Gesture Drawing App")
         self.root.geometry("1280x720")
         
         # Initialize MediaPipe Hands
         self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(
-            static_image_mode=False,
-            max_num_hands=1,
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.7
-        )
+        self.model_complexity = 1
+        self.hands = self.create_hands(self.model_complexity)
         self.mp_draw = mp.solutions.drawing_utils
         
         # Initialize drawing parameters
@@ -30,14 +41,16 @@ class GestureDrawingApp:
         self.drawing_color = (0, 0, 255)  # Red (BGR format)
         self.brush_thickness = 5
         self.is_drawing = False
-        self.clear_gesture_active = False
-        self.color_change_active = False
         self.brush_size_active = False
-        self.initial_pinky_y = None  # For pinky-based brush size control
+        
+        # Windowed debouncing for the discrete gestures
+        self.gesture_recognizer = GestureRecognizer()
+        # Hand-size relative distances and time-based smoothing for the
+        # continuous gestures
+        self.gesture_dynamics = GestureDynamics()
         
         # For color wheel selection
         self.color_select_active = False
-        self.color_select_start_pos = None
         self.hue = 0  # Initial hue (red)
         
         # Predefined colors palette
@@ -53,23 +66,67 @@ class GestureDrawingApp:
         ]
         self.current_color_index = 0
         
+        # Widget values written by the gesture code, pushed to Tk once per frame
+        self.ui_state = UIState()
+        self.update_color_indicator()
+        self.update_palette_highlight()
+        self.ui_state.set('brush_size', self.brush_thickness)
+        
         # Initialize canvas
-        self.canvas_width = 640
-        self.canvas_height = 480
+        self.canvas_width, self.canvas_height = display_size
+        
+        # Hand tracking runs on a smaller copy of each frame
+        self.inference_size = inference_size
+        self.preprocessor = FramePreprocessor(display_size, inference_size)
         self.canvas = np.zeros((self.canvas_height, self.canvas_width, 3), dtype=np.uint8)
         
-        # FPS tracking
-        self.last_frame_time = time.time()
+        # Cached on-screen indicators
+        self.hud = HudRenderer(self.canvas_width)
+        
+        # FPS tracking (monotonic, gesture timing must not jump with the wall clock)
+        self.last_frame_time = time.monotonic()
+        self.frame_time = self.last_frame_time  # Timestamp of the frame being processed
         self.fps = 0
+        # The displayed FPS is refreshed twice a second so the HUD stays cached
+        self.fps_display = 0
+        self.fps_display_time = 0
+        # Capture to display time of the last frame, from the source's timestamps
+        self.latency = None
+        self.latency_display = None
         self.frame_times = []
-        self.target_fps = 30
+        self.target_fps = target_fps
         self.frame_interval = 1.0 / self.target_fps
         
+        # Low frame rate, motion-gated tracking when no hand is around
+        self.idle_monitor = IdleMonitor(idle_after=idle_after)
+        
+        # Trades quality for speed when frames take longer than the target allows
+        self.quality = quality or QualityController(self.target_fps)
+        self.stage_times = {}
+        self.draw_landmarks = True
+        self.display_scale = 1.0
+        self.ui_state.set('quality', self.quality.describe())
+        
+        # Shared memory / named pipe output of the composited frames
+        self.frame_sink = frame_sink
+        # Recognized gestures published for other programs
+        self.gesture_events = gesture_events
+        self.pointer = None
+        
+        # Saving as SVG vectorizes the drawing on background threads
+        self.svg_exporter = SvgExporter()
+        self.svg_export = None
+        
+        # Composites the canvas over the video
+        self.blend_engine = blend_engine or BlendEngine()
+        
         # Create UI
         self.setup_ui()
         
-        # Start video capture
-        self.cap = cv2.VideoCapture(0)
+        # Start video capture (the camera unless another frame source is given)
+        self.source = (frame_source or CameraSource()).open()
+        if not self.source.is_open():
+            print(f"Could not open the frame source: {self.source.describe()}")
         self.update_frame()
     
     def setup_ui(self):
@@ -96,6 +153,27 @@ class GestureDrawingApp:
         self.brush_size_slider = ttk.Scale(control_frame, from_=1, to=30, orient=tk.HORIZONTAL, value=self.brush_thickness)
         self.brush_size_slider.pack(fill=tk.X, pady=5)
         self.brush_size_slider.bind("<ButtonRelease-1>", self.update_brush_size)
+
+        # Ink over video blending
+        ttk.Label(control_frame, text="Blend:").pack(pady=5, anchor=tk.W)
+        self.blend_var = tk.StringVar(value=self.blend_engine.mode)
+        blend_combo = ttk.Combobox(
+            control_frame,
+            textvariable=self.blend_var,
+            values=BLEND_MODES,
+            state="readonly"
+        )
+        blend_combo.pack(fill=tk.X, pady=5)
+        blend_combo.bind("<<ComboboxSelected>>", self.change_blend_mode)
+        ttk.Label(control_frame, text="Ink / Video Opacity:").pack(pady=5, anchor=tk.W)
+        self.ink_opacity_slider = ttk.Scale(control_frame, from_=0, to=100, orient=tk.HORIZONTAL, 
+                                            value=self.blend_engine.ink_opacity * 100)
+        self.ink_opacity_slider.pack(fill=tk.X, pady=2)
+        self.ink_opacity_slider.bind("<ButtonRelease-1>", self.update_blend_opacity)
+        self.video_opacity_slider = ttk.Scale(control_frame, from_=0, to=100, orient=tk.HORIZONTAL, 
+                                              value=self.blend_engine.video_opacity * 100)
+        self.video_opacity_slider.pack(fill=tk.X, pady=2)
+        self.video_opacity_slider.bind("<ButtonRelease-1>", self.update_blend_opacity)
         
         # Clear canvas button
         clear_btn = ttk.Button(control_frame, text="Clear Canvas", command=self.clear_canvas)
@@ -105,6 +183,10 @@ class GestureDrawingApp:
         save_btn = ttk.Button(control_frame, text="Save Drawing", command=self.save_drawing)
         save_btn.pack(pady=5, fill=tk.X)
         
+        # Adaptive quality level
+        self.quality_var = tk.StringVar()
+        ttk.Label(control_frame, textvariable=self.quality_var).pack(pady=5, anchor=tk.W)
+        
         # Gesture instructions
         ttk.Separator(control_frame).pack(fill=tk.X, pady=10)
         ttk.Label(control_frame, text="Gesture Instructions:", font=("Arial", 12, "bold")).pack(pady=5, anchor=tk.W)
@@ -125,7 +207,8 @@ class GestureDrawingApp:
         ttk.Label(control_frame, text="Current Color:").pack(pady=5, anchor=tk.W)
         self.color_indicator = tk.Canvas(control_frame, width=50, height=30)
         self.color_indicator.pack(pady=5, anchor=tk.W)
-        self.update_color_indicator()
+        # One rectangle, recolored in place
+        self.color_indicator_rect = self.color_indicator.create_rectangle(0, 0, 50, 30, outline="")
         
         # Color palette 
         ttk.Label(control_frame, text="Color Palette:").pack(pady=5, anchor=tk.W)
@@ -141,9 +224,36 @@ class GestureDrawingApp:
             swatch.grid(row=i//4, column=i%4, padx=2, pady=2)
             swatch.bind("<Button-1>", lambda event, idx=i: self.select_palette_color(idx))
             self.color_swatches.append(swatch)
+        self.ui_state.mark_pushed('palette', tuple(self.color_palette))
         
-        # Highlight current color
-        self.update_palette_highlight()
+        self.ui_state.bind('drawing_color', self.show_drawing_color)
+        self.ui_state.bind('palette', self.show_palette)
+        self.ui_state.bind('color_index', self.show_color_index)
+        self.ui_state.bind('brush_size', lambda size, previous: self.brush_size_slider.set(size))
+        self.ui_state.bind('quality', lambda quality, previous: self.quality_var.set(f"Quality: {quality}"))
+    
+    def create_hands(self, model_complexity=1):
+        return self.mp_hands.Hands(
+            static_image_mode=False,
+            max_num_hands=1,
+            model_complexity=model_complexity,
+            min_detection_confidence=0.7,
+            min_tracking_confidence=0.7
+        )
+    
+    def apply_quality(self):
+        # Push the quality controller's current knobs into the pipeline
+        knobs = self.quality.knobs()
+        if knobs['model_complexity'] != self.model_complexity:
+            self.hands.close()
+            self.hands = self.create_hands(knobs['model_complexity'])
+            self.model_complexity = knobs['model_complexity']
+        scale = knobs['inference_scale']
+        self.preprocessor.set_inference_size((max(1, int(self.inference_size[0] * scale)), 
+                                              max(1, int(self.inference_size[1] * scale))))
+        self.draw_landmarks = knobs['draw_landmarks']
+        self.display_scale = knobs['display_scale']
+        self.ui_state.set('quality', self.quality.describe())
     
     def select_palette_color(self, index):
         self.current_color_index = index
@@ -152,17 +262,29 @@ class GestureDrawingApp:
         self.update_palette_highlight()
     
     def update_palette_highlight(self):
-        for i, swatch in enumerate(self.color_swatches):
-            if i == self.current_color_index:
-                swatch.config(highlightbackground="gold", highlightthickness=2)
-            else:
-                swatch.config(highlightbackground="gray", highlightthickness=1)
+        self.ui_state.set('color_index', self.current_color_index)
+        self.ui_state.set('palette', tuple(self.color_palette))
     
     def update_color_indicator(self):
+        self.ui_state.set('drawing_color', self.drawing_color)
+    
+    @staticmethod
+    def to_hex(color):
         # Convert BGR to RGB for tkinter
-        rgb_color = f'#{self.drawing_color[2]:02x}{self.drawing_color[1]:02x}{self.drawing_color[0]:02x}'
-        self.color_indicator.configure(bg=rgb_color)
-        self.color_indicator.create_rectangle(0, 0, 50, 30, fill=rgb_color, outline="")
+        return f'#{color[2]:02x}{color[1]:02x}{color[0]:02x}'
+    
+    def show_drawing_color(self, color, previous):
+        self.color_indicator.itemconfigure(self.color_indicator_rect, fill=self.to_hex(color))
+    
+    def show_palette(self, palette, previous):
+        for i, color in enumerate(palette):
+            if previous is None or previous[i] != color:
+                self.color_swatches[i].configure(bg=self.to_hex(color))
+    
+    def show_color_index(self, index, previous):
+        if previous is not None:
+            self.color_swatches[previous].config(highlightbackground="gray", highlightthickness=1)
+        self.color_swatches[index].config(highlightbackground="gold", highlightthickness=2)
     
     def choose_color(self):
         color = colorchooser.askcolor(initialcolor="#ff0000")[0]
@@ -179,8 +301,15 @@ class GestureDrawingApp:
     
     def update_brush_size(self, event=None):
         self.brush_thickness = int(self.brush_size_slider.get())
-        # Update UI slider to match
-        self.brush_size_slider.set(self.brush_thickness)
+        # Snap the slider to the whole size on the next sync
+        self.ui_state.set('brush_size', self.brush_thickness)
+    
+    def change_blend_mode(self, event=None):
+        self.blend_engine.set_mode(self.blend_var.get())
+    
+    def update_blend_opacity(self, event=None):
+        self.blend_engine.set_opacity(self.ink_opacity_slider.get() / 100.0, 
+                                      self.video_opacity_slider.get() / 100.0)
     
     def clear_canvas(self):
         self.canvas = np.zeros((self.canvas_height, self.canvas_width, 3), dtype=np.uint8)
@@ -199,22 +328,45 @@ class GestureDrawingApp:
             initialdir="./drawings",
             initialfile=f"drawing_{timestamp}.png",
             defaultextension=".png",
-            filetypes=[("PNG files", "*.png"), ("JPEG files", "*.jpg"), ("All files", "*.*")]
+            filetypes=[("PNG files", "*.png"), ("JPEG files", "*.jpg"), ("SVG files", "*.svg"), 
+                       ("All files", "*.*")]
         )
         
         if filename:
+            if filename.lower().endswith(".svg"):
+                # Vectorized in the background, confirmed when done
+                self.svg_export = self.svg_exporter.export(self.canvas, filename)
+                return
             # Save the canvas as an image file
             cv2.imwrite(filename, self.canvas)
-            # Show confirmation
-            confirmation = tk.Toplevel(self.root)
-            confirmation.title("Success")
-            ttk.Label(confirmation, text=f"Drawing saved to {filename}").pack(padx=20, pady=20)
-            ttk.Button(confirmation, text="OK", command=confirmation.destroy).pack(pady=10)
+            self.show_confirmation(f"Drawing saved to {filename}")
+    
+    def show_confirmation(self, message):
+        confirmation = tk.Toplevel(self.root)
+        confirmation.title("Success")
+        ttk.Label(confirmation, text=message).pack(padx=20, pady=20)
+        ttk.Button(confirmation, text="OK", command=confirmation.destroy).pack(pady=10)
+    
+    def poll_svg_export(self):
+        # Confirm a background SVG export once it has finished
+        if self.svg_export is None or not self.svg_export.done():
+            return
+        export, self.svg_export = self.svg_export, None
+        try:
+            result = export.result()
+        except Exception as e:
+            messagebox.showerror("SVG export", f"Could not export the drawing: {e}")
+            return
+        self.show_confirmation(f"Drawing saved to {result['path']} "
+                               f"({result['colors']} colors, {result['seconds']:.2f} s)")
     
     def hsv_to_bgr(self, h, s=1.0, v=1.0):
         """Convert HSV color to BGR color (what OpenCV uses)"""
-        r, g, b = colorsys.hsv_to_rgb(h, s, v)
-        return (int(b * 255), int(g * 255), int(r * 255))
+        if s == 1.0 and v == 1.0:
+            return hue_to_bgr(h)
+        b, g, r = hue_to_bgr(h)
+        # Scale the fully saturated color down to the requested s and v
+        return tuple(int(v * (255 - (255 - c) * s)) for c in (b, g, r))
     
     def detect_gestures(self, hand_landmarks):
         # Get landmark positions
@@ -223,11 +375,13 @@ class GestureDrawingApp:
         
         # Index finger tip (drawing pointer)
         index_tip = landmarks[8]
+        self.pointer = index_tip
         
         # Drawing control (index + middle finger up = not drawing)
         index_up = landmarks[8][1] < landmarks[6][1]  # Index finger up
         middle_up = landmarks[12][1] < landmarks[10][1]  # Middle finger up
         
+        was_drawing = self.is_drawing
         if index_up and middle_up:
             self.is_drawing = False
             self.prev_point = None
@@ -235,114 +389,118 @@ class GestureDrawingApp:
             self.is_drawing = True
         else:
             self.is_drawing = False
+        if self.is_drawing != was_drawing:
+            self.publish_gesture('DRAW_START' if self.is_drawing else 'DRAW_STOP')
+        
+        # Distances below are in hand sizes, independent of resolution
+        dynamics = self.gesture_dynamics
+        dynamics.update(landmarks, self.frame_time)
         
-        # Color change gesture (closed fist)
+        # Closed fist (thumb tip close to pinky tip, fingers curled)
         thumb_tip = landmarks[4]
         pinky_tip = landmarks[20]
-        distance_thumb_pinky = np.sqrt((thumb_tip[0] - pinky_tip[0])**2 + (thumb_tip[1] - pinky_tip[1])**2)
         
-        # Check if fingers are curled (fist)
         all_fingers_down = all([
             landmarks[8][1] > landmarks[6][1],   # Index down
             landmarks[12][1] > landmarks[10][1], # Middle down
             landmarks[16][1] > landmarks[14][1], # Ring down
             landmarks[20][1] > landmarks[18][1]  # Pinky down
         ])
+        is_fist = dynamics.relative_distance(thumb_tip, pinky_tip) < dynamics.FIST_DISTANCE and all_fingers_down
         
-        # Closed fist gesture (cycle through preset colors)
-        if distance_thumb_pinky < 50 and all_fingers_down and not self.color_change_active:
-            self.color_change_active = True
-            # Cycle through preset color palette
-            self.current_color_index = (self.current_color_index + 1) % len(self.color_palette)
-            self.drawing_color = self.color_palette[self.current_color_index]
-            self.update_color_indicator()
-            self.update_palette_highlight()
-        elif distance_thumb_pinky >= 50 or not all_fingers_down:
-            self.color_change_active = False
-        
-        # OK gesture for color selection mode (thumb and index finger form a circle)
-        thumb_tip = landmarks[4]
-        index_tip = landmarks[8]
-        distance_thumb_index = np.sqrt((thumb_tip[0] - index_tip[0])**2 + (thumb_tip[1] - index_tip[1])**2)
-        
-        # Other fingers up
+        # OK gesture (thumb and index touch, other fingers up)
         other_fingers_up = all([
             landmarks[12][1] < landmarks[10][1],  # Middle up
             landmarks[16][1] < landmarks[14][1],  # Ring up
             landmarks[20][1] < landmarks[18][1]   # Pinky up
         ])
+        is_ok_gesture = dynamics.relative_distance(thumb_tip, index_tip) < dynamics.OK_DISTANCE and other_fingers_up
         
-        # OK gesture (thumb and index touch, other fingers up)
-        is_ok_gesture = distance_thumb_index < 30 and other_fingers_up
+        # Pinky up with the other fingers down
+        pinky_up = landmarks[20][1] < landmarks[18][1]
+        is_pinky_gesture = pinky_up and all([
+            landmarks[8][1] > landmarks[6][1],   # Index down
+            landmarks[12][1] > landmarks[10][1], # Middle down
+            landmarks[16][1] > landmarks[14][1]  # Ring down
+        ])
         
-        if is_ok_gesture and not self.color_select_active:
+        # Open palm (all fingers up)
+        all_fingers_up = all([
+            landmarks[4][1] < landmarks[3][1],   # Thumb up
+            landmarks[8][1] < landmarks[6][1],   # Index up
+            landmarks[12][1] < landmarks[10][1], # Middle up
+            landmarks[16][1] < landmarks[14][1], # Ring up
+            landmarks[20][1] < landmarks[18][1]  # Pinky up
+        ])
+        
+        # Debounce the discrete gestures over the last few frames
+        fired, held = self.gesture_recognizer.update({
+            'FIST': is_fist,
+            'OK': is_ok_gesture,
+            'PINKY': is_pinky_gesture,
+            'OPEN_PALM': all_fingers_up
+        }, self.frame_time)
+        
+        # Closed fist: cycle through preset colors
+        if 'FIST' in fired:
+            self.current_color_index = (self.current_color_index + 1) % len(self.color_palette)
+            self.drawing_color = self.color_palette[self.current_color_index]
+            self.update_color_indicator()
+            self.update_palette_highlight()
+            self.publish_gesture('FIST')
+        
+        # OK gesture: color selection mode
+        if 'OK' in held and not self.color_select_active:
             # Enter color selection mode
             self.color_select_active = True
-            self.color_select_start_pos = index_tip[0]
-        elif self.color_select_active and is_ok_gesture:
+            dynamics.begin_hue(index_tip[0])
+            self.publish_gesture('OK_START', self.hue)
+        elif 'OK' in held:
             # In color selection mode, move left/right to change hue
-            movement = (index_tip[0] - self.color_select_start_pos) / self.canvas_width
-            # Update hue based on horizontal position (wrap around 0-1)
-            self.hue = (self.hue + movement) % 1.0
-            self.color_select_start_pos = index_tip[0]
+            self.hue = (self.hue + dynamics.hue_shift(index_tip[0])) % 1.0
             
             # Convert HSV to BGR and update color
             self.drawing_color = self.hsv_to_bgr(self.hue, 1.0, 1.0)
             self.update_color_indicator()
-        elif not is_ok_gesture:
+        elif self.color_select_active:
             self.color_select_active = False
+            self.publish_gesture('OK_END', self.hue)
         
         # Brush size adjustment (pinky finger)
-        pinky_tip = landmarks[20]
-        pinky_up = landmarks[20][1] < landmarks[18][1]  # Pinky finger up
-        other_fingers_down = all([
-            landmarks[8][1] > landmarks[6][1],   # Index down
-            landmarks[12][1] > landmarks[10][1], # Middle down
-            landmarks[16][1] > landmarks[14][1]  # Ring down
-        ])
-        
-        # First time raising pinky
-        if pinky_up and other_fingers_down and not self.brush_size_active:
+        if 'PINKY' in held and not self.brush_size_active:
+            # First time raising pinky
             self.brush_size_active = True
-            self.initial_pinky_y = pinky_tip[1]
-        # Continuing to adjust with pinky
-        elif pinky_up and other_fingers_down and self.brush_size_active:
-            if self.initial_pinky_y is not None:
-                # Calculate vertical movement
-                delta_y = self.initial_pinky_y - pinky_tip[1]
-                # Map vertical position to brush size (1-30)
-                # Moving up increases size, moving down decreases
-                new_size = int(self.brush_thickness + (delta_y / 100))  # Adjust sensitivity
-                new_size = max(1, min(30, new_size))  # Clamp between 1 and 30
-                
-                if abs(new_size - self.brush_thickness) > 0:
-                    self.brush_thickness = new_size
-                    self.update_brush_size()
-                    self.initial_pinky_y = pinky_tip[1]  # Update reference point
-        # Released pinky
-        elif not pinky_up and self.brush_size_active:
+            dynamics.begin_brush_size(pinky_tip[1], self.brush_thickness)
+            self.publish_gesture('PINKY_START', self.brush_thickness)
+        elif 'PINKY' in held:
+            # The size follows the pinky's height: up for bigger, down for smaller
+            new_size = dynamics.brush_size(pinky_tip[1], self.brush_thickness)
+            if new_size != self.brush_thickness:
+                self.brush_thickness = new_size
+                self.ui_state.set('brush_size', self.brush_thickness)
+        elif self.brush_size_active:
+            # Released pinky
             self.brush_size_active = False
-            self.initial_pinky_y = None
-        
-        # Clear canvas gesture (open palm)
-        all_fingers_up = all([
-            landmarks[4][1] < landmarks[3][1],   # Thumb up
-            landmarks[8][1] < landmarks[6][1],   # Index up
-            landmarks[12][1] < landmarks[10][1], # Middle up
-            landmarks[16][1] < landmarks[14][1], # Ring up
-            landmarks[20][1] < landmarks[18][1]  # Pinky up
-        ])
+            self.publish_gesture('PINKY_END', self.brush_thickness)
         
-        if all_fingers_up and not self.clear_gesture_active:
-            self.clear_gesture_active = True
+        # Open palm: clear canvas
+        if 'OPEN_PALM' in fired:
             self.clear_canvas()
-        elif not all_fingers_up:
-            self.clear_gesture_active = False
+            self.publish_gesture('OPEN_PALM')
         
+        self.publish_gesture('POINTER', self.brush_thickness)
         return index_tip
     
+    def publish_gesture(self, name, value=0.0):
+        # Events carry the index fingertip, normalized to the canvas
+        if self.gesture_events is not None:
+            x, y = self.pointer
+            self.gesture_events.publish(name, self.frame_time, (x / self.canvas_width, y / self.canvas_height), 
+                                        value, self.is_drawing)
+    
     def update_frame(self):
-        current_time = time.time()
+        current_time = time.monotonic()
+        self.frame_time = current_time
         elapsed = current_time - self.last_frame_time
         
         # Calculate FPS
@@ -351,29 +509,36 @@ class GestureDrawingApp:
             self.frame_times.pop(0)
         self.fps = 1.0 / (sum(self.frame_times) / len(self.frame_times))
         
-        ret, frame = self.cap.read()
+        self.poll_svg_export()
+        
+        ret, frame, captured = self.source.read()
         if ret:
-            # Flip the frame horizontally for a more intuitive mirroring effect
-            frame = cv2.flip(frame, 1)
-            
-            # Resize frame to fit our canvas dimensions
-            frame = cv2.resize(frame, (self.canvas_width, self.canvas_height))
+            # Gestures are timed by when the frame was captured
+            self.frame_time = captured
+            start = time.perf_counter()
             
-            # Convert the image to RGB for MediaPipe
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            # Mirror and scale to the display size, with a downscaled RGB
+            # copy for MediaPipe
+            frame, rgb_frame = self.preprocessor.process(frame)
             
-            # Process hand landmarks
-            results = self.hands.process(rgb_frame)
+            # Process hand landmarks; while idle, only when something moves
+            hand_landmarks_list = None
+            tracking_start = time.perf_counter()
+            if self.idle_monitor.should_run_inference(rgb_frame, current_time):
+                hand_landmarks_list = self.hands.process(rgb_frame).multi_hand_landmarks
+            tracking_time = time.perf_counter() - tracking_start
+            self.idle_monitor.update(bool(hand_landmarks_list), current_time)
             
             # Draw hand landmarks
-            if results.multi_hand_landmarks:
-                for hand_landmarks in results.multi_hand_landmarks:
+            if hand_landmarks_list:
+                for hand_landmarks in hand_landmarks_list:
                     # Draw landmarks on the frame
-                    self.mp_draw.draw_landmarks(
-                        frame, 
-                        hand_landmarks, 
-                        self.mp_hands.HAND_CONNECTIONS
-                    )
+                    if self.draw_landmarks:
+                        self.mp_draw.draw_landmarks(
+                            frame, 
+                            hand_landmarks, 
+                            self.mp_hands.HAND_CONNECTIONS
+                        )
                     
                     # Detect gestures and get current pointer position
                     pointer_pos = self.detect_gestures(hand_landmarks)
@@ -391,34 +556,41 @@ class GestureDrawingApp:
                         cv2.circle(frame, pointer_pos, 10, self.drawing_color, -1)
             else:
                 self.prev_point = None
+                self.gesture_recognizer.update({}, self.frame_time)
+                self.gesture_dynamics.reset()
+                if self.pointer is not None:
+                    self.publish_gesture('HAND_LOST')
+                    self.pointer = None
             
-            # Show mode indicator
+            # Brush size, FPS and (in color selection) the hue wheel
+            if current_time - self.fps_display_time >= 0.5:
+                self.fps_display = int(self.fps)
+                if self.latency is not None:
+                    self.latency_display = int(self.latency * 1000)
+                self.fps_display_time = current_time
+            hud_texts = [
+                (f"Size: {self.brush_thickness}", (50, 40)),
+                (f"FPS: {self.fps_display}", (10, 70))
+            ]
+            if self.latency_display is not None:
+                hud_texts.append((f"Latency: {self.latency_display} ms", (10, 100)))
             if self.color_select_active:
-                cv2.putText(frame, "Color Selection Mode", (10, 30), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                
-                # Draw color wheel indicator
-                wheel_center = (self.canvas_width - 50, 50)
-                wheel_radius = 30
-                cv2.circle(frame, wheel_center, wheel_radius, (255, 255, 255), 2)
-                
-                # Draw current hue marker
-                angle = self.hue * 2 * np.pi
-                marker_x = int(wheel_center[0] + wheel_radius * np.cos(angle))
-                marker_y = int(wheel_center[1] + wheel_radius * np.sin(angle))
-                cv2.circle(frame, (marker_x, marker_y), 5, self.drawing_color, -1)
-                
-            # Draw current brush size indicator
-            cv2.circle(frame, (30, 30), self.brush_thickness, self.drawing_color, -1)
-            cv2.putText(frame, f"Size: {self.brush_thickness}", (50, 40), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            
-            # Display FPS
-            cv2.putText(frame, f"FPS: {int(self.fps)}", (10, 70), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+                hud_texts.append(("Color Selection Mode", (10, 30)))
+            if self.idle_monitor.idle:
+                hud_texts.append(("Idle", (self.canvas_width - 90, 30)))
+            self.hud.draw(frame, hud_texts, self.brush_thickness, self.drawing_color, 
+                          self.hue if self.color_select_active else None)
             
             # Combine canvas with frame
-            combined_img = cv2.addWeighted(frame, 0.7, self.canvas, 0.7, 0)
+            combined_img = self.blend_engine.blend(frame, self.canvas)
+            if self.frame_sink is not None:
+                self.frame_sink.publish(combined_img, captured)
+            
+            processed = time.perf_counter()
+            
+            # Scaled down for display at the lowest quality level
+            if self.display_scale < 1.0:
+                combined_img = cv2.resize(combined_img, None, fx=self.display_scale, fy=self.display_scale)
             
             # Convert to RGB for tkinter
             rgb_img = cv2.cvtColor(combined_img, cv2.COLOR_BGR2RGB)
@@ -430,21 +602,75 @@ class GestureDrawingApp:
             # Update the UI
             self.video_frame.imgtk = imgtk
             self.video_frame.configure(image=imgtk)
+            
+            # Step the quality level on the time actually spent (not the
+            # wait for the camera)
+            self.stage_times['tracking'] = tracking_time
+            self.stage_times['drawing'] = processed - start - tracking_time
+            self.stage_times['display'] = time.perf_counter() - processed
+            if self.quality.update(self.stage_times, current_time):
+                self.apply_quality()
+            
+            if self.source.realtime:
+                self.latency = time.monotonic() - captured
+        
+        # Push whatever the gestures changed this frame to the widgets
+        self.ui_state.sync()
         
         # Calculate next frame delay to maintain target FPS
-        frame_time = time.time() - current_time
-        delay = max(1, int((self.frame_interval - frame_time) * 1000))
+        frame_time = time.monotonic() - current_time
+        delay = max(1, int((self.idle_monitor.frame_interval(self.frame_interval) - frame_time) * 1000))
         self.last_frame_time = current_time
         
         # Schedule next frame
         self.root.after(delay, self.update_frame)
     
     def on_closing(self):
-        self.cap.release()
+        if self.frame_sink is not None:
+            self.frame_sink.close()
+        if self.gesture_events is not None:
+            self.gesture_events.close()
+        self.svg_exporter.close()
+        self.source.close()
         self.root.destroy()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gesture drawing app")
+    parser.add_argument("--display-size", type=parse_size, default=DISPLAY_SIZE,
+                        help="canvas and display resolution, e.g. 1280x720")
+    parser.add_argument("--inference-size", type=parse_size, default=INFERENCE_SIZE,
+                        help="hand tracking input resolution, e.g. 256x192")
+    parser.add_argument("--idle-after", type=float, default=10.0,
+                        help="seconds without a hand before entering power-saving idle mode")
+    parser.add_argument("--shm-name", help="publish composited frames to this POSIX shared-memory ring")
+    parser.add_argument("--fifo", help="stream raw BGR24 frames to this named pipe (created if missing)")
+    parser.add_argument("--blend-mode", choices=BLEND_MODES, default="over",
+                        help="how ink is composited over the video")
+    parser.add_argument("--ink-opacity", type=float, default=1.0, help="ink opacity, 0 to 1")
+    parser.add_argument("--video-opacity", type=float, default=1.0, help="video brightness under the ink, 0 to 1")
+    parser.add_argument("--target-fps", type=float, default=30, help="frame rate the quality controller holds")
+    parser.add_argument("--latency-target", type=float, help="max processing time per frame in ms")
+    parser.add_argument("--fixed-quality", action="store_true", help="always run at full quality")
+    parser.add_argument("--events", type=parse_address, action="append", 
+                        help="publish gesture events to udp:host:port or unix:/path (repeatable)")
+    add_source_arguments(parser)
+    args = parser.parse_args()
+    
+    latency_target = args.latency_target / 1000.0 if args.latency_target else None
+    quality = QualityController(args.target_fps, latency_target, 
+                                levels=QUALITY_LEVELS[:1] if args.fixed_quality else None)
+    
+    # Optional raw frame output for other programs
+    frame_sink = None
+    if args.shm_name or args.fifo:
+        frame_sink = FrameSink(*args.display_size, shm_name=args.shm_name, fifo_path=args.fifo)
+    gesture_events = GesturePublisher(args.events) if args.events else None
+    
     root = tk.Tk()
-    app = GestureDrawingApp(root)
+    app = GestureDrawingApp(root, display_size=args.display_size, inference_size=args.inference_size,
+              idle_after=args.idle_after, frame_sink=frame_sink,
+              blend_engine=BlendEngine(args.blend_mode, args.ink_opacity, args.video_opacity),
+              target_fps=args.target_fps, quality=quality, gesture_events=gesture_events, 
+              frame_source=source_from_args(args))
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop() 
\ No newline at end of file
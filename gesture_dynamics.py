@@ -0,0 +1,107 @@
+import math
+from collections import deque
+
+
+def landmark_distance(a, b):
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+def hand_size(landmarks):
+    """Wrist to middle finger MCP distance, the unit for all gesture distances"""
+    return max(1.0, landmark_distance(landmarks[0], landmarks[9]))
+
+
+class GestureDynamics:
+    """Frame-rate and resolution independent state for the continuous gestures
+
+    Distances are measured in hand sizes, so they mean the same at any
+    canvas resolution and any distance from the camera. The hand size is
+    smoothed with a time constant rather than a per-frame factor, and the
+    brush size follows the pinky's position rather than summing per-frame
+    steps, so the controls feel the same at any frame rate. Timestamps must
+    come from a monotonic clock (or a video's own clock).
+    """
+
+    # Pinch thresholds in hand sizes (were 50 px and 30 px at 640x480)
+    FIST_DISTANCE = 0.55   # thumb tip to pinky tip
+    OK_DISTANCE = 0.33     # thumb tip to index tip
+
+    # Sideways movement, in hand sizes, for one full turn of the hue wheel
+    HUE_SPAN = 6.0
+    # Brush size steps per hand size of vertical pinky movement
+    SIZE_PER_HAND = 10.0
+    MIN_BRUSH_SIZE = 1
+    MAX_BRUSH_SIZE = 30
+    # Time constant (seconds) of the hand size filter
+    SCALE_SMOOTHING = 0.15
+    # A swipe is this many hand sizes sideways within SWIPE_TIME seconds
+    SWIPE_DISTANCE = 2.5
+    SWIPE_TIME = 0.3
+    SWIPE_COOLDOWN = 0.8
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget the hand, e.g. when it leaves the frame"""
+        self.scale = None
+        self.last_time = None
+        self.hue_anchor_x = None
+        self.size_anchor = None
+        self.swipe_track = deque()
+        self.swipe_ready_at = 0.0
+
+    def update(self, landmarks, now):
+        """Feed one frame of pixel landmarks, returns the smoothed hand size"""
+        size = hand_size(landmarks)
+        if self.scale is None:
+            self.scale = size
+        else:
+            dt = max(0.0, now - self.last_time)
+            self.scale += (1.0 - math.exp(-dt / self.SCALE_SMOOTHING)) * (size - self.scale)
+        self.last_time = now
+        return self.scale
+
+    def relative_distance(self, a, b):
+        return landmark_distance(a, b) / self.scale
+
+    def begin_hue(self, x):
+        self.hue_anchor_x = x
+
+    def hue_shift(self, x):
+        """Hue change, as a fraction of a turn, for the pointer moving to x"""
+        if self.hue_anchor_x is None:
+            # Hand came back after a reset
+            self.begin_hue(x)
+        shift = (x - self.hue_anchor_x) / (self.HUE_SPAN * self.scale)
+        self.hue_anchor_x = x
+        return shift
+
+    def begin_brush_size(self, y, brush_size):
+        self.size_anchor = (y, brush_size)
+
+    def brush_size(self, y, brush_size):
+        """Brush size for the pinky at height y, relative to where the gesture began"""
+        if self.size_anchor is None:
+            self.begin_brush_size(y, brush_size)
+        anchor_y, anchor_size = self.size_anchor
+        size = anchor_size + (anchor_y - y) / self.scale * self.SIZE_PER_HAND
+        return int(round(min(max(size, self.MIN_BRUSH_SIZE), self.MAX_BRUSH_SIZE)))
+
+    def end_swipe(self):
+        self.swipe_track.clear()
+
+    def swipe(self, point, now):
+        """Track the pointer, returns 1 for a quick sweep right, -1 for left, else 0"""
+        track = self.swipe_track
+        track.append((now, point[0], point[1]))
+        while now - track[0][0] > self.SWIPE_TIME:
+            track.popleft()
+        dx = point[0] - track[0][1]
+        dy = point[1] - track[0][2]
+        if (now < self.swipe_ready_at or abs(dx) < self.SWIPE_DISTANCE * self.scale
+                or abs(dx) < 2 * abs(dy)):
+            return 0
+        self.swipe_ready_at = now + self.SWIPE_COOLDOWN
+        track.clear()
+        return 1 if dx > 0 else -1
@@ -0,0 +1,162 @@
+import os
+import socket
+import struct
+from collections import namedtuple
+
+
+# One datagram per event: magic, version, event type, flags, sequence,
+# timestamp (time.monotonic() of the publisher), fingertip x and y (0 to 1
+# across the canvas) and an event-specific value
+EVENT_MAGIC = b"GDEV"
+EVENT_VERSION = 1
+EVENT = struct.Struct("<4sBBHQdfff")
+FLAG_DRAWING = 1
+
+# Wire codes, never renumber
+EVENT_TYPES = {
+    'POINTER': 1,       # every tracked frame; value is the brush size
+    'HAND_LOST': 2,
+    'DRAW_START': 3,
+    'DRAW_STOP': 4,
+    'FIST': 5,
+    'OK_START': 6,      # value is the hue, 0 to 1
+    'OK_END': 7,
+    'PINKY_START': 8,   # value is the brush size
+    'PINKY_END': 9,
+    'OPEN_PALM': 10,
+    'THUMB_UP': 11,     # value is the new drawing mode index
+    'SWIPE_LEFT': 12,
+    'SWIPE_RIGHT': 13
+}
+EVENT_NAMES = {code: name for name, code in EVENT_TYPES.items()}
+
+DEFAULT_PORT = 47800
+
+GestureEvent = namedtuple('GestureEvent', 'name sequence timestamp x y value drawing')
+
+
+def parse_address(text):
+    """argparse type for an event address: udp:host:port, udp:port, a bare port or unix:/path"""
+    kind, _, rest = text.partition(":")
+    if kind == "unix":
+        return (socket.AF_UNIX, rest)
+    if kind == "udp":
+        text = rest
+    host, _, port = text.rpartition(":")
+    return (socket.AF_INET, (host or "127.0.0.1", int(port)))
+
+
+def decode_event(data):
+    """GestureEvent from one datagram, or None if it isn't one"""
+    if len(data) != EVENT.size:
+        return None
+    magic, version, code, flags, sequence, timestamp, x, y, value = EVENT.unpack(data)
+    if magic != EVENT_MAGIC or version != EVENT_VERSION:
+        return None
+    return GestureEvent(EVENT_NAMES.get(code, f"UNKNOWN_{code}"), sequence, timestamp, x, y, value,
+                        bool(flags & FLAG_DRAWING))
+
+
+class GesturePublisher:
+    """Sends gesture events as fixed-size datagrams to local subscribers
+
+    Sending never blocks: the sockets are non-blocking and an event that
+    can't be delivered right away (nobody listening, full socket buffer)
+    is dropped and counted. Datagrams keep each event whole, and the
+    sequence number lets subscribers notice drops.
+    """
+
+    def __init__(self, addresses):
+        self.addresses = list(addresses)
+        self.sockets = {}
+        for family, _ in self.addresses:
+            if family not in self.sockets:
+                sock = socket.socket(family, socket.SOCK_DGRAM)
+                sock.setblocking(False)
+                self.sockets[family] = sock
+        self.sequence = 0
+        self.dropped = 0
+        self.buffer = bytearray(EVENT.size)
+
+    def publish(self, name, timestamp, point=(0.0, 0.0), value=0.0, drawing=False):
+        self.sequence += 1
+        EVENT.pack_into(self.buffer, 0, EVENT_MAGIC, EVENT_VERSION, EVENT_TYPES[name],
+                        FLAG_DRAWING if drawing else 0, self.sequence, timestamp,
+                        point[0], point[1], value)
+        for family, address in self.addresses:
+            try:
+                self.sockets[family].sendto(self.buffer, address)
+            except OSError:
+                # No subscriber bound yet, or it is not keeping up
+                self.dropped += 1
+
+    def close(self):
+        for sock in self.sockets.values():
+            sock.close()
+
+
+class GestureSubscriber:
+    """Receives gesture events from a GesturePublisher in another process
+
+    Binds the address the publisher sends to; a Unix socket path left over
+    from an earlier run is replaced. Iterating blocks and yields events as
+    they arrive; receive() takes a timeout, and fileno() allows select().
+    """
+
+    def __init__(self, address):
+        family, self.address = address
+        self.sock = socket.socket(family, socket.SOCK_DGRAM)
+        if family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+        self.sock.bind(self.address)
+        self.family = family
+        self.last_sequence = None
+        self.missed = 0
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def receive(self, timeout=None):
+        """Next event, or None if none arrived within timeout seconds (None waits forever)"""
+        self.sock.settimeout(timeout)
+        while True:
+            try:
+                data = self.sock.recv(EVENT.size + 1)
+            except socket.timeout:
+                return None
+            event = decode_event(data)
+            if event is None:
+                continue
+            if self.last_sequence is not None and event.sequence > self.last_sequence + 1:
+                self.missed += event.sequence - self.last_sequence - 1
+            self.last_sequence = event.sequence
+            return event
+
+    def __iter__(self):
+        while True:
+            yield self.receive()
+
+    def close(self):
+        self.sock.close()
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print the gesture events a drawing app publishes")
+    parser.add_argument("address", nargs="?", type=parse_address, default=f"udp:{DEFAULT_PORT}",
+                        help=f"udp:host:port or unix:/path (default udp:{DEFAULT_PORT})")
+    args = parser.parse_args()
+
+    subscriber = GestureSubscriber(args.address)
+    try:
+        for event in subscriber:
+            if event.name != 'POINTER':
+                print(f"{event.sequence:8d} {event.timestamp:12.3f} {event.name:12s} "
+                      f"({event.x:.3f}, {event.y:.3f}) value={event.value:g} drawing={event.drawing}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        subscriber.close()
@@ -0,0 +1,103 @@
+import numpy as np
+
+
+class GestureRecognizer:
+    """Debounces per-frame gesture features over a short window of time
+
+    Every frame the raw features go into a fixed-size ring buffer, weighted
+    by how long the frame lasted, and the per-gesture vote totals (in seconds) are
+    updated incrementally, so an update costs the same whatever the window
+    length and the timing is the same at any frame rate. A gesture
+    activates once it has been seen for long enough within the window,
+    releases when that drops back down, and can't fire again until its
+    cooldown has passed.
+    """
+
+    # name: (kind, seconds needed to activate, max seconds to release, cooldown seconds)
+    # TRIGGER gestures fire once per activation, HOLD gestures report
+    # every frame they stay active
+    RULES = {
+        'FIST': ('TRIGGER', 0.13, 0.033, 0.5),
+        'OK': ('HOLD', 0.1, 0.033, 0.0),
+        'PINKY': ('HOLD', 0.1, 0.033, 0.0),
+        'OPEN_PALM': ('TRIGGER', 0.2, 0.033, 1.5),
+        'THUMB_UP': ('TRIGGER', 0.16, 0.033, 0.8),
+        # User-recorded templates, see gesture_templates.py
+        'TEMPLATE_COLOR': ('TRIGGER', 0.13, 0.033, 0.5),
+        'TEMPLATE_MODE': ('TRIGGER', 0.16, 0.033, 0.8),
+        'TEMPLATE_CLEAR': ('TRIGGER', 0.2, 0.033, 1.5),
+        'TEMPLATE_UNDO': ('TRIGGER', 0.16, 0.033, 0.8)
+    }
+
+    # Weight of the first frame, and the most a single frame can count for
+    # so a stalled loop doesn't turn one frame into a long hold
+    NOMINAL_FRAME_TIME = 1.0 / 30
+    MAX_FRAME_TIME = 0.1
+    # The ring holds a full window at up to this rate; faster frames (or
+    # repeated timestamps) push the oldest frames out early
+    MAX_FRAME_RATE = 240
+
+    def __init__(self, window=0.25, rules=None):
+        self.rules = dict(rules or self.RULES)
+        self.names = list(self.rules)
+        self.window = window
+        self.capacity = max(2, int(np.ceil(window * self.MAX_FRAME_RATE)))
+
+        self.is_trigger = np.array([self.rules[n][0] == 'TRIGGER' for n in self.names])
+        # Small tolerance so timing jitter at the nominal frame rate still counts
+        self.on_time = np.array([self.rules[n][1] for n in self.names]) - 1e-3
+        self.off_time = np.array([self.rules[n][2] for n in self.names]) + 1e-3
+        self.cooldown = np.array([self.rules[n][3] for n in self.names], dtype=np.float64)
+
+        self.reset()
+
+    def reset(self):
+        count = len(self.names)
+        # Frame weights and feature rows, oldest at head
+        self.weights = np.zeros(self.capacity, dtype=np.float64)
+        self.rows = np.zeros((self.capacity, count), dtype=np.float64)
+        self.head = 0
+        self.size = 0
+        self.duration = 0.0
+        self.totals = np.zeros(count, dtype=np.float64)
+        self.last_time = None
+        self.active = np.zeros(count, dtype=bool)
+        self.ready_at = np.zeros(count, dtype=np.float64)
+
+    def update(self, features, now):
+        """Push one frame of features, returns (fired gestures, held gestures)"""
+        if self.last_time is None:
+            weight = self.NOMINAL_FRAME_TIME
+        else:
+            weight = min(max(now - self.last_time, 0.0), self.MAX_FRAME_TIME)
+        self.last_time = now
+        row = np.fromiter((bool(features.get(n, False)) for n in self.names),
+                          dtype=np.float64, count=len(self.names)) * weight
+
+        # Sliding window totals: add the newest frame, drop the oldest ones
+        # that fall outside the window
+        if self.size == self.capacity:
+            self.drop_oldest()
+        tail = (self.head + self.size) % self.capacity
+        self.weights[tail] = weight
+        self.rows[tail] = row
+        self.size += 1
+        self.duration += weight
+        self.totals += row
+        while self.size > 1 and self.duration - self.weights[self.head] >= self.window:
+            self.drop_oldest()
+
+        rising = ~self.active & (self.totals >= self.on_time) & (now >= self.ready_at)
+        falling = self.active & (self.totals <= self.off_time)
+        self.active = (self.active | rising) & ~falling
+        self.ready_at[rising] = now + self.cooldown[rising]
+
+        fired = [self.names[i] for i in np.flatnonzero(rising & self.is_trigger)]
+        held = [self.names[i] for i in np.flatnonzero(self.active & ~self.is_trigger)]
+        return fired, held
+
+    def drop_oldest(self):
+        self.duration -= self.weights[self.head]
+        self.totals -= self.rows[self.head]
+        self.head = (self.head + 1) % self.capacity
+        self.size -= 1
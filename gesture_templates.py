@@ -0,0 +1,130 @@
+import json
+import os
+
+import numpy as np
+
+
+# Actions a custom gesture can be bound to
+TEMPLATE_ACTIONS = ['color', 'mode', 'clear', 'undo']
+
+# 20 (x, y) landmarks per template, the wrist is dropped
+VECTOR_SIZE = 40
+
+
+def normalize_landmarks(landmarks):
+    """Turn 21 (x, y) landmarks into a translation, rotation and scale invariant vector"""
+    points = np.asarray(landmarks, dtype=np.float32)[:, :2]
+
+    # Wrist at the origin
+    points = points - points[0]
+
+    # Rotate so the wrist -> middle finger MCP axis points straight up,
+    # and scale that axis to unit length
+    axis = points[9]
+    scale = float(np.hypot(axis[0], axis[1]))
+    if scale < 1e-6:
+        return None
+    cos_a = -axis[1] / scale
+    sin_a = axis[0] / scale
+    rotation = np.array([[cos_a, sin_a], [-sin_a, cos_a]], dtype=np.float32)
+    points = points @ rotation.T / scale
+
+    # The wrist is always zero after normalization, leave it out
+    return points[1:].ravel()
+
+
+class TemplateIndex:
+    """Nearest-neighbor search over int8-quantized template vectors
+
+    Candidates are ranked with one integer matrix product against the
+    quantized vectors, then the best few are re-ranked with exact float
+    distances.
+    """
+
+    RERANK = 4
+
+    def __init__(self, vectors):
+        self.vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), VECTOR_SIZE)
+        peak = float(np.abs(self.vectors).max()) if len(self.vectors) else 1.0
+        self.quant_scale = 127.0 / max(peak, 1e-6)
+        self.quantized = self.quantize(self.vectors).astype(np.int32)
+        self.quantized_norms = (self.quantized * self.quantized).sum(axis=1)
+
+    def quantize(self, vectors):
+        return np.clip(np.rint(vectors * self.quant_scale), -127, 127).astype(np.int8)
+
+    def query(self, vector):
+        """Return (index, squared distance) of the nearest template"""
+        if len(self.vectors) == 0:
+            return None, np.inf
+        q = self.quantize(vector).astype(np.int32)
+        # |a - b|^2 without the constant |b|^2 term
+        approx = self.quantized_norms - 2 * (self.quantized @ q)
+        count = min(self.RERANK, len(approx))
+        candidates = np.argpartition(approx, count - 1)[:count]
+        diffs = self.vectors[candidates] - vector
+        exact = (diffs * diffs).sum(axis=1)
+        best = int(np.argmin(exact))
+        return int(candidates[best]), float(exact[best])
+
+
+class GestureTemplateStore:
+    """User-recorded gesture templates, persisted as JSON"""
+
+    # Maximum RMS distance per landmark (in hand-size units) for a match
+    MAX_DISTANCE = 0.25
+
+    def __init__(self, path="gesture_templates.json"):
+        self.path = path
+        self.templates = []
+        self.index = TemplateIndex([])
+        self.load()
+
+    def __len__(self):
+        return len(self.templates)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        self.templates = [t for t in data.get("templates", []) if t.get("action") in TEMPLATE_ACTIONS]
+        self.rebuild_index()
+
+    def save(self):
+        with open(self.path, "w") as f:
+            json.dump({"templates": self.templates}, f)
+
+    def rebuild_index(self):
+        self.index = TemplateIndex([t["vector"] for t in self.templates])
+
+    def add(self, action, landmarks, name=None):
+        vector = normalize_landmarks(landmarks)
+        if vector is None or action not in TEMPLATE_ACTIONS:
+            return False
+        self.templates.append({
+            "name": name or f"{action}_{len(self.templates) + 1}",
+            "action": action,
+            "vector": [round(float(v), 4) for v in vector]
+        })
+        self.rebuild_index()
+        self.save()
+        return True
+
+    def clear(self):
+        self.templates = []
+        self.rebuild_index()
+        self.save()
+
+    def classify(self, landmarks):
+        """Return the action of the closest template, or None if nothing is close"""
+        if not self.templates:
+            return None
+        vector = normalize_landmarks(landmarks)
+        if vector is None:
+            return None
+        index, distance = self.index.query(vector)
+        points = len(vector) // 2
+        if index is None or np.sqrt(distance / points) > self.MAX_DISTANCE:
+            return None
+        return self.templates[index]["action"]
@@ -0,0 +1,147 @@
+import colorsys
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+# Hue resolution of the precomputed lookup tables
+HUE_STEPS = 360
+
+
+def build_hue_lut(steps=HUE_STEPS):
+    """Table of fully saturated BGR colors, one per hue step"""
+    lut = np.zeros((steps, 3), dtype=np.uint8)
+    for i in range(steps):
+        r, g, b = colorsys.hsv_to_rgb(i / steps, 1.0, 1.0)
+        lut[i] = (int(b * 255), int(g * 255), int(r * 255))
+    return lut
+
+
+HUE_LUT = build_hue_lut()
+
+
+def hue_to_bgr(hue):
+    """BGR color for a hue in [0, 1) from the lookup table"""
+    b, g, r = HUE_LUT[int(hue * HUE_STEPS) % HUE_STEPS]
+    return (int(b), int(g), int(r))
+
+
+class HudRenderer:
+    """On-screen indicators built from cached sprites
+
+    The HUD is a strip across the top of the frame (width must match the
+    frame width). It is only re-assembled when one of the displayed values
+    changes; otherwise each frame costs a single masked copy.
+    """
+
+    TEXT_FONT = cv2.FONT_HERSHEY_SIMPLEX
+    TEXT_SCALE = 0.7
+    TEXT_COLOR = (255, 255, 255)
+    TEXT_THICKNESS = 2
+
+    WHEEL_RADIUS = 30
+    WHEEL_WIDTH = 6
+
+    def __init__(self, width, height=112, cache_size=64):
+        self.width = width
+        self.height = height
+        self.cache_size = cache_size
+        self.sprite_cache = OrderedDict()
+
+        self.strip = np.zeros((height, width, 3), dtype=np.uint8)
+        self.mask = np.zeros((height, width), dtype=np.uint8)
+        self.key = None
+
+        self.wheel_center = (width - 50, 50)
+        self.wheel = self.build_wheel()
+        # Marker position for every hue step
+        angles = np.arange(HUE_STEPS) * (2 * np.pi / HUE_STEPS)
+        self.marker_offsets = np.stack([
+            np.rint(self.WHEEL_RADIUS * np.cos(angles)),
+            np.rint(self.WHEEL_RADIUS * np.sin(angles))
+        ], axis=1).astype(int)
+
+    def cached(self, key, build):
+        sprite = self.sprite_cache.get(key)
+        if sprite is None:
+            sprite = build()
+            self.sprite_cache[key] = sprite
+            if len(self.sprite_cache) > self.cache_size:
+                self.sprite_cache.popitem(last=False)
+        else:
+            self.sprite_cache.move_to_end(key)
+        return sprite
+
+    def build_text(self, text):
+        (w, h), baseline = cv2.getTextSize(text, self.TEXT_FONT, self.TEXT_SCALE, self.TEXT_THICKNESS)
+        image = np.zeros((h + baseline + 2, w + 2, 3), dtype=np.uint8)
+        cv2.putText(image, text, (1, h + 1), self.TEXT_FONT, self.TEXT_SCALE,
+                    self.TEXT_COLOR, self.TEXT_THICKNESS)
+        # Anchor at the text baseline origin, like cv2.putText
+        return image, image.any(axis=2), (1, h + 1)
+
+    def build_disc(self, radius, color):
+        size = 2 * radius + 3
+        image = np.zeros((size, size, 3), dtype=np.uint8)
+        mask = np.zeros((size, size), dtype=np.uint8)
+        center = (radius + 1, radius + 1)
+        cv2.circle(image, center, radius, color, -1)
+        cv2.circle(mask, center, radius, 255, -1)
+        return image, mask > 0, center
+
+    def build_wheel(self):
+        # Ring colored by hue, with the angle measured like the marker
+        size = 2 * (self.WHEEL_RADIUS + self.WHEEL_WIDTH) + 1
+        center = size // 2
+        coords = np.arange(size) - center
+        x, y = np.meshgrid(coords, coords)
+        dist = np.sqrt(x * x + y * y)
+        hue_index = (np.rint(np.arctan2(y, x) / (2 * np.pi) * HUE_STEPS).astype(int)) % HUE_STEPS
+        image = HUE_LUT[hue_index]
+        mask = np.abs(dist - self.WHEEL_RADIUS) <= self.WHEEL_WIDTH / 2
+        return image, mask, (center, center)
+
+    def blit(self, sprite, position):
+        """Copy a sprite into the strip with its anchor at the given position"""
+        image, mask, (ax, ay) = sprite
+        x0, y0 = position[0] - ax, position[1] - ay
+        h, w = mask.shape
+        cx0, cy0 = max(0, x0), max(0, y0)
+        cx1, cy1 = min(self.width, x0 + w), min(self.height, y0 + h)
+        if cx0 >= cx1 or cy0 >= cy1:
+            return
+        sub_mask = mask[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0]
+        np.copyto(self.strip[cy0:cy1, cx0:cx1], image[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0],
+                  where=sub_mask[:, :, None])
+        self.mask[cy0:cy1, cx0:cx1][sub_mask] = 255
+
+    def rebuild(self, texts, brush_size, brush_color, hue_step):
+        self.strip[:] = 0
+        self.mask[:] = 0
+
+        if hue_step is not None:
+            self.blit(self.wheel, self.wheel_center)
+            dx, dy = self.marker_offsets[hue_step]
+            marker = self.cached(('disc', 5, brush_color), lambda: self.build_disc(5, brush_color))
+            self.blit(marker, (self.wheel_center[0] + dx, self.wheel_center[1] + dy))
+
+        brush = self.cached(('disc', brush_size, brush_color),
+                            lambda: self.build_disc(brush_size, brush_color))
+        self.blit(brush, (30, 30))
+
+        for text, position in texts:
+            self.blit(self.cached(('text', text), lambda: self.build_text(text)), position)
+
+    def draw(self, frame, texts, brush_size, brush_color, hue=None):
+        """Draw the HUD onto a frame
+
+        texts is a sequence of (text, (x, y)) with putText-style origins, hue
+        shows the color wheel marker when not None.
+        """
+        hue_step = None if hue is None else int(hue * HUE_STEPS) % HUE_STEPS
+        key = (tuple(texts), brush_size, tuple(brush_color), hue_step)
+        if key != self.key:
+            self.rebuild(texts, brush_size, tuple(brush_color), hue_step)
+            self.key = key
+        cv2.copyTo(self.strip, self.mask, frame[:self.height])
@@ -0,0 +1,311 @@
+import numpy as np
+
+
+# Dirty tracking granularity, in pixels
+TILE_SIZE = 64
+
+
+def div255(values):
+    """Exact integer division by 255 of a uint16 array, in place"""
+    values += 128
+    values += values >> 8
+    values >>= 8
+    return values
+
+
+def tile_runs(mask):
+    """Yield (row, first column, end column) for each horizontal run of True tiles"""
+    rows, columns = mask.shape
+    for ty in range(rows):
+        row = mask[ty]
+        tx = 0
+        while tx < columns:
+            if row[tx]:
+                start = tx
+                while tx < columns and row[tx]:
+                    tx += 1
+                yield ty, start, tx
+            else:
+                tx += 1
+
+
+def opaque_ink(color):
+    """Premultiplied BGRA value of an opaque BGR color"""
+    return (int(color[0]), int(color[1]), int(color[2]), 255)
+
+
+class Palette:
+    """Colors of an indexed canvas, as a premultiplied BGRA lookup table
+
+    Index 0 is transparent. A color gets an entry the first time it is
+    drawn with; once all 256 entries are taken, new colors map to the
+    nearest existing one.
+    """
+
+    SIZE = 256
+
+    def __init__(self, colors=()):
+        self.lut = np.zeros((self.SIZE, 4), dtype=np.uint8)
+        # The same table as one uint32 per entry, so a lookup is one gather
+        self.lut32 = self.lut.view(np.uint32).reshape(self.SIZE)
+        self.indices = {}
+        self.count = 1
+        for color in colors:
+            self.index(color)
+
+    def index(self, color):
+        key = (int(color[0]), int(color[1]), int(color[2]))
+        index = self.indices.get(key)
+        if index is not None:
+            return index
+        if self.count < self.SIZE:
+            index = self.count
+            self.count += 1
+            self.lut[index] = opaque_ink(key)
+        else:
+            diff = self.lut[1:, :3].astype(np.int32) - np.array(key, dtype=np.int32)
+            index = int(np.argmin((diff * diff).sum(axis=1))) + 1
+        self.indices[key] = index
+        return index
+
+    def colors(self):
+        """BGR colors of the used entries, in index order"""
+        return [tuple(int(v) for v in self.lut[i, :3]) for i in range(1, self.count)]
+
+    def lookup(self, indices):
+        """Premultiplied BGRA pixels for an array of indices"""
+        return self.lut32[indices].view(np.uint8).reshape(indices.shape + (4,))
+
+
+class Layer:
+    """A single premultiplied BGRA drawing layer"""
+
+    # Erasing clears alpha instead of painting black
+    ERASE_VALUE = (0, 0, 0, 0)
+
+    def __init__(self, name, width, height):
+        self.name = name
+        self.pixels = np.zeros((height, width, 4), dtype=np.uint8)
+        self.visible = True
+        self.opacity = 1.0
+        # Pixels that predate the stroke objects (e.g. a resumed session),
+        # redrawing a region starts from these
+        self.base = None
+        # Tiles changed since the last autosave
+        self.save_dirty = np.ones(((height + TILE_SIZE - 1) // TILE_SIZE,
+                                   (width + TILE_SIZE - 1) // TILE_SIZE), dtype=bool)
+
+    def ink(self, color):
+        """Value to pass to OpenCV drawing calls for an opaque BGR color"""
+        return opaque_ink(color)
+
+    def region(self, y0, y1, x0, x1):
+        return self.pixels[y0:y1, x0:x1]
+
+    def clear(self):
+        self.pixels[:] = 0
+        self.base = None
+
+
+class IndexedLayer(Layer):
+    """A layer storing one palette index per pixel, a quarter of the BGRA size"""
+
+    ERASE_VALUE = 0
+
+    def __init__(self, name, width, height, palette):
+        super().__init__(name, 0, 0)
+        self.pixels = np.zeros((height, width), dtype=np.uint8)
+        self.save_dirty = np.ones(((height + TILE_SIZE - 1) // TILE_SIZE,
+                                   (width + TILE_SIZE - 1) // TILE_SIZE), dtype=bool)
+        self.palette = palette
+
+    def ink(self, color):
+        return self.palette.index(color)
+
+    def region(self, y0, y1, x0, x1):
+        # Expanded to premultiplied BGRA through the palette table
+        return self.palette.lookup(self.pixels[y0:y1, x0:x1])
+
+
+def compose_layers(layers, y0, y1, x0, x1, out=None):
+    """Blend a region of the given layers bottom to top, returns uint16 or None"""
+    for layer in layers:
+        if not layer.visible or layer.opacity <= 0:
+            continue
+        src = layer.region(y0, y1, x0, x1).astype(np.uint16)
+        if layer.opacity < 1.0:
+            src *= int(layer.opacity * 255 + 0.5)
+            div255(src)
+        if out is None:
+            out = src
+            continue
+        # Premultiplied "over": out = src + out * (1 - src_alpha)
+        out *= 255 - src[:, :, 3:4]
+        div255(out)
+        out += src
+    return out
+
+
+class LayerStack:
+    """Ordered layers (bottom first) with a tile-cached flattened composite
+
+    The layers below and above the active one are kept pre-flattened, so
+    redrawing a dirty tile is at most three blends whatever the layer count.
+    With indexed set, layers store palette indices (see IndexedLayer).
+    """
+
+    TILE_SIZE = TILE_SIZE
+
+    def __init__(self, width, height, indexed=False):
+        self.width = width
+        self.height = height
+        self.palette = Palette() if indexed else None
+        self.layers = []
+        self.active_index = 0
+        self.layer_count = 0
+
+        self.tiles_x = (width + self.TILE_SIZE - 1) // self.TILE_SIZE
+        self.tiles_y = (height + self.TILE_SIZE - 1) // self.TILE_SIZE
+        self.dirty = np.ones((self.tiles_y, self.tiles_x), dtype=bool)
+        self.composite = np.zeros((height, width, 4), dtype=np.uint8)
+        self.below = None
+        self.above = None
+        self.groups_valid = False
+
+        self.add_layer()
+
+    @property
+    def active(self):
+        return self.layers[self.active_index]
+
+    def new_layer(self, name):
+        if self.palette is not None:
+            return IndexedLayer(name, self.width, self.height, self.palette)
+        return Layer(name, self.width, self.height)
+
+    def add_layer(self, name=None):
+        """Insert a new empty layer above the active one and make it active"""
+        self.layer_count += 1
+        layer = self.new_layer(name or f"Layer {self.layer_count}")
+        index = self.active_index + 1 if self.layers else 0
+        self.layers.insert(index, layer)
+        self.active_index = index
+        self.invalidate()
+        return layer
+
+    def remove_layer(self, index=None):
+        if len(self.layers) <= 1:
+            return
+        if index is None:
+            index = self.active_index
+        self.layers.pop(index)
+        self.active_index = min(self.active_index, len(self.layers) - 1)
+        self.invalidate()
+
+    def set_active(self, index):
+        if 0 <= index < len(self.layers) and index != self.active_index:
+            self.active_index = index
+            self.invalidate()
+
+    def set_visible(self, index, visible):
+        self.layers[index].visible = visible
+        self.invalidate()
+
+    def set_opacity(self, index, opacity):
+        self.layers[index].opacity = max(0.0, min(1.0, opacity))
+        self.invalidate()
+
+    def clear(self):
+        for layer in self.layers:
+            layer.clear()
+        self.invalidate(pixels_changed=True)
+
+    def invalidate(self, pixels_changed=False):
+        """Rebuild the below/above groups on the next flatten
+
+        pixels_changed also flags every layer for autosave, for edits that
+        touch layers other than the active one.
+        """
+        self.groups_valid = False
+        self.dirty[:] = True
+        if pixels_changed:
+            for layer in self.layers:
+                layer.save_dirty[:] = True
+
+    def release_cache(self):
+        """Drop the composite and group caches, e.g. while the stack is paged out"""
+        self.composite = None
+        self.below = None
+        self.above = None
+        self.groups_valid = False
+
+    def to_bgra(self):
+        """Flattened image with straight (non-premultiplied) alpha, for export"""
+        composite = self.flatten()
+        alpha = composite[:, :, 3:4].astype(np.uint32)
+        bgr = (composite[:, :, :3].astype(np.uint32) * 255 + alpha // 2) // np.maximum(alpha, 1)
+        return np.dstack([np.minimum(bgr, 255).astype(np.uint8), composite[:, :, 3]])
+
+    def mark_dirty(self, bbox):
+        """Invalidate the tiles covered by an (x0, y0, x1, y1) box"""
+        if bbox is None:
+            return
+        x0, y0, x1, y1 = bbox
+        tx0 = max(0, int(x0) // self.TILE_SIZE)
+        ty0 = max(0, int(y0) // self.TILE_SIZE)
+        tx1 = min(self.tiles_x, int(x1) // self.TILE_SIZE + 1)
+        ty1 = min(self.tiles_y, int(y1) // self.TILE_SIZE + 1)
+        if tx0 < tx1 and ty0 < ty1:
+            self.dirty[ty0:ty1, tx0:tx1] = True
+            self.active.save_dirty[ty0:ty1, tx0:tx1] = True
+
+    def mark_all_dirty(self):
+        self.dirty[:] = True
+        self.active.save_dirty[:] = True
+
+    def flatten(self):
+        """Return the composite of all visible layers, rebuilding dirty tiles only"""
+        if self.composite is None:
+            self.composite = np.zeros((self.height, self.width, 4), dtype=np.uint8)
+            self.dirty[:] = True
+        if not self.groups_valid:
+            full = (0, self.height, 0, self.width)
+            below = compose_layers(self.layers[:self.active_index], *full)
+            above = compose_layers(self.layers[self.active_index + 1:], *full)
+            self.below = None if below is None else below.astype(np.uint8)
+            self.above = None if above is None else above.astype(np.uint8)
+            self.groups_valid = True
+
+        if not self.dirty.any():
+            return self.composite
+
+        if self.dirty.all():
+            self.compose_region(0, self.height, 0, self.width)
+        else:
+            # Merge horizontal runs of dirty tiles so each run is one blend
+            size = self.TILE_SIZE
+            for ty, tx0, tx1 in tile_runs(self.dirty):
+                self.compose_region(ty * size, min(self.height, (ty + 1) * size),
+                                    tx0 * size, min(self.width, tx1 * size))
+        self.dirty[:] = False
+        return self.composite
+
+    def compose_region(self, y0, y1, x0, x1):
+        out = None
+        if self.below is not None:
+            out = self.below[y0:y1, x0:x1].astype(np.uint16)
+        out = compose_layers([self.active], y0, y1, x0, x1, out)
+        if self.above is not None:
+            above = self.above[y0:y1, x0:x1].astype(np.uint16)
+            if out is None:
+                out = above
+            else:
+                out *= 255 - above[:, :, 3:4]
+                div255(out)
+                out += above
+
+        target = self.composite[y0:y1, x0:x1]
+        if out is None:
+            target[:] = 0
+        else:
+            target[:] = out
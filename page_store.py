@@ -0,0 +1,243 @@
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from layers import LayerStack
+
+
+def write_arrays(path, arrays):
+    """Write a list of arrays (or None) to path, each zlib-compressed"""
+    blobs = [None if a is None else zlib.compress(np.ascontiguousarray(a), 1) for a in arrays]
+    header = [None if a is None else {"shape": a.shape, "dtype": a.dtype.str, "size": len(blob)}
+              for a, blob in zip(arrays, blobs)]
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(json.dumps(header).encode() + b"\n")
+        for blob in blobs:
+            if blob is not None:
+                f.write(blob)
+    os.replace(tmp_path, path)
+
+
+# What reading back a missing, truncated or corrupt file can raise
+READ_ERRORS = (OSError, ValueError, KeyError, zlib.error)
+
+
+def read_arrays(path):
+    with open(path, "rb") as f:
+        header = json.loads(f.readline())
+        arrays = []
+        for info in header:
+            if info is None:
+                arrays.append(None)
+                continue
+            data = zlib.decompress(f.read(info["size"]))
+            arrays.append(np.frombuffer(data, dtype=info["dtype"]).reshape(info["shape"]).copy())
+    return arrays
+
+
+class Page:
+    """One board: its layer stack, stroke objects and undo history"""
+
+    def __init__(self, page_id, layers):
+        self.id = page_id
+        self.layers = layers
+        self.objects = []
+        self.undo_stack = []
+        # resident, spilling (arrays still held while they are written),
+        # spilled or loading (read back ahead of time)
+        self.state = 'resident'
+        self.arrays = None
+        # Bumped on every state change so stale worker results are ignored
+        self.generation = 0
+
+
+class PageStore:
+    """The pages of a document, a few in memory and the rest compressed on disk
+
+    Up to resident pages keep their raw layer arrays; beyond that the least
+    recently used (never the current page) is spilled. Spilling hands the
+    arrays to a worker thread that compresses them into a scratch directory,
+    and the neighbours of the current page are read back ahead of time, so
+    flipping through pages doesn't wait on the disk. Spilled pages keep
+    their stroke objects but not their undo history.
+    """
+
+    def __init__(self, width, height, indexed=False, resident=4, directory=None):
+        self.width = width
+        self.height = height
+        self.indexed = indexed
+        # The current page and both neighbours always fit
+        self.resident = max(3, resident)
+        self.directory = directory
+        self.owns_directory = directory is None
+
+        self.pages = []
+        self.current = 0
+        self.next_id = 0
+        self.lru = OrderedDict()
+
+        self.jobs = queue.Queue()
+        self.done = queue.Queue()
+        self.worker = None
+
+        self.add_page()
+
+    @property
+    def page(self):
+        return self.pages[self.current]
+
+    def __len__(self):
+        return len(self.pages)
+
+    def path(self, page):
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="gesture_pages_")
+        return os.path.join(self.directory, f"page_{page.id}.bin")
+
+    def add_page(self):
+        """Insert an empty page after the current one, returns its index"""
+        page = Page(self.next_id, LayerStack(self.width, self.height, indexed=self.indexed))
+        self.next_id += 1
+        index = self.current + 1 if self.pages else 0
+        self.pages.insert(index, page)
+        self.lru[page] = None
+        return index
+
+    def reset(self, page_ids, current=0):
+        """Start over with empty pages carrying the given ids, e.g. to resume a session
+
+        Only the current page counts as resident until the others are filled
+        in and passed to admit().
+        """
+        for page in self.pages:
+            # Drop whatever the worker still has in flight for the old pages
+            page.generation += 1
+        self.pages = [Page(page_id, LayerStack(self.width, self.height, indexed=self.indexed))
+                      for page_id in page_ids]
+        self.current = current
+        self.next_id = max(page_ids) + 1
+        self.lru = OrderedDict([(self.page, None)])
+
+    def admit(self, page):
+        self.lru[page] = None
+        self.evict()
+
+    def switch(self, index):
+        """Make pages[index] current, reading it back first if it was spilled
+
+        Raises one of READ_ERRORS, with nothing changed, if it can't be read.
+        """
+        page = self.pages[index]
+        if page.state != 'resident':
+            if page.state == 'spilling':
+                # Not written yet, the arrays are still here
+                arrays = page.arrays
+            else:
+                # Spilled, or a prefetch that hasn't arrived yet
+                arrays = read_arrays(self.path(page))
+            self.attach(page, arrays)
+        self.current = index
+        self.lru.move_to_end(page)
+        self.evict()
+        self.prefetch()
+        return page
+
+    def attach(self, page, arrays):
+        for layer, pixels, base in zip(page.layers.layers, arrays[0::2], arrays[1::2]):
+            layer.pixels = pixels
+            layer.base = base
+        page.layers.invalidate()
+        page.state = 'resident'
+        page.arrays = None
+        page.generation += 1
+        self.lru[page] = None
+
+    def spill(self, page):
+        arrays = []
+        for layer in page.layers.layers:
+            arrays += [layer.pixels, layer.base]
+            layer.pixels = None
+            layer.base = None
+        page.layers.release_cache()
+        page.undo_stack = []
+        page.state = 'spilling'
+        page.arrays = arrays
+        page.generation += 1
+        del self.lru[page]
+        self.submit(('spill', page, page.generation, arrays))
+
+    def evict(self):
+        # Least recently used first, keeping the current page's neighbours
+        # while anything else can go
+        while len(self.lru) > self.resident:
+            candidates = [page for page in self.lru if page is not self.page]
+            far = [page for page in candidates if abs(self.pages.index(page) - self.current) > 1]
+            self.spill((far or candidates)[0])
+
+    def prefetch(self):
+        for index in (self.current - 1, self.current + 1):
+            if 0 <= index < len(self.pages) and self.pages[index].state == 'spilled':
+                page = self.pages[index]
+                page.state = 'loading'
+                page.generation += 1
+                self.submit(('load', page, page.generation, None))
+
+    def submit(self, job):
+        if self.worker is None:
+            self.worker = threading.Thread(target=self.run, daemon=True)
+            self.worker.start()
+        self.jobs.put(job)
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            kind, page, generation, arrays = job
+            try:
+                if kind == 'spill':
+                    write_arrays(self.path(page), arrays)
+                    self.done.put(('spilled', page, generation, None))
+                else:
+                    self.done.put(('loaded', page, generation, read_arrays(self.path(page))))
+            except READ_ERRORS as e:
+                print(f"Page {kind} failed: {e}")
+                self.done.put(('failed', page, generation, None))
+
+    def poll(self):
+        """Apply finished spills and prefetches; call from the UI thread every frame"""
+        while True:
+            try:
+                result, page, generation, arrays = self.done.get_nowait()
+            except queue.Empty:
+                return
+            if generation != page.generation:
+                # The page moved on (switched to, or spilled again) meanwhile
+                continue
+            if result == 'spilled':
+                page.state = 'spilled'
+                page.arrays = None
+            elif result == 'loaded':
+                self.attach(page, arrays)
+                self.evict()
+            elif page.state == 'spilling':
+                # Couldn't write it out, keep it in memory
+                self.attach(page, page.arrays)
+            elif page.state == 'loading':
+                # Couldn't read it ahead, switch() tries again when it's needed
+                page.state = 'spilled'
+
+    def close(self):
+        if self.worker is not None:
+            self.jobs.put(None)
+            self.worker.join(timeout=5.0)
+        if self.owns_directory and self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,64 @@
+import cv2
+import numpy as np
+
+
+class IdleMonitor:
+    """Drops to a low frame rate when nobody is in front of the camera
+
+    After idle_after seconds without a hand the loop runs at idle_fps and
+    hand tracking only runs on frames where a cheap frame-difference motion
+    detector (on a tiny grayscale thumbnail) sees something move. A hand or
+    motion brings it straight back to full rate.
+    """
+
+    def __init__(self, idle_after=10.0, idle_fps=5, motion_size=(64, 48), motion_threshold=3.0):
+        self.idle_after = idle_after
+        self.idle_interval = 1.0 / idle_fps
+        self.motion_size = motion_size
+        # Mean absolute gray level difference (0-255) that counts as motion
+        self.motion_threshold = motion_threshold
+
+        self.idle = False
+        self.last_active_time = None
+        self.small_rgb = np.zeros((motion_size[1], motion_size[0], 3), dtype=np.uint8)
+        self.gray = np.zeros((motion_size[1], motion_size[0]), dtype=np.uint8)
+        self.thumbnail = np.zeros_like(self.gray)
+        self.previous = np.zeros_like(self.gray)
+        self.has_previous = False
+
+    def frame_interval(self, active_interval):
+        return self.idle_interval if self.idle else active_interval
+
+    def detect_motion(self, rgb_frame):
+        cv2.resize(rgb_frame, self.motion_size, dst=self.small_rgb, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.small_rgb, cv2.COLOR_RGB2GRAY, dst=self.thumbnail)
+        if not self.has_previous:
+            moved = False
+            self.has_previous = True
+        else:
+            cv2.absdiff(self.thumbnail, self.previous, dst=self.gray)
+            moved = cv2.mean(self.gray)[0] > self.motion_threshold
+        self.previous, self.thumbnail = self.thumbnail, self.previous
+        return moved
+
+    def should_run_inference(self, rgb_frame, now):
+        """Whether to run hand tracking on this frame"""
+        if not self.idle:
+            return True
+        if self.detect_motion(rgb_frame):
+            self.wake(now)
+            return True
+        return False
+
+    def wake(self, now):
+        self.idle = False
+        self.last_active_time = now
+
+    def update(self, hand_present, now):
+        """Record whether a hand was seen this frame"""
+        if self.last_active_time is None or hand_present:
+            self.wake(now)
+        elif not self.idle and now - self.last_active_time >= self.idle_after:
+            self.idle = True
+            # Start motion detection from a fresh reference frame
+            self.has_previous = False
@@ -0,0 +1,109 @@
+import math
+
+
+def build_levels(steps):
+    """Quality levels from (name, knob changes) steps, each level keeping the changes before it"""
+    levels = []
+    knobs = {}
+    for name, changes in steps:
+        knobs = dict(knobs, **changes)
+        levels.append(dict(knobs, name=name))
+    return levels
+
+
+# Best first. Each step gives up whatever costs the least to look at for a
+# useful amount of frame time
+QUALITY_LEVELS = build_levels([
+    ("Full", {'model_complexity': 1, 'inference_scale': 1.0, 'draw_landmarks': True,
+              'pattern_spacing': 10, 'display_scale': 1.0}),
+    ("No landmark overlay", {'draw_landmarks': False}),
+    ("Lite hand model", {'model_complexity': 0}),
+    ("Reduced tracking", {'inference_scale': 0.75}),
+    ("Sparse patterns", {'pattern_spacing': 20}),
+    ("Low tracking", {'inference_scale': 0.5}),
+    ("Reduced display", {'display_scale': 0.75})
+])
+
+
+class QualityController:
+    """Steps the quality knobs down and back up to hold a frame rate and latency
+
+    The app reports how long each stage of a frame took (tracking, drawing,
+    display; not the wait for the camera). The smoothed total is compared
+    with the budget: the frame interval, or the latency target if that is
+    tighter. Staying over budget for degrade_after seconds drops one level.
+    Staying under recover_ratio of the budget for recover_after seconds
+    raises one. The gap between the two thresholds, the longer wait to
+    recover and the settle time after every change keep it from flapping.
+    """
+
+    def __init__(self, target_fps=30, latency_target=None, levels=None, smoothing=0.3,
+                 degrade_after=0.5, recover_after=3.0, recover_ratio=0.7, settle_time=1.0):
+        self.budget = 1.0 / target_fps
+        if latency_target is not None:
+            self.budget = min(self.budget, latency_target)
+        self.levels = levels or QUALITY_LEVELS
+        # Time constant (seconds) of the stage time filter
+        self.smoothing = smoothing
+        self.degrade_after = degrade_after
+        self.recover_after = recover_after
+        self.recover_ratio = recover_ratio
+        self.settle_time = settle_time
+
+        self.level = 0
+        self.stage_times = {}
+        self.work = None
+        self.last_time = None
+        self.over_since = None
+        self.under_since = None
+        self.settle_until = 0.0
+
+    def knobs(self):
+        return self.levels[self.level]
+
+    def describe(self):
+        return f"{self.level}/{len(self.levels) - 1} {self.knobs()['name']}"
+
+    def set_level(self, level, now):
+        self.level = level
+        self.over_since = None
+        self.under_since = None
+        # Let the smoothed times catch up with the new settings
+        self.settle_until = now + self.settle_time
+
+    def update(self, stage_times, now):
+        """Feed one frame's stage durations in seconds, returns True when the level changed"""
+        work = sum(stage_times.values())
+        if self.work is None:
+            self.work = work
+            self.stage_times = dict(stage_times)
+        else:
+            dt = max(0.0, now - self.last_time)
+            k = 1.0 - math.exp(-dt / self.smoothing)
+            self.work += k * (work - self.work)
+            # Stages skipped this frame (e.g. tracking while idle) count as free
+            for stage in set(self.stage_times) | set(stage_times):
+                current = self.stage_times.get(stage, 0.0)
+                self.stage_times[stage] = current + k * (stage_times.get(stage, 0.0) - current)
+        self.last_time = now
+
+        if now < self.settle_until:
+            return False
+        if self.work > self.budget:
+            self.under_since = None
+            if self.over_since is None:
+                self.over_since = now
+            if now - self.over_since >= self.degrade_after and self.level < len(self.levels) - 1:
+                self.set_level(self.level + 1, now)
+                return True
+        elif self.work < self.budget * self.recover_ratio:
+            self.over_since = None
+            if self.under_since is None:
+                self.under_since = now
+            if now - self.under_since >= self.recover_after and self.level > 0:
+                self.set_level(self.level - 1, now)
+                return True
+        else:
+            self.over_since = None
+            self.under_since = None
+        return False
@@ -0,0 +1,181 @@
+import glob
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from layers import TILE_SIZE
+from page_store import read_arrays, write_arrays
+
+
+class SessionAutosaver:
+    """Continuously saves the layers to memory-mapped files in the background
+
+    Every interval the UI thread copies out the tiles changed since the last
+    save (bounded by max_bytes_per_second) and hands them to a worker thread,
+    which writes them into one raw memory-mapped file per layer plus a JSON
+    file with the app state. Resuming maps those files back instead of
+    decoding an image.
+
+    Pages other than the current one don't change until they are drawn on
+    again, so they are saved once when left, as a compressed file each
+    (see save_page).
+    """
+
+    META_FILE = "session.json"
+    # Longest close() waits on the worker before giving up
+    CLOSE_TIMEOUT = 5.0
+
+    def __init__(self, directory="session", interval=2.0, max_bytes_per_second=4 * 1024 * 1024):
+        self.directory = directory
+        self.meta_path = os.path.join(directory, self.META_FILE)
+        self.interval = interval
+        self.max_bytes = int(max_bytes_per_second * interval)
+
+        self.last_save_time = 0.0
+        self.layout = None
+        self.maps = []
+        # Pages left since the last save, written out with the next one
+        self.pending_pages = {}
+        self.jobs = queue.Queue(maxsize=1)
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def layer_path(self, index):
+        return os.path.join(self.directory, f"layer_{index}.raw")
+
+    def page_path(self, page_id):
+        return os.path.join(self.directory, f"page_{page_id}.bin")
+
+    def has_session(self):
+        return os.path.exists(self.meta_path)
+
+    def load(self):
+        """Return (state dict, list of read-only layer arrays) from the last session"""
+        with open(self.meta_path, "r") as f:
+            meta = json.load(f)
+        arrays = [
+            np.memmap(self.layer_path(i), dtype=info["dtype"], mode="r", shape=tuple(info["shape"]))
+            for i, info in enumerate(meta["layout"])
+        ]
+        return meta["state"], arrays
+
+    def load_page(self, page_id):
+        """Layer arrays of a page saved with save_page"""
+        return read_arrays(self.page_path(page_id))
+
+    def discard(self):
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+        for path in glob.glob(os.path.join(self.directory, "page_*.bin")):
+            os.remove(path)
+
+    def save_page(self, page_id, arrays):
+        """Save a page's layer arrays with the next save; pass copies"""
+        self.pending_pages[page_id] = arrays
+
+    def tick(self, layers, get_state, now, force=False):
+        """Queue an incremental save if one is due; cheap enough to call every frame
+
+        get_state is only called when a save actually happens.
+        """
+        if not force and now - self.last_save_time < self.interval:
+            return
+        if not force and self.jobs.full():
+            # Worker still busy with the previous save, keep the tiles dirty
+            return
+        self.last_save_time = now
+
+        layout = [(id(layer), layer.pixels.shape, layer.pixels.dtype.str) for layer in layers]
+        job = {"state": get_state(), "layout": [{"shape": s, "dtype": d} for _, s, d in layout],
+               "pages": self.pending_pages}
+        self.pending_pages = {}
+
+        if layout != self.layout:
+            # Layers were added, removed or reordered: rewrite every file
+            job["full"] = [layer.pixels.copy() for layer in layers]
+            for layer in layers:
+                layer.save_dirty[:] = False
+            self.layout = layout
+        else:
+            job["tiles"] = self.collect_tiles(layers, None if force else self.max_bytes)
+
+        if force:
+            self.jobs.put(job, timeout=self.CLOSE_TIMEOUT)
+        else:
+            self.jobs.put_nowait(job)
+
+    def collect_tiles(self, layers, budget):
+        tiles = []
+        used = 0
+        for index, layer in enumerate(layers):
+            for ty, tx in np.argwhere(layer.save_dirty):
+                y0, x0 = ty * TILE_SIZE, tx * TILE_SIZE
+                data = layer.pixels[y0:y0 + TILE_SIZE, x0:x0 + TILE_SIZE].copy()
+                if budget is not None and used + data.nbytes > budget and tiles:
+                    # Over the I/O budget, the rest goes out with the next save
+                    return tiles
+                layer.save_dirty[ty, tx] = False
+                tiles.append((index, y0, x0, data))
+                used += data.nbytes
+        return tiles
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            try:
+                self.write(job)
+            except Exception as e:
+                print(f"Autosave failed: {e}")
+                # The layer files may be incomplete, start over with a full write
+                self.layout = None
+                self.maps = []
+
+    def write(self, job):
+        os.makedirs(self.directory, exist_ok=True)
+        for page_id, arrays in job["pages"].items():
+            write_arrays(self.page_path(page_id), arrays)
+        if "full" in job:
+            # Written to temporary files first, so a crash halfway through
+            # leaves the previous session intact
+            self.maps = []
+            for index, pixels in enumerate(job["full"]):
+                mm = np.memmap(self.layer_path(index) + ".tmp", dtype=pixels.dtype, mode="w+", shape=pixels.shape)
+                mm[:] = pixels
+                mm.flush()
+                del mm
+            for index in range(len(job["full"])):
+                os.replace(self.layer_path(index) + ".tmp", self.layer_path(index))
+            self.maps = [
+                np.memmap(self.layer_path(index), dtype=pixels.dtype, mode="r+", shape=pixels.shape)
+                for index, pixels in enumerate(job["full"])
+            ]
+        else:
+            touched = set()
+            for index, y0, x0, data in job["tiles"]:
+                h, w = data.shape[:2]
+                self.maps[index][y0:y0 + h, x0:x0 + w] = data
+                touched.add(index)
+            for index in touched:
+                self.maps[index].flush()
+
+        # Replace the metadata atomically so a crash never leaves it half written
+        meta = {"saved_at": time.time(), "state": job["state"], "layout": job["layout"]}
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def close(self, layers, get_state):
+        """Write everything still pending and stop the worker"""
+        try:
+            self.tick(layers, get_state, time.monotonic(), force=True)
+            self.jobs.put(None, timeout=self.CLOSE_TIMEOUT)
+        except queue.Full:
+            print("Autosave worker not responding, the latest changes were not saved")
+        self.worker.join(timeout=self.CLOSE_TIMEOUT)
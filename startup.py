@@ -0,0 +1,61 @@
+import json
+import queue
+import threading
+import time
+
+
+class BackgroundLoader:
+    """Runs slow startup steps on daemon threads and times the startup
+
+    Tk may only be touched from its own thread, so finished steps are
+    queued and handed out by poll(), which the frame loop calls. Steps and
+    milestones (mark()) are timed in seconds from started, which should be
+    taken before the heavy imports.
+    """
+
+    def __init__(self, started=None):
+        self.started = time.monotonic() if started is None else started
+        self.results = queue.Queue()
+        self.pending = set()
+        self.timings = {}
+        self.reported = False
+
+    def start(self, name, load):
+        self.pending.add(name)
+        threading.Thread(target=self.run, args=(name, load), daemon=True).start()
+
+    def run(self, name, load):
+        try:
+            result, error = load(), None
+        except Exception as e:
+            result, error = None, e
+        self.results.put((name, result, error, time.monotonic()))
+
+    def poll(self):
+        """Yield (name, result, error) for the steps finished since the last call"""
+        while True:
+            try:
+                name, result, error, finished = self.results.get_nowait()
+            except queue.Empty:
+                return
+            self.pending.discard(name)
+            self.timings[name] = finished - self.started
+            yield name, result, error
+
+    def busy(self):
+        return bool(self.pending)
+
+    def mark(self, name):
+        """Record a milestone the first time it is reached"""
+        if name not in self.timings:
+            self.timings[name] = time.monotonic() - self.started
+
+    def report(self, path=None):
+        """Print the timings once, and write them as JSON if path is given"""
+        self.reported = True
+        summary = ", ".join(f"{name} {seconds:.2f} s"
+                            for name, seconds in sorted(self.timings.items(), key=lambda item: item[1]))
+        print(f"Startup: {summary}")
+        if path:
+            with open(path, "w") as f:
+                json.dump(self.timings, f, indent=2)
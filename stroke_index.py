@@ -0,0 +1,306 @@
+import cv2
+import numpy as np
+
+from brush_engine import BrushEngine
+from layers import TILE_SIZE, tile_runs
+
+
+# Object kinds the object eraser and the lasso can pick; ERASE objects only
+# replay pixel eraser passes
+PICKABLE = ('BRUSH', 'LINE', 'RECTANGLE', 'CIRCLE', 'PATTERN')
+
+
+def polyline_distance(points, x, y):
+    """Distance from (x, y) to the nearest point of an (N, 2) polyline"""
+    if len(points) == 1:
+        return float(np.hypot(points[0, 0] - x, points[0, 1] - y))
+    a = points[:-1]
+    ab = points[1:] - a
+    ap = np.array((x, y), dtype=np.float64) - a
+    t = np.clip((ap * ab).sum(axis=1) / np.maximum((ab * ab).sum(axis=1), 1e-9), 0.0, 1.0)
+    closest = a + ab * t[:, None]
+    return float(np.hypot(closest[:, 0] - x, closest[:, 1] - y).min())
+
+
+def union_bbox(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+class StrokeObject:
+    """One drawing operation kept as geometry, so it can be hit, moved and redrawn
+
+    points is the render path for BRUSH and ERASE, the two corners for LINE
+    and RECTANGLE and the center for CIRCLE. PATTERN keeps its dots as
+    (x, y, radius) rows. Objects are never changed once finished; moving
+    one makes a translated copy, so undo snapshots can share them.
+    """
+
+    def __init__(self, kind, layer, color, thickness, brush_type=None, points=(), radius=0, dots=()):
+        self.kind = kind
+        self.layer = layer
+        self.color = tuple(color)
+        self.thickness = thickness
+        self.brush_type = brush_type
+        self.points = np.array(points, dtype=np.float64).reshape(-1, 2)
+        self.radius = radius
+        self.dots = np.array(dots, dtype=np.int32).reshape(-1, 3)
+        # Simplified fingertip samples of a finished BRUSH stroke
+        self.simplified = None
+        self.order = 0
+        self.cells = set()
+        self.bbox = self.points_bbox(self.points) if len(self.points) else None
+        if len(self.dots):
+            self.bbox = union_bbox(self.bbox, self.dots_bbox(self.dots))
+
+    def pad(self):
+        return self.thickness // 2 + 2
+
+    def points_bbox(self, points):
+        pad = self.pad() + (self.radius if self.kind == 'CIRCLE' else 0)
+        x0, y0 = points.min(axis=0)
+        x1, y1 = points.max(axis=0)
+        return (int(x0) - pad, int(y0) - pad, int(x1) + pad + 1, int(y1) + pad + 1)
+
+    def dots_bbox(self, dots):
+        pad = int(dots[:, 2].max()) + 1
+        return (int(dots[:, 0].min()) - pad, int(dots[:, 1].min()) - pad,
+                int(dots[:, 0].max()) + pad + 1, int(dots[:, 1].max()) + pad + 1)
+
+    def extend(self, points):
+        """Append to the path of a BRUSH or ERASE object, returns the bbox of the new part"""
+        points = np.array(points, dtype=np.float64).reshape(-1, 2)
+        if len(self.points) and len(points) and (points[0] == self.points[-1]).all():
+            # Render path chunks start where the previous one ended
+            points = points[1:]
+        if not len(points):
+            return None
+        new_part = points if not len(self.points) else np.vstack([self.points[-1:], points])
+        self.points = np.vstack([self.points, points])
+        return self.points_bbox(new_part)
+
+    def add_dots(self, dots):
+        """Append PATTERN dots, returns their bbox"""
+        dots = np.array(dots, dtype=np.int32).reshape(-1, 3)
+        if not len(dots):
+            return None
+        self.dots = np.vstack([self.dots, dots])
+        return self.dots_bbox(dots)
+
+    def render(self, canvas, offset, brush_engine):
+        """Draw onto canvas, whose top-left corner is at offset on the layer"""
+        ox, oy = offset
+        ink = self.layer.ERASE_VALUE if self.kind == 'ERASE' else self.layer.ink(self.color)
+        points = self.points - (ox, oy)
+        corners = [tuple(int(v) for v in p) for p in points]
+
+        if self.kind == 'BRUSH':
+            brush_engine.begin_stroke(canvas, points[0], ink, self.thickness, self.brush_type)
+            for start, end in zip(points, points[1:]):
+                brush_engine.stroke(canvas, start, end, ink, self.thickness, self.brush_type)
+        elif self.kind == 'ERASE':
+            for start, end in zip(corners, corners[1:]):
+                cv2.line(canvas, start, end, ink, self.thickness)
+        elif self.kind == 'LINE':
+            cv2.line(canvas, corners[0], corners[1], ink, self.thickness)
+        elif self.kind == 'RECTANGLE':
+            cv2.rectangle(canvas, corners[0], corners[1], ink, self.thickness)
+        elif self.kind == 'CIRCLE':
+            cv2.circle(canvas, corners[0], self.radius, ink, self.thickness)
+        elif self.kind == 'PATTERN':
+            for x, y, r in self.dots:
+                cv2.circle(canvas, (int(x) - ox, int(y) - oy), int(r), ink, -1)
+
+    def hit(self, x, y, radius):
+        """Whether a fingertip of the given radius at (x, y) touches the drawn object"""
+        reach = radius + self.thickness / 2.0
+        if self.kind in ('BRUSH', 'LINE'):
+            return polyline_distance(self.points, x, y) <= reach
+        if self.kind == 'RECTANGLE':
+            (x0, y0), (x1, y1) = self.points
+            outline = np.array([(x0, y0), (x1, y0), (x1, y1), (x0, y1), (x0, y0)])
+            return polyline_distance(outline, x, y) <= reach
+        if self.kind == 'CIRCLE':
+            cx, cy = self.points[0]
+            return abs(np.hypot(cx - x, cy - y) - self.radius) <= reach
+        if self.kind == 'PATTERN':
+            d = np.hypot(self.dots[:, 0] - x, self.dots[:, 1] - y) - self.dots[:, 2]
+            return bool((d <= radius).any())
+        return False
+
+    def sample_points(self):
+        """Points that stand for the object when testing it against a lasso"""
+        if self.kind == 'PATTERN':
+            return self.dots[:, :2].astype(np.float64)
+        return self.points
+
+    def translated(self, dx, dy):
+        moved = StrokeObject(self.kind, self.layer, self.color, self.thickness, self.brush_type,
+                             self.points + (dx, dy), self.radius, self.dots + (dx, dy, 0))
+        if self.simplified is not None:
+            moved.simplified = self.simplified + (dx, dy)
+        return moved
+
+
+class StrokeStore:
+    """Drawing objects in z order, indexed by a uniform grid of bounding boxes
+
+    Each grid cell lists the objects whose boxes touch it, so hit tests and
+    region queries only look at the objects near the point or region.
+    Redrawing a region clears it back to the layer's base pixels and
+    replays the objects that overlap it, in order.
+    """
+
+    CELL_SIZE = TILE_SIZE
+
+    def __init__(self):
+        # Replays use their own engine so the live stroke's spacing is untouched
+        self.brush_engine = BrushEngine()
+        self.restore([])
+
+    def restore(self, objects, layers=None):
+        """Replace the contents, e.g. from an undo snapshot, keeping objects on the given layers"""
+        self.objects = {}
+        self.cells = {}
+        self.next_order = 1
+        for obj in objects:
+            if layers is not None and obj.layer not in layers:
+                continue
+            obj.cells = set()
+            self.objects[obj.order] = obj
+            self.next_order = max(self.next_order, obj.order + 1)
+            self.index(obj, obj.bbox)
+
+    def snapshot(self):
+        return list(self.objects.values())
+
+    def clear(self):
+        self.restore([])
+
+    def __len__(self):
+        return len(self.objects)
+
+    def cell_range(self, bbox):
+        size = self.CELL_SIZE
+        return (range(int(bbox[1]) // size, int(bbox[3]) // size + 1),
+                range(int(bbox[0]) // size, int(bbox[2]) // size + 1))
+
+    def index(self, obj, bbox):
+        if bbox is None:
+            return
+        rows, columns = self.cell_range(bbox)
+        for cy in rows:
+            for cx in columns:
+                self.cells.setdefault((cx, cy), set()).add(obj.order)
+                obj.cells.add((cx, cy))
+
+    def add(self, obj):
+        obj.order = self.next_order
+        self.next_order += 1
+        self.objects[obj.order] = obj
+        self.index(obj, obj.bbox)
+        return obj
+
+    def grow(self, obj, bbox):
+        """Index a newly drawn part of an object that is still being drawn"""
+        if bbox is None:
+            return
+        obj.bbox = union_bbox(obj.bbox, bbox)
+        self.index(obj, bbox)
+
+    def unindex(self, obj):
+        for cell in obj.cells:
+            orders = self.cells.get(cell)
+            if orders is not None:
+                orders.discard(obj.order)
+                if not orders:
+                    del self.cells[cell]
+        obj.cells = set()
+
+    def remove(self, obj):
+        self.unindex(obj)
+        self.objects.pop(obj.order, None)
+
+    def replace(self, old, new):
+        """Swap in a changed copy of an object at the same z order"""
+        self.unindex(old)
+        new.order = old.order
+        self.objects[new.order] = new
+        self.index(new, new.bbox)
+
+    def remove_layer(self, layer):
+        for obj in [o for o in self.objects.values() if o.layer is layer]:
+            self.remove(obj)
+
+    def query(self, bbox):
+        """Objects whose boxes overlap bbox, bottom to top"""
+        rows, columns = self.cell_range(bbox)
+        orders = set()
+        for cy in rows:
+            for cx in columns:
+                orders |= self.cells.get((cx, cy), set())
+        x0, y0, x1, y1 = bbox
+        found = []
+        for order in sorted(orders):
+            obj = self.objects[order]
+            bx0, by0, bx1, by1 = obj.bbox
+            if bx0 < x1 and x0 < bx1 and by0 < y1 and y0 < by1:
+                found.append(obj)
+        return found
+
+    def hit_test(self, point, radius, layer):
+        """Pickable objects on layer under a fingertip, topmost first"""
+        x, y = point
+        r = int(radius) + 1
+        return [obj for obj in reversed(self.query((x - r, y - r, x + r + 1, y + r + 1)))
+                if obj.layer is layer and obj.kind in PICKABLE and obj.hit(x, y, radius)]
+
+    def select_lasso(self, polygon, layer, min_inside=0.5):
+        """Pickable objects on layer with at least min_inside of their points inside the lasso"""
+        polygon = np.array(polygon, dtype=np.int32).reshape(-1, 2)
+        x0, y0 = polygon.min(axis=0)
+        x1, y1 = polygon.max(axis=0) + 1
+        mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        cv2.fillPoly(mask, [polygon - (x0, y0)], 1)
+
+        selected = []
+        for obj in self.query((x0, y0, x1, y1)):
+            if obj.layer is not layer or obj.kind not in PICKABLE:
+                continue
+            points = obj.sample_points().astype(np.int64) - (x0, y0)
+            inside = ((points[:, 0] >= 0) & (points[:, 0] < x1 - x0) &
+                      (points[:, 1] >= 0) & (points[:, 1] < y1 - y0))
+            hits = np.zeros(len(points), dtype=bool)
+            hits[inside] = mask[points[inside, 1], points[inside, 0]] > 0
+            if len(points) and hits.mean() >= min_inside:
+                selected.append(obj)
+        return selected
+
+    def render_region(self, layer, y0, y1, x0, x1):
+        view = layer.pixels[y0:y1, x0:x1]
+        if layer.base is None:
+            view[:] = 0
+        else:
+            view[:] = layer.base[y0:y1, x0:x1]
+        for obj in self.query((x0, y0, x1, y1)):
+            if obj.layer is layer:
+                obj.render(view, (x0, y0), self.brush_engine)
+
+    def rerasterize(self, layer, bboxes):
+        """Redraw the tiles of layer covered by the given boxes"""
+        height, width = layer.pixels.shape[:2]
+        size = TILE_SIZE
+        tiles = np.zeros(((height + size - 1) // size, (width + size - 1) // size), dtype=bool)
+        for bbox in bboxes:
+            if bbox is None:
+                continue
+            tx0, ty0 = max(0, int(bbox[0]) // size), max(0, int(bbox[1]) // size)
+            tx1 = min(tiles.shape[1], int(bbox[2]) // size + 1)
+            ty1 = min(tiles.shape[0], int(bbox[3]) // size + 1)
+            tiles[ty0:ty1, tx0:tx1] = True
+        for ty, tx0, tx1 in tile_runs(tiles):
+            self.render_region(layer, ty * size, min(height, (ty + 1) * size),
+                               tx0 * size, min(width, tx1 * size))
@@ -0,0 +1,101 @@
+import numpy as np
+
+
+def catmull_rom(p0, p1, p2, p3, samples):
+    """Centripetal Catmull-Rom points from p1 to p2 (p1 excluded, p2 included)"""
+    points = np.array([p0, p1, p2, p3], dtype=np.float64)
+
+    # Knot spacing by sqrt of chord length avoids cusps and overshoot
+    # when fingertip samples are unevenly spaced
+    chords = np.linalg.norm(np.diff(points, axis=0), axis=1) ** 0.5
+    chords = np.maximum(chords, 1e-4)
+    t0 = 0.0
+    t1 = t0 + chords[0]
+    t2 = t1 + chords[1]
+    t3 = t2 + chords[2]
+
+    t = np.linspace(t1, t2, samples + 1)[1:, None]
+    a1 = (t1 - t) / (t1 - t0) * points[0] + (t - t0) / (t1 - t0) * points[1]
+    a2 = (t2 - t) / (t2 - t1) * points[1] + (t - t1) / (t2 - t1) * points[2]
+    a3 = (t3 - t) / (t3 - t2) * points[2] + (t - t2) / (t3 - t2) * points[3]
+    b1 = (t2 - t) / (t2 - t0) * a1 + (t - t0) / (t2 - t0) * a2
+    b2 = (t3 - t) / (t3 - t1) * a2 + (t - t1) / (t3 - t1) * a3
+    return (t2 - t) / (t2 - t1) * b1 + (t - t1) / (t2 - t1) * b2
+
+
+def simplify_rdp(points, epsilon=1.0):
+    """Ramer-Douglas-Peucker simplification of an (N, 2) point array"""
+    points = np.asarray(points)
+    if len(points) < 3:
+        return points
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    # Iterative instead of recursive so long strokes can't hit the recursion limit
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a = points[start].astype(np.float64)
+        b = points[end].astype(np.float64)
+        inner = points[start + 1:end].astype(np.float64)
+        ab = b - a
+        length = np.hypot(ab[0], ab[1])
+        if length == 0:
+            dist = np.hypot(inner[:, 0] - a[0], inner[:, 1] - a[1])
+        else:
+            # Perpendicular distance of every inner point to the chord at once
+            dist = np.abs(ab[0] * (inner[:, 1] - a[1]) - ab[1] * (inner[:, 0] - a[0])) / length
+        index = int(np.argmax(dist))
+        if dist[index] > epsilon:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return points[keep]
+
+
+class StrokeBuilder:
+    """Turns sparse fingertip samples into a smooth render path
+
+    Each segment is rendered once the sample after it arrives (one sample of
+    latency), so neighbouring spline segments join smoothly.
+    """
+
+    # Distance in pixels between interpolated points
+    SAMPLE_SPACING = 3.0
+
+    def __init__(self, epsilon=1.0):
+        self.epsilon = epsilon
+        self.points = []
+
+    def segment(self, i):
+        """Interpolated points from points[i] to points[i + 1]"""
+        pts = self.points
+        p0 = pts[max(0, i - 1)]
+        p1, p2 = pts[i], pts[i + 1]
+        p3 = pts[min(len(pts) - 1, i + 2)]
+        length = np.hypot(p2[0] - p1[0], p2[1] - p1[1])
+        samples = max(1, int(length / self.SAMPLE_SPACING))
+        return catmull_rom(p0, p1, p2, p3, samples)
+
+    def add(self, point):
+        """Add a sample, returns the newly finished part of the render path"""
+        if self.points and tuple(point) == tuple(self.points[-1]):
+            return []
+        self.points.append(tuple(point))
+        if len(self.points) < 3:
+            return []
+        i = len(self.points) - 3
+        return [tuple(self.points[i])] + [tuple(p) for p in self.segment(i)]
+
+    def finish(self):
+        """Flush the last segment, returns (render path, simplified points)"""
+        path = []
+        if len(self.points) >= 2:
+            i = len(self.points) - 2
+            path = [tuple(self.points[i])] + [tuple(p) for p in self.segment(i)]
+        simplified = simplify_rdp(np.array(self.points, dtype=np.int32).reshape(-1, 2), self.epsilon)
+        self.points = []
+        return path, simplified
@@ -0,0 +1,168 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+
+# Quantization: 3 bits per color channel and 2 for alpha, 2048 bins
+COLOR_BITS = 3
+ALPHA_BITS = 2
+EMPTY = 255
+
+
+def bin_keys(bgr, alpha):
+    """Bin number of every pixel, from the top bits of each channel"""
+    shift = 8 - COLOR_BITS
+    keys = (bgr[..., 0] >> shift).astype(np.uint16)
+    keys = (keys << COLOR_BITS) | (bgr[..., 1] >> shift)
+    keys = (keys << COLOR_BITS) | (bgr[..., 2] >> shift)
+    return (keys << ALPHA_BITS) | (alpha >> (8 - ALPHA_BITS))
+
+
+def bin_centers():
+    """(bins, 4) B, G, R, A value at the center of every bin"""
+    keys = np.arange(1 << (3 * COLOR_BITS + ALPHA_BITS))
+    color_step, alpha_step = 1 << (8 - COLOR_BITS), 1 << (8 - ALPHA_BITS)
+    centers = [((keys >> (ALPHA_BITS + COLOR_BITS * (2 - c))) & ((1 << COLOR_BITS) - 1)) * color_step + color_step // 2
+               for c in range(3)]
+    centers.append((keys & ((1 << ALPHA_BITS) - 1)) * alpha_step + alpha_step // 2)
+    return np.stack(centers, axis=1).astype(np.float32)
+
+
+def quantize_colors(image, max_colors=32, alpha_threshold=128):
+    """Label every inked pixel with one of up to max_colors colors
+
+    image is BGR (black is empty) or BGRA with straight alpha. Pixels are
+    binned by their top bits, the most common bins become the palette and
+    every other bin goes to the nearest palette bin through a lookup
+    table, so the per-pixel work is a few integer operations. Pixels under
+    alpha_threshold (half covered edges) are left empty. Returns the
+    labels (EMPTY where there is no ink) and each label's mean BGRA color.
+    """
+    if image.shape[2] == 4:
+        bgr, alpha = image[..., :3], image[..., 3]
+    else:
+        bgr = image
+        alpha = cv2.bitwise_not(cv2.inRange(image, (0, 0, 0), (0, 0, 0)))
+    ink = alpha >= alpha_threshold
+    keys = bin_keys(bgr, alpha)[ink]
+
+    counts = np.bincount(keys, minlength=1 << (3 * COLOR_BITS + ALPHA_BITS))
+    top = np.argsort(counts)[::-1][:min(max_colors, EMPTY)]
+    top = top[counts[top] > 0]
+    labels = np.full(image.shape[:2], EMPTY, dtype=np.uint8)
+    if not len(top):
+        return labels, []
+
+    centers = bin_centers()
+    distances = ((centers[:, None, :] - centers[None, top, :]) ** 2).sum(axis=2)
+    table = distances.argmin(axis=1).astype(np.uint8)
+    pixel_labels = table[keys]
+    labels[ink] = pixel_labels
+
+    # Fill each label with the mean of its actual pixels
+    pixel_counts = np.maximum(np.bincount(pixel_labels, minlength=len(top)), 1)
+    colors = []
+    for channel in (bgr[..., 0][ink], bgr[..., 1][ink], bgr[..., 2][ink], alpha[ink]):
+        colors.append(np.bincount(pixel_labels, weights=channel, minlength=len(top)) / pixel_counts)
+    colors = np.rint(np.stack(colors, axis=1)).astype(int)
+    return labels, [tuple(color) for color in colors]
+
+
+def trace_plane(labels, label, epsilon=0.75):
+    """SVG path data of the regions with the given label, holes included
+
+    findContours runs on pixel centers; the same-colored 1 px outline the
+    path is drawn with puts the edge back on the pixel boundaries.
+    """
+    mask = cv2.compare(labels, label, cv2.CMP_EQ)
+    contours, _ = cv2.findContours(mask, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+    parts = []
+    points = 0
+    for contour in contours:
+        if epsilon > 0 and len(contour) > 2:
+            contour = cv2.approxPolyDP(contour, epsilon, True)
+        xy = contour.reshape(-1, 2)
+        points += len(xy)
+        parts.append("M" + " ".join(f"{x} {y}" for x, y in xy) + "Z")
+    return "".join(parts), len(contours), points
+
+
+def svg_color(color):
+    b, g, r = color[:3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+class SvgExporter:
+    """Vectorizes drawings into SVG files on background threads
+
+    export() copies the image and returns at once with a Future for the
+    result. Color planes are traced in parallel on a thread pool (OpenCV
+    releases the GIL) and each path is written to the file, in palette
+    order, as soon as it and the ones before it are done.
+    """
+
+    def __init__(self, workers=None, max_colors=32, epsilon=0.75, alpha_threshold=128):
+        self.max_colors = max_colors
+        self.epsilon = epsilon
+        self.alpha_threshold = alpha_threshold
+        self.pool = ThreadPoolExecutor(workers or os.cpu_count() or 1)
+        # Runs whole exports, so waiting on the pool never ties up a pool thread
+        self.runner = ThreadPoolExecutor(1)
+
+    def export(self, image, path):
+        return self.runner.submit(self.write, image.copy(), path)
+
+    def write(self, image, path):
+        """Vectorize image into path, returns a summary dict"""
+        start = time.perf_counter()
+        height, width = image.shape[:2]
+        labels, colors = quantize_colors(image, self.max_colors, self.alpha_threshold)
+        planes = self.pool.map(lambda label: trace_plane(labels, label, self.epsilon), range(len(colors)))
+
+        contours = points = 0
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                    f'viewBox="0 0 {width} {height}">\n'
+                    f'<g fill-rule="evenodd" stroke-width="1" stroke-linejoin="round">\n')
+            for color, (data, plane_contours, plane_points) in zip(colors, planes):
+                if not data:
+                    continue
+                contours += plane_contours
+                points += plane_points
+                fill = svg_color(color)
+                opacity = f' opacity="{color[3] / 255:.2f}"' if color[3] < 250 else ""
+                f.write(f'<path fill="{fill}" stroke="{fill}"{opacity} d="{data}"/>\n')
+            f.write("</g>\n</svg>\n")
+        os.replace(tmp_path, path)
+        return {"path": path, "colors": len(colors), "contours": contours, "points": points,
+                "bytes": os.path.getsize(path), "seconds": time.perf_counter() - start}
+
+    def close(self):
+        self.runner.shutdown(wait=True)
+        self.pool.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a saved drawing to SVG")
+    parser.add_argument("image", help="PNG (transparent) or other image, black is empty")
+    parser.add_argument("output", help="SVG file to write")
+    parser.add_argument("--colors", type=int, default=32, help="most colors to keep")
+    parser.add_argument("--epsilon", type=float, default=0.75, help="outline simplification in pixels")
+    args = parser.parse_args()
+
+    image = cv2.imread(args.image, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise SystemExit(f"Could not read {args.image}")
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    exporter = SvgExporter(max_colors=args.colors, epsilon=args.epsilon)
+    result = exporter.write(image, args.output)
+    exporter.close()
+    print(f"{result['path']}: {result['colors']} colors, {result['contours']} outlines, "
+          f"{result['points']} points, {result['bytes']} bytes in {result['seconds']:.2f} s")
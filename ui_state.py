@@ -0,0 +1,37 @@
+class UIState:
+    """Values shown by Tk widgets, pushed to the widgets once per frame
+
+    Gesture and drawing code only write values here. sync() then compares
+    them with what was last pushed and calls the matching handler for
+    changed values only, so Tk work per frame stays flat however many times
+    a value was written.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.pushed = {}
+        self.handlers = {}
+
+    def bind(self, name, handler):
+        """Call handler(new_value, previous_value) whenever name changes"""
+        self.handlers[name] = handler
+
+    def set(self, name, value):
+        self.values[name] = value
+
+    def get(self, name, default=None):
+        return self.values.get(name, default)
+
+    def mark_pushed(self, name, value):
+        """Record a value a widget already shows, e.g. after direct user input"""
+        self.values[name] = value
+        self.pushed[name] = value
+
+    def sync(self):
+        for name, value in self.values.items():
+            if name in self.pushed and self.pushed[name] == value:
+                continue
+            handler = self.handlers.get(name)
+            if handler is not None:
+                handler(value, self.pushed.get(name))
+            self.pushed[name] = value